@@ -0,0 +1,141 @@
+import logging
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+import orjson
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from idempotency.decorators import HEADER as IDEMPOTENCY_HEADER, REPLAYED_HEADER
+from .cache import CACHE_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Primer segmento de la URL de las vistas que se pueden pedir dentro de un batch
+BATCH_PREFIXES = ('wallets', 'expenses', 'revenue', 'users')
+# Vistas de esos prefijos que no: las públicas de login/registro y la async
+BATCH_EXCLUDED_VIEWS = ('register', 'login', 'token_refresh', 'dashboard_async')
+# Cabeceras que cada sub-request puede mandar y las de su respuesta que se devuelven
+REQUEST_HEADERS = ('If-Match', 'If-None-Match', IDEMPOTENCY_HEADER)
+RESPONSE_HEADERS = ('ETag', 'Location', CACHE_HEADER, REPLAYED_HEADER)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, default=None)
+    headers = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
+
+
+class BatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(required=False, default=False)
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f'At most {settings.BATCH_MAX_REQUESTS} requests per batch')
+        return value
+
+
+def _result(status_code, body, headers=None):
+    return {'status': status_code, 'headers': headers or {}, 'body': body}
+
+
+def _subrequest(request, item, atomic):
+    """HttpRequest para la vista, con la autenticación y el cliente ya resueltos del batch"""
+    url = urlsplit(item['path'])
+    payload = b'' if item['body'] is None else orjson.dumps(item['body'])
+    environ = {
+        key: value for key, value in request.META.items()
+        # Las cabeceras de condiciones e idempotencia del batch no aplican a cada sub-request
+        if key not in ('HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IDEMPOTENCY_KEY', 'CONTENT_LENGTH')
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': BytesIO(payload),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in item['headers'].items():
+        if name.title() in REQUEST_HEADERS:
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    subrequest = WSGIRequest(environ)
+    # DRF usa este usuario/token en vez de volver a decodificar el JWT (ForcedAuthentication)
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    subrequest.client = getattr(request, 'client', None)
+    # En un batch atómico lo leído puede no confirmarse: no se lee ni guarda la cache de respuestas
+    subrequest.skip_response_cache = atomic
+    return subrequest
+
+
+def _execute(request, item, atomic):
+    """Corre un sub-request y devuelve {status, headers, body}"""
+    path = urlsplit(item['path']).path
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _result(status.HTTP_404_NOT_FOUND, {'error': 'Not found'})
+    if path.strip('/').split('/')[0] not in BATCH_PREFIXES or match.url_name in BATCH_EXCLUDED_VIEWS:
+        return _result(status.HTTP_400_BAD_REQUEST, {'error': f'{path} cannot be used in a batch'})
+
+    subrequest = _subrequest(request, item, atomic)
+    subrequest.resolver_match = match
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batch request %s %s failed', item['method'], item['path'])
+        return _result(status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': 'Internal server error'})
+    if response.streaming:
+        # Exports: no tiene sentido armarlos en memoria dentro del JSON del batch
+        response.close()
+        return _result(status.HTTP_400_BAD_REQUEST, {'error': 'Streaming responses are not supported in a batch'})
+    headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+    return _result(response.status_code, getattr(response, 'data', None), headers)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """Varios requests a billeteras, gastos, ingresos y usuarios en un solo round trip.
+
+    Cada sub-request pasa por la misma vista que si llegara solo (permisos, validación, ETag,
+    Idempotency-Key), pero el JWT y el cliente se resuelven una vez para todo el batch. Con
+    "atomic": true corren en una transacción: el primero que falle (status >= 400) la deshace y
+    los siguientes no se ejecutan (424).
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    atomic = serializer.validated_data['atomic']
+    items = serializer.validated_data['requests']
+
+    results = []
+    committed = True
+    with transaction.atomic() if atomic else nullcontext():
+        for item in items:
+            result = _execute(request, item, atomic)
+            results.append(result)
+            if atomic and result['status'] >= 400:
+                transaction.set_rollback(True)
+                committed = False
+                break
+
+    for item in items[len(results):]:
+        results.append(_result(
+            status.HTTP_424_FAILED_DEPENDENCY,
+            {'error': 'Not executed: an earlier request of the atomic batch failed'}
+        ))
+    data = {'responses': results}
+    if atomic:
+        data['committed'] = committed
+    return Response(data)
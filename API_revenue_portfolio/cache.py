@@ -0,0 +1,111 @@
+import threading
+from functools import wraps
+from urllib.parse import urlencode
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from users.models import Client
+
+RESPONSE_CACHE = 'responses'
+CACHE_HEADER = 'X-Cache'
+
+
+class CacheStats:
+    """Contadores de aciertos/fallos de la cache de respuestas (por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def add(self, endpoint, outcome):
+        with self._lock:
+            key = (endpoint, outcome)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for (endpoint, outcome), value in counts.items():
+            stats.setdefault(endpoint, {'hits': 0, 'misses': 0})[outcome] = value
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def bump_data_version(client_id):
+    """Invalida todas las respuestas cacheadas del cliente: un UPDATE de una fila, sin recorrer claves"""
+    Client.objects.filter(pk=client_id).update(data_version=F('data_version') + 1)
+
+
+def get_data_version(client_id):
+    return Client.objects.filter(pk=client_id).values_list('data_version', flat=True).first()
+
+
+def cache_key(endpoint, client_id, version, query_params):
+    params = urlencode(sorted((key, value) for key in query_params for value in query_params.getlist(key)))
+    return f'{endpoint}:{client_id}:{version}:{params}'
+
+
+def lookup(endpoint, client_id, query_params):
+    """Devuelve (clave, datos cacheados o None); la clave es None si el cliente no existe"""
+    version = get_data_version(client_id)
+    if version is None:
+        return None, None
+    key = cache_key(endpoint, client_id, version, query_params)
+    data = caches[RESPONSE_CACHE].get(key)
+    stats.add(endpoint, 'misses' if data is None else 'hits')
+    return key, data
+
+
+def store(key, data):
+    caches[RESPONSE_CACHE].set(key, data)
+
+
+def cached_per_client(endpoint):
+    """Cachea las respuestas 200 de una vista GET por (cliente, endpoint, query params, versión de datos).
+
+    Cualquier escritura del cliente incrementa Client.data_version, así que las entradas
+    viejas dejan de consultarse y el LRU de la cache las descarta.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            client = getattr(request, 'client', None)
+            if client is None or getattr(request, 'skip_response_cache', False):
+                return view(request, *args, **kwargs)
+            key, data = lookup(endpoint, client.id, request.query_params)
+            if key is None:
+                return Response(
+                    {"error": "Client profile not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if data is not None:
+                return Response(data, headers={CACHE_HEADER: 'HIT'})
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                store(key, response.data)
+                response[CACHE_HEADER] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+class ClientDataVersionMixin:
+    """Para viewsets: toda escritura exitosa invalida la cache de respuestas del cliente"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            client = getattr(request, 'client', None)
+            if client is not None:
+                bump_data_version(client.id)
+        return response
@@ -0,0 +1,177 @@
+import hashlib
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from users.authentication import get_request_client
+from users.models import Client
+
+
+class ConditionalGetMixin:
+    """ETag / If-None-Match para list y retrieve de un ModelViewSet con filas por cliente.
+
+    - list: el ETag sale de max(updated_at) y COUNT(*) de las filas vivas del cliente
+      (índice parcial client+updated_at, sin leer la tabla) más la URL pedida.
+    - retrieve: el ETag sale de version y updated_at de la fila: "<version>.<hash>" (fuerte, lo
+      usa If-Match en OptimisticWriteMixin).
+    Si coincide con If-None-Match se responde 304 sin traer ni serializar filas.
+    `etag_dependencies` lista FKs cuyos datos aparecen en la respuesta (p. ej. wallet_name) y
+    `etag_state` agrega lo que cambia la respuesta sin pasar por updated_at.
+    """
+    etag_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        etag = self.collection_etag(request)
+        if etag is not None and self.etag_matches(request, etag):
+            return self.not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        return self.tag(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.object_etag(request)
+        if etag is not None and self.etag_matches(request, etag):
+            return self.not_modified(etag)
+        response = super().retrieve(request, *args, **kwargs)
+        return self.tag(response, etag)
+
+    def collection_etag(self, request):
+        try:
+            client = get_request_client(request)
+        except Client.DoesNotExist:
+            return None
+        model = self.get_queryset().model
+        parts = []
+        for related in (model, *(model._meta.get_field(name).related_model for name in self.etag_dependencies)):
+            state = related.objects.filter(client=client, is_deleted=False).aggregate(
+                last=Max('updated_at'), count=Count('*')
+            )
+            parts += [state['last'], state['count']]
+        return self.make_etag(request, [*parts, *self.etag_state(request)])
+
+    def object_etag(self, request):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        try:
+            fields = ['version', 'updated_at', *(f'{name}__updated_at' for name in self.etag_dependencies)]
+            state = self.get_queryset().filter(**{self.lookup_field: lookup}).values_list(*fields).first()
+        except (TypeError, ValueError):
+            return None
+        if state is None:
+            return None
+        version, *state = state
+        return f'"{version}.{self.etag_digest(request, [*state, *self.etag_state(request, lookup)])}"'
+
+    def etag_state(self, request, lookup=None):
+        """Partes extra del ETag de la lista (lookup None) o de una fila"""
+        return []
+
+    @classmethod
+    def make_etag(cls, request, parts):
+        return f'W/"{cls.etag_digest(request, parts)}"'
+
+    @staticmethod
+    def etag_digest(request, parts):
+        # La URL completa (filtros, cursor, page_size) y el formato forman parte de la representación
+        media_type = getattr(request, 'accepted_media_type', '')
+        key = '|'.join(str(part) for part in (*parts, request.get_full_path(), media_type))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def etag_matches(request, etag):
+        header = request.headers.get('If-None-Match')
+        if not header:
+            return False
+        candidates = parse_etags(header)
+        # Comparación débil (RFC 9110): se ignora el prefijo W/
+        return '*' in candidates or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in candidates)
+
+    @staticmethod
+    def not_modified(etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+    @staticmethod
+    def tag(response, etag):
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class VersionConflict(Exception):
+    """Otra escritura cambió la fila (su version) entre la lectura y el UPDATE"""
+
+
+def compare_and_swap(instance, **changes):
+    """UPDATE ... SET changes, version = version + 1 WHERE id = pk AND version = la leída.
+
+    Si no afectó ninguna fila levanta VersionConflict; si no, deja la instancia con los valores nuevos.
+    """
+    now = timezone.now()
+    updated = type(instance).objects.filter(pk=instance.pk, version=instance.version).update(
+        version=F('version') + 1, updated_at=now, **changes
+    )
+    if not updated:
+        raise VersionConflict
+    for field, value in changes.items():
+        setattr(instance, field, value)
+    instance.version += 1
+    instance.updated_at = now
+    return instance
+
+
+def if_match_versions(header):
+    """Versiones de las filas aceptadas por If-Match; None si acepta cualquiera ('*')"""
+    versions = set()
+    for tag in parse_etags(header):
+        if tag == '*':
+            return None
+        # Comparación fuerte (RFC 9110): un ETag débil nunca coincide
+        version = tag.strip('"').partition('.')[0]
+        if not tag.startswith('W/') and version.isdigit():
+            versions.add(int(version))
+    return versions
+
+
+class OptimisticWriteMixin:
+    """Concurrencia optimista en PUT/PATCH/DELETE (con ConditionalGetMixin).
+
+    La escritura es un compare_and_swap sobre la version leída, antes de tocar balances o totales.
+    - Con If-Match (el ETag de un GET): si la fila ya no tiene esa versión -> 412 con el ETag
+      actual, sin reintentar; el cliente decide con los datos nuevos.
+    - Sin If-Match: si otra escritura ganó se relee la fila y se recalcula (hasta
+      OPTIMISTIC_RETRIES veces; después 409).
+    """
+
+    @staticmethod
+    def write_attempts(request):
+        return range(1 if request.headers.get('If-Match') else 1 + settings.OPTIMISTIC_RETRIES)
+
+    def check_if_match(self, request, instance):
+        """None si la escritura puede seguir; si no, la respuesta 412"""
+        header = request.headers.get('If-Match')
+        if not header:
+            return None
+        versions = if_match_versions(header)
+        if versions is None or instance.version in versions:
+            return None
+        return self.precondition_failed(request)
+
+    def precondition_failed(self, request):
+        response = Response(
+            {'error': 'Precondition failed: the resource was modified'},
+            status=status.HTTP_412_PRECONDITION_FAILED
+        )
+        etag = self.object_etag(request)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+    def write_conflict(self, request):
+        """Respuesta cuando se agotaron los intentos: la fila cambió bajo cada uno"""
+        if request.headers.get('If-Match'):
+            return self.precondition_failed(request)
+        return Response(
+            {'error': 'The resource was modified concurrently, retry the request'},
+            status=status.HTTP_409_CONFLICT
+        )
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+from datetime import datetime, time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BaseRenderer
+
+# Tamaño aproximado de cada bloque enviado al cliente
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class CSVRenderer(BaseRenderer):
+    """Solo para la negociación de contenido de los exports (?format=csv).
+
+    Los exports devuelven un StreamingHttpResponse; este render se usa para errores.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(data.keys())
+        writer.writerow(data.values())
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Solo para la negociación de contenido de los exports (?format=ndjson)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode(self.charset)
+
+
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer]
+
+
+def parse_date_range(request):
+    """Lee ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (ambos opcionales, inclusivos)"""
+    bounds = []
+    for param in ('date_from', 'date_to'):
+        value = request.query_params.get(param)
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({param: 'Invalid date, use YYYY-MM-DD'})
+        bounds.append(parsed)
+    return bounds
+
+
+def day_bounds(date_from, date_to):
+    """Convierte un rango de fechas en datetimes (inclusivos) para filtrar campos DateTimeField"""
+    start = end = None
+    if date_from:
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to:
+        end = timezone.make_aware(datetime.combine(date_to, time.max))
+    return start, end
+
+
+def _csv_lines(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        if buffer.tell() >= STREAM_BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    chunk, size = [], 0
+    for row in rows:
+        line = encoder.encode(dict(zip(header, row)))
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= STREAM_BUFFER_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk, size = [], 0
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def export_response(request, queryset, header, filename):
+    """Responde en streaming las filas de `queryset` (un values_list con las columnas de `header`).
+
+    Usa .iterator(): en PostgreSQL es un cursor del lado del servidor, así que la
+    memoria del worker no depende del número de filas.
+    """
+    renderer = request.accepted_renderer
+    rows = queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    if renderer.format == 'ndjson':
+        content = _ndjson_lines(header, rows)
+    else:
+        content = _csv_lines(header, rows)
+    response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
@@ -0,0 +1,130 @@
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+# Campos cuyo valor de .values() ya es la representación JSON (int, str, pk de la FK)
+_PASSTHROUGH = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+# Serializer -> [(campo, función o None)]
+_converters = {}
+
+
+def read_converters(serializer_class, fields=None):
+    """(campo, función o None) en el orden del serializer; se calcula una vez por clase.
+
+    `fields` (ver requested_fields) deja solo esos campos.
+    """
+    converters = _converters.get(serializer_class)
+    if converters is None:
+        converters = _converters[serializer_class] = [
+            (name, None if isinstance(field, _PASSTHROUGH) else field.to_representation)
+            for name, field in serializer_class().fields.items()
+            if not field.write_only
+        ]
+    if fields is None:
+        return converters
+    return [(name, convert) for name, convert in converters if name in fields]
+
+
+def requested_fields(request, serializer_class):
+    """Campos de ?fields=id,name (sparse fieldset) en el orden del serializer; None si no vino"""
+    value = request.query_params.get('fields')
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    available = [name for name, _ in read_converters(serializer_class)]
+    unknown = names - set(available)
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}'})
+    if not names:
+        raise ValidationError({'fields': f'Expected a comma separated list of: {", ".join(available)}'})
+    return tuple(name for name in available if name in names)
+
+
+def read_values(queryset, serializer_class, expressions, fields=None, keep=()):
+    """queryset.values() con los campos del serializer; `expressions` mapea los que vienen de otra tabla.
+
+    Con `fields` solo se leen esas columnas (y los JOIN que necesiten); `keep` agrega columnas
+    que no se devuelven pero hacen falta igual, p. ej. las del orden del cursor.
+    """
+    names = [name for name, _ in read_converters(serializer_class, fields)]
+    names += [name for name in keep if name not in names]
+    columns = [name for name in names if name not in expressions]
+    return queryset.values(*columns, **{name: F(expressions[name]) for name in names if name in expressions})
+
+
+def represent(rows, converters):
+    """Filas de read_values() -> lo mismo que serializer.data"""
+    data = []
+    for row in rows:
+        item = {}
+        for name, convert in converters:
+            value = row[name]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
+
+
+class ValuesReadMixin:
+    """list/retrieve sin instanciar modelos ni pasar por el ModelSerializer.
+
+    Lee con .values() exactamente los campos de `serializer_class.Meta.fields`, con un JOIN para
+    los que vienen de otra tabla (`read_expressions`, p. ej. wallet_name -> wallet__name), y
+    arma cada fila con los to_representation de los campos del serializer solo donde cambian el
+    valor (decimales, fechas). El JSON resultante es byte a byte el mismo que el del serializer.
+    Las escrituras siguen usando el serializer completo. Con ?fields= se leen y devuelven solo
+    esos campos (más las columnas del orden, que el cursor necesita).
+    """
+    # Campo de salida -> lookup del ORM, para los campos que no son columnas del modelo
+    read_expressions = {}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.read_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.represent(page))
+        return Response(self.represent(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.read_queryset(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(self.represent([row])[0])
+
+    def read_queryset(self, queryset):
+        keep = [name.lstrip('-') for name in getattr(self, 'ordering', ())]
+        return read_values(
+            queryset, self.get_serializer_class(), self.read_expressions, self.requested_fields(), keep
+        )
+
+    def read_converters(self):
+        return read_converters(self.get_serializer_class(), self.requested_fields())
+
+    def represent(self, rows):
+        return represent(rows, self.read_converters())
+
+    def requested_fields(self):
+        return requested_fields(self.request, self.get_serializer_class())
+
+
+class SparseFieldsMixin:
+    """Serializer que en los GET devuelve solo los campos de ?fields= (si vino).
+
+    Solo recorta la salida: la vista es la que tiene que leer únicamente esas columnas
+    (read_values con `fields` o .only()).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            fields = requested_fields(request, type(self))
+            if fields is not None:
+                for name in set(self.fields) - set(fields):
+                    self.fields.pop(name)
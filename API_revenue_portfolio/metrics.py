@@ -0,0 +1,360 @@
+import atexit
+import fcntl
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.settings import api_settings
+from . import cache as response_cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Acumulado de los workers que ya terminaron (y su lock) dentro de METRICS_DIR
+ARCHIVE = 'archive.json'
+ARCHIVE_LOCK = 'archive.lock'
+
+
+class QueryCounter(threading.local):
+    """Consultas SQL ejecutadas por el hilo actual (contador que solo crece)"""
+    count = 0
+
+
+queries = QueryCounter()
+
+
+def _count_query(execute, sql, params, many, context):
+    queries.count += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # Un wrapper fijo por conexión: una llamada y una suma por consulta, nada por request
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class Registry:
+    """Histogramas y contadores del proceso; se vuelcan a un archivo por proceso en METRICS_DIR.
+
+    El camino caliente (observe) solo toca un dict y una lista del hilo actual; la escritura a
+    disco la hace un hilo aparte cada METRICS_FLUSH_INTERVAL segundos.
+
+    Varios procesos: cada worker de gunicorn escribe {pid}-{inicio}.json (el inicio evita que un
+    pid reciclado pise el archivo de otro proceso) y /metrics/ suma todos. Cuando un worker
+    termina, su último estado se suma a archive.json y su archivo se borra; lo mismo hace collect
+    con los archivos que no se actualizan hace más de METRICS_STALE_AFTER segundos (workers
+    matados sin pasar por atexit). Así los contadores de la suma nunca bajan y los archivos no se
+    acumulan con cada reciclado.
+    """
+
+    def __init__(self, directory, buckets, interval, stale_after):
+        self.directory = directory
+        self.buckets = tuple(buckets)
+        self.interval = interval
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        # El hijo hereda el handler, que usa el pid y las tablas del proceso que sale
+        atexit.register(self.retire)
+
+    def _reset(self):
+        # Tras un fork el hijo empieza vacío: lo ya contado pertenece al archivo del padre
+        self.pid = os.getpid()
+        self.path = os.path.join(self.directory, f'{self.pid}-{time.time_ns()}.json')
+        self._local = threading.local()
+        self._tables = []
+        self._flusher = None
+        self._retired = False
+
+    def observe(self, view, method, status, seconds, query_count):
+        # Cada hilo escribe solo en su propia tabla: sin lock en el camino caliente
+        try:
+            table = self._local.table
+        except AttributeError:
+            table = self._new_table()
+        try:
+            series = table[view, method, status]
+        except KeyError:
+            # [conteo por bucket..., +Inf, suma de segundos, consultas SQL]
+            series = table[view, method, status] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-2] += seconds
+        series[-1] += query_count
+
+    def _new_table(self):
+        table = self._local.table = {}
+        with self._lock:
+            self._tables.append(table)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+        return table
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            tables = list(self._tables)
+        merged = {}
+        for table in tables:
+            # dict() copia bajo el GIL aunque el hilo dueño siga escribiendo
+            for key, series in dict(table).items():
+                total = merged.setdefault(key, [0] * len(series))
+                for position, value in enumerate(series):
+                    total[position] += value
+        requests = [[*key, *series] for key, series in merged.items()]
+        return {'buckets': self.buckets, 'requests': requests, 'cache': response_cache.stats.snapshot()}
+
+    def flush(self):
+        """Escribe el estado del proceso en su archivo (reemplazo atómico)"""
+        with self._flush_lock:
+            if self._retired:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            _write(self.path, self.snapshot())
+
+    def retire(self):
+        """Al salir el proceso: suma su estado a archive.json y borra su archivo"""
+        if self._retired or not (self._tables or os.path.exists(self.path)):
+            return
+        self.flush()
+        with self._flush_lock:
+            self._retired = True
+        with self._archive_lock():
+            self._archive([self.path])
+
+    def collect(self):
+        """Suma los archivos de todos los procesos: (requests por clave, cache por endpoint)"""
+        self.flush()
+        requests, cache = {}, {}
+        with self._archive_lock():
+            stale = []
+            deadline = time.time() - self.stale_after
+            for path in self._worker_files():
+                try:
+                    if path != self.path and os.path.getmtime(path) < deadline:
+                        stale.append(path)
+                except OSError:
+                    continue
+            if stale:
+                self._archive(stale)
+            for path in [os.path.join(self.directory, ARCHIVE), *self._worker_files()]:
+                data = _read(path)
+                if data is not None and tuple(data['buckets']) == self.buckets:
+                    _merge(data, requests, cache)
+        return requests, cache
+
+    def _worker_files(self):
+        return [
+            path for path in glob.glob(os.path.join(self.directory, '*.json'))
+            if os.path.basename(path) != ARCHIVE
+        ]
+
+    def _archive_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return _FileLock(os.path.join(self.directory, ARCHIVE_LOCK))
+
+    def _archive(self, paths):
+        # Llamar con el lock del archivo tomado
+        archive = os.path.join(self.directory, ARCHIVE)
+        data = _read(archive)
+        requests, cache = {}, {}
+        if data is not None and tuple(data['buckets']) == self.buckets:
+            _merge(data, requests, cache)
+        for path in paths:
+            worker = _read(path)
+            if worker is not None and tuple(worker['buckets']) == self.buckets:
+                _merge(worker, requests, cache)
+        _write(archive, {
+            'buckets': self.buckets,
+            'requests': [[*key, *series] for key, series in requests.items()],
+            'cache': cache,
+        })
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class _FileLock:
+    """flock exclusivo entre procesos (los workers comparten METRICS_DIR)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump(data, output)
+    os.replace(temporary, path)
+
+
+def _merge(data, requests, cache):
+    for view, method, status, *series in data['requests']:
+        total = requests.setdefault((view, method, status), [0] * len(series))
+        for position, value in enumerate(series):
+            total[position] += value
+    for endpoint, counts in data['cache'].items():
+        total = cache.setdefault(endpoint, {'hits': 0, 'misses': 0})
+        total['hits'] += counts['hits']
+        total['misses'] += counts['misses']
+
+
+# Se crea al primer uso (MetricsMiddleware con METRICS_ENABLED o /metrics/): importar el módulo
+# no registra los hooks de fork y atexit ni escribe en METRICS_DIR
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = Registry(
+                    settings.METRICS_DIR, settings.METRICS_BUCKETS,
+                    settings.METRICS_FLUSH_INTERVAL, settings.METRICS_STALE_AFTER
+                )
+    return _registry
+
+
+class MetricsMiddleware:
+    """Latencia, status y consultas SQL de cada request, por vista (nombre de la URL) y método"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        connection_created.connect(install_query_counter, dispatch_uid='metrics_query_counter')
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+        self.registry = get_registry()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        queries_before = queries.count
+        response = self.get_response(request)
+        match = request.resolver_match
+        self.registry.observe(
+            match.view_name if match is not None else '<unmatched>',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            queries.count - queries_before,
+        )
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render(requests, cache, buckets):
+    """Formato de texto de Prometheus"""
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by view, method and status.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (view, method, status), series in sorted(requests.items()):
+        cumulative = 0
+        for bound, count in zip([*buckets, '+Inf'], series):
+            cumulative += count
+            labels = _labels(view=view, method=method, status=status, le=bound)
+            lines.append(f'http_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(view=view, method=method, status=status)
+        lines.append(f'http_request_duration_seconds_sum{labels} {series[-2]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{labels} {cumulative}')
+
+    lines += [
+        '# HELP http_request_db_queries_total SQL queries executed while serving requests.',
+        '# TYPE http_request_db_queries_total counter',
+    ]
+    for (view, method, status), series in sorted(requests.items()):
+        lines.append(f'http_request_db_queries_total{_labels(view=view, method=method, status=status)} {series[-1]}')
+
+    lines += [
+        '# HELP response_cache_requests_total Response cache lookups by endpoint and result.',
+        '# TYPE response_cache_requests_total counter',
+    ]
+    for endpoint, counts in sorted(cache.items()):
+        for result in ('hits', 'misses'):
+            lines.append(f'response_cache_requests_total{_labels(endpoint=endpoint, result=result)} {counts[result]}')
+    lines += [
+        '# HELP response_cache_hit_ratio Share of response cache lookups served from the cache.',
+        '# TYPE response_cache_hit_ratio gauge',
+    ]
+    for endpoint, counts in sorted(cache.items()):
+        lookups = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / lookups if lookups else 0
+        lines.append(f'response_cache_hit_ratio{_labels(endpoint=endpoint)} {ratio:.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Authorization: Bearer <METRICS_TOKEN> para el scraper de Prometheus (sin usuario ni JWT)"""
+
+    def authenticate(self, request):
+        token = settings.METRICS_TOKEN
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not token or not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            # Sigue con la autenticación JWT de siempre
+            return None
+        return AnonymousUser(), MetricsTokenAuthentication
+
+    def authenticate_header(self, request):
+        # Sin credenciales: 401 como el resto de la API (DRF lo toma de la primera autenticación)
+        return 'Bearer realm="api"'
+
+
+class IsMetricsScraper(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth is MetricsTokenAuthentication
+
+
+@api_view(['GET'])
+@authentication_classes([MetricsTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+@permission_classes([IsMetricsScraper | IsAdminUser])
+def metrics(request):
+    """Métricas de todos los workers en formato Prometheus (staff o METRICS_TOKEN)"""
+    registry = get_registry()
+    requests, cache = registry.collect()
+    return HttpResponse(render(requests, cache, registry.buckets), content_type=CONTENT_TYPE)
@@ -0,0 +1,183 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por cursor (keyset) sobre el orden de la vista, p. ej. (fecha, id).
+
+    Cada página es un rango del índice a partir de la última fila vista: no usa
+    OFFSET ni COUNT(*), así que una página profunda cuesta lo mismo que la primera.
+    La vista define el orden en `ordering`; el último campo debe ser único (id).
+    """
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_union([queryset], request, view)
+
+    def paginate_union(self, querysets, request, view=None):
+        """Pagina la unión (UNION ALL) de varios querysets disjuntos del mismo modelo.
+
+        Sirve cuando la condición sería un OR entre columnas con índices distintos (p. ej. origen o
+        destino de una transferencia): cada parte se ordena y se filtra desde el cursor por su
+        cuenta, así cada una es un rango de su propio índice, y la unión se ordena y se corta.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.model = querysets[0].model
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = self.page_queryset(querysets, ordering, position)
+
+        # Una fila extra indica si hay otra página en esa dirección
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_item = results[0] if results else None
+        self.last_item = results[-1] if results else None
+        return results
+
+    def page_queryset(self, querysets, ordering, position):
+        """Filas posteriores a `position` en `ordering`, de la unión de `querysets` (sin cortar)"""
+        parts = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self._after(ordering, position))
+            parts.append(queryset)
+        if len(parts) == 1:
+            return parts[0]
+        if connections[parts[0].db].features.supports_slicing_ordering_in_compound:
+            # Cada parte aporta como mucho una página: el motor no lee más allá en ningún índice
+            parts = [part[:self.page_size + 1] for part in parts]
+        else:
+            # SQLite no admite ORDER BY/LIMIT dentro de un UNION
+            parts = [part.order_by() for part in parts]
+        return parts[0].union(*parts[1:], all=True).order_by(*ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last_item is None:
+            return None
+        return self._link(self.last_item, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_item is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.first_item, reverse=True)
+
+    # Cursor
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = []
+            for name, value in zip(self.ordering, values):
+                field = self.model._meta.get_field(name.lstrip('-'))
+                value = field.to_python(value)
+                if value is None:
+                    raise ValueError
+                # Rango del tipo de columna (p. ej. un id que no entra en un bigint)
+                field.run_validators(value)
+                position.append(value)
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, item, reverse):
+        values = []
+        for name in self.ordering:
+            value = self._value(item, name.lstrip('-'))
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        payload = {'p': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _value(item, name):
+        if isinstance(item, dict):
+            return item[name]
+        return getattr(item, name)
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """Filas estrictamente posteriores a `position` según `ordering` (comparación lexicográfica).
+
+        El primer campo se acota también con lte/gte para que el motor use el índice como rango.
+        """
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            name = ordering[index].lstrip('-')
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 import environ
 import dj_database_url
 
@@ -50,6 +51,8 @@ APPS = [
     'wallets',
     'expenses',
     'revenue',
+    'rollups',
+    'idempotency',
 ]
 
 SWAGGER_APPS =  [
@@ -73,6 +76,10 @@ ACCOUNT_SIGNUP_EMAIL_ENTER_TWICE = False
 ACCOUNT_USERNAME_REQUIRED = True
 
 MIDDLEWARE = [
+    # Histogramas de latencia por vista para /metrics/ (METRICS_ENABLED)
+    'API_revenue_portfolio.metrics.MetricsMiddleware',
+    # Server-Timing y log por request; no hace nada salvo con REQUEST_TIMING=True
+    'API_revenue_portfolio.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -164,13 +171,104 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClientJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'API_revenue_portfolio.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # JSON con orjson (misma salida que el JSONRenderer de DRF) y MessagePack según Accept/Content-Type
+    'DEFAULT_RENDERER_CLASSES': [
+        'API_revenue_portfolio.renderers.ORJSONRenderer',
+        'API_revenue_portfolio.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'API_revenue_portfolio.renderers.ORJSONParser',
+        'API_revenue_portfolio.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Cache local (por proceso, LRU) de las respuestas de dashboard y my_profile; la clave incluye
+# Client.data_version, así que una escritura las invalida sin borrar claves
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': env.int('RESPONSE_CACHE_TIMEOUT', default=300),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('RESPONSE_CACHE_MAX_ENTRIES', default=5000),
+        },
+    },
+}
+
+# Hilos (por proceso) que calculan en paralelo las secciones de /users/dashboard/async/;
+# cada hilo mantiene su propia conexión a la base de datos
+DASHBOARD_WORKERS = env.int('DASHBOARD_WORKERS', default=6)
+
+# Límites de /expenses/bulk/ y /revenue/bulk/
+BULK_MAX_ITEMS = env.int('BULK_MAX_ITEMS', default=5000)
+BULK_BATCH_SIZE = 1000
+
+# Sub-requests por POST /batch/
+BATCH_MAX_REQUESTS = env.int('BATCH_MAX_REQUESTS', default=25)
+
+# PUT/PATCH/DELETE sin If-Match: veces que se relee y reintenta si otra escritura cambió la fila
+OPTIMISTIC_RETRIES = env.int('OPTIMISTIC_RETRIES', default=3)
+
+# Filas por lote al leer los exports en streaming (cursor del lado del servidor en PostgreSQL)
+EXPORT_CHUNK_SIZE = 2000
+
+# Segundos que se guarda la respuesta de un POST con Idempotency-Key (ver manage.py purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60)
+
+# Segundos hacia atrás en los que snapshot_balances toma el snapshot (deja terminar las transacciones abiertas)
+LEDGER_SNAPSHOT_LAG = 60
+
+# Mide cada request (consultas SQL, tiempo de base, vista y render) y lo devuelve en la cabecera
+# Server-Timing y en una línea de log JSON; avisa consultas repetidas más de N veces (N+1)
+REQUEST_TIMING = env.bool('REQUEST_TIMING', default=False)
+REQUEST_TIMING_REPEAT_THRESHOLD = env.int('REQUEST_TIMING_REPEAT_THRESHOLD', default=5)
+
+# Métricas por vista/método/status y de la cache de respuestas, expuestas en /metrics/ (staff, o
+# el scraper con Authorization: Bearer <METRICS_TOKEN>). Cada worker las vuelca cada
+# METRICS_FLUSH_INTERVAL segundos a su archivo en METRICS_DIR, que tiene que ser el mismo
+# directorio para todos los workers de gunicorn; los archivos de workers que terminaron (o que no
+# se actualizan hace METRICS_STALE_AFTER segundos) se suman a METRICS_DIR/archive.json.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_DIR = env('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'api_revenue_portfolio_metrics'))
+METRICS_FLUSH_INTERVAL = env.int('METRICS_FLUSH_INTERVAL', default=5)
+METRICS_STALE_AFTER = env.int('METRICS_STALE_AFTER', default=300)
+# Límites superiores (segundos) de los buckets del histograma de latencia
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'API_revenue_portfolio.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
+# Máximo de user_id -> client_id cacheados por worker (tokens emitidos sin el claim client_id)
+CLIENT_ID_CACHE_SIZE = env.int('CLIENT_ID_CACHE_SIZE', default=10000)
+
 if DEBUG:
     # En desarrollo, muestra emails en consola
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -0,0 +1,25 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.authentication import ClientRefreshToken
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import Wallet
+
+
+class ClientAPITestCase(TestCase):
+    """Base de los tests de la API: usuario con su Client, una billetera y un APIClient con su JWT"""
+
+    username = 'cliente'
+    opening_balance = Decimal('100.00')
+
+    def setUp(self):
+        self.user = User.objects.create_user(self.username, f'{self.username}@example.com', 'secreto123')
+        self.client_profile = Client.objects.create(name=self.username, email=self.user.email)
+        self.wallet = wallet_services.open_wallet(self.client_profile, 'Efectivo', '', self.opening_balance)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {ClientRefreshToken.for_user(self.user).access_token}')
+
+    def balance(self, wallet=None):
+        return Wallet.objects.get(pk=(wallet or self.wallet).pk).balance
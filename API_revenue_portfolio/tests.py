@@ -0,0 +1,644 @@
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from io import BytesIO
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest import mock
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from expenses.models import Expense
+from expenses.serializers import ExpenseSerializer
+from expenses.views import ExpenseViewSet
+from revenue.models import Revenue
+from revenue.serializers import RevenueSerializer
+from revenue.views import RevenueViewSet
+from users.authentication import ClientRefreshToken
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import BalanceSnapshot, LedgerEntry, Transfer, Wallet
+from wallets.views import WalletViewSet
+from . import metrics
+from .testing import ClientAPITestCase
+from .pagination import KeysetPagination
+from .renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer
+
+CLIENTS = 20
+WALLETS_PER_CLIENT = 3
+ROWS_PER_WALLET = 40
+
+
+class QueryPlanTests(TestCase):
+    """Los querysets de cada viewset deben resolverse con índices, nunca con un seq scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        clients = Client.objects.bulk_create([
+            Client(name=f'client{i}', email=f'client{i}@example.com') for i in range(CLIENTS)
+        ])
+        wallets = Wallet.objects.bulk_create([
+            Wallet(client=client, name=f'wallet{j}', balance=Decimal('1000.00'), is_deleted=(j == 0 and i % 5 == 0))
+            for i, client in enumerate(clients) for j in range(WALLETS_PER_CLIENT)
+        ])
+        start = date(2024, 1, 1)
+        expenses, revenues, transfers = [], [], []
+        for wallet in wallets:
+            for k in range(ROWS_PER_WALLET):
+                day = start + timedelta(days=k * 9)
+                deleted = k % 10 == 0
+                expenses.append(Expense(
+                    client_id=wallet.client_id, wallet=wallet, name='expense', description='',
+                    amount=Decimal('10.00'), expense_date=day, is_deleted=deleted
+                ))
+                revenues.append(Revenue(
+                    client_id=wallet.client_id, wallet=wallet, name='revenue', description='',
+                    amount=Decimal('20.00'), revenue_date=day, is_deleted=deleted
+                ))
+        for i, wallet in enumerate(wallets[:-1]):
+            other = wallets[i + 1]
+            if other.client_id == wallet.client_id:
+                transfers += [
+                    Transfer(client_id=wallet.client_id, from_wallet=wallet, to_wallet=other, amount=Decimal('1.00'))
+                    for _ in range(ROWS_PER_WALLET // 4)
+                ]
+        Expense.objects.bulk_create(expenses)
+        Revenue.objects.bulk_create(revenues)
+        Transfer.objects.bulk_create(transfers)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(wallet_id=expense.wallet_id, kind=LedgerEntry.EXPENSE, amount=-expense.amount)
+            for expense in expenses
+        ])
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(wallet=wallet, balance=Decimal('1000.00'), taken_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+            for wallet in wallets
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cls.client_profile = clients[3]
+        cls.wallet = Wallet.objects.filter(client=cls.client_profile, is_deleted=False).first()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Con pocas filas el planner puede preferir un seq scan aunque exista un índice;
+            # desactivarlo deja el seq scan solo cuando ningún índice sirve para la consulta.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def get_queryset(self, viewset_class, path):
+        view = viewset_class()
+        request = Request(APIRequestFactory().get(path))
+        request.client = self.client_profile
+        request.user = type('User', (), {'is_authenticated': True})()
+        view.request = request
+        view.format_kwarg = None
+        view.kwargs = {}
+        return view.get_queryset()
+
+    def page_shapes(self, viewset_class, queryset):
+        """Primera página y página siguiente tal como las consulta KeysetPagination"""
+        ordering = viewset_class.ordering
+        first = queryset.order_by(*ordering)
+        row = first.first()
+        position = [getattr(row, name.lstrip('-')) for name in ordering]
+        following = first.filter(KeysetPagination._after(ordering, position))
+        return [first[:51], following[:51], queryset.filter(pk=row.pk)]
+
+    def assertNoSeqScan(self, queryset, tables):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            scans = re.findall(r'Seq Scan on (\w+)', plan)
+        elif connection.vendor == 'sqlite':
+            scans = re.findall(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)', plan)
+        else:
+            self.skipTest(f'EXPLAIN parsing not implemented for {connection.vendor}')
+        offending = [table for table in scans if table in tables]
+        self.assertFalse(offending, f'Sequential scan on {offending}:\n{queryset.query}\n{plan}')
+
+    def test_wallet_queryset(self):
+        queryset = self.get_queryset(WalletViewSet, '/wallets/')
+        for shape in self.page_shapes(WalletViewSet, queryset):
+            self.assertNoSeqScan(shape, {'wallets_wallet'})
+
+    def test_expense_queryset(self):
+        for path in ('/expenses/', f'/expenses/?wallet_id={self.wallet.id}'):
+            queryset = self.get_queryset(ExpenseViewSet, path)
+            for shape in self.page_shapes(ExpenseViewSet, queryset):
+                self.assertNoSeqScan(shape, {'expenses_expense'})
+
+    def test_revenue_queryset(self):
+        for path in ('/revenue/', f'/revenue/?wallet_id={self.wallet.id}'):
+            queryset = self.get_queryset(RevenueViewSet, path)
+            for shape in self.page_shapes(RevenueViewSet, queryset):
+                self.assertNoSeqScan(shape, {'revenue_revenue'})
+
+    def test_dashboard_year_range(self):
+        expenses = Expense.objects.filter(
+            client=self.client_profile, is_deleted=False, expense_date__year=2024
+        ).order_by('-amount')[:5]
+        revenues = Revenue.objects.filter(
+            client=self.client_profile, is_deleted=False, revenue_date__year=2024
+        ).order_by('-amount')[:5]
+        self.assertNoSeqScan(expenses, {'expenses_expense'})
+        self.assertNoSeqScan(revenues, {'revenue_revenue'})
+
+    def test_transfer_history(self):
+        # Como la arma WalletViewSet.transfers: la unión de un rango de cada índice, con y sin cursor
+        paginator = KeysetPagination()
+        ordering = ('-transfer_date', '-id')
+        sides = [Transfer.objects.filter(from_wallet=self.wallet), Transfer.objects.filter(to_wallet=self.wallet)]
+        row = paginator.page_queryset(sides, ordering, None).first()
+        for position in (None, [row.transfer_date, row.id]):
+            self.assertNoSeqScan(paginator.page_queryset(sides, ordering, position)[:51], {'wallets_transfer'})
+
+    def test_balance_at(self):
+        at = datetime(2024, 6, 1, tzinfo=dt_timezone.utc)
+        snapshot = BalanceSnapshot.objects.filter(wallet=self.wallet, taken_at__lte=at).order_by('-taken_at')[:1]
+        entries = LedgerEntry.objects.filter(wallet=self.wallet, created_at__gt=at - timedelta(days=30), created_at__lte=at)
+        self.assertNoSeqScan(snapshot, {'wallets_balancesnapshot'})
+        self.assertNoSeqScan(entries, {'wallets_ledgerentry'})
+
+    def test_collection_etag(self):
+        for model, table in ((Wallet, 'wallets_wallet'), (Expense, 'expenses_expense'), (Revenue, 'revenue_revenue')):
+            queryset = model.objects.filter(client=self.client_profile, is_deleted=False).values('client').annotate(
+                last=Max('updated_at'), count=Count('*')
+            )
+            self.assertNoSeqScan(queryset, {table})
+
+
+class ValuesReadTests(TestCase):
+    """list/retrieve por .values() deben producir el mismo JSON que el ModelSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_profile = Client.objects.create(name='reader', email='reader@example.com')
+        wallets = Wallet.objects.bulk_create([
+            Wallet(client=cls.client_profile, name=name, balance=Decimal('0.00'))
+            for name in ('Efectivo', 'Banco "Nación" ñ')
+        ])
+        amounts = [Decimal('0.01'), Decimal('10'), Decimal('99999999.99'), Decimal('1234.50')]
+        for model, date_field in ((Expense, 'expense_date'), (Revenue, 'revenue_date')):
+            model.objects.bulk_create([
+                model(**{
+                    'client': cls.client_profile, 'wallet': wallets[k % 2], 'name': f'movimiento {k}',
+                    'description': '' if k % 3 else 'línea\ncon "comillas"', 'amount': amounts[k % 4],
+                    date_field: date(2024, 1 + k % 12, 1 + k % 28),
+                })
+                for k in range(30)
+            ])
+
+    def get_view(self, viewset_class, action):
+        view = viewset_class()
+        request = Request(APIRequestFactory().get('/'))
+        request.client = self.client_profile
+        request.user = type('User', (), {'is_authenticated': True})()
+        view.request = request
+        view.format_kwarg = None
+        view.action = action
+        view.kwargs = {}
+        return view
+
+    def test_same_json_as_serializer(self):
+        renderer = JSONRenderer()
+        for viewset_class, serializer_class in ((ExpenseViewSet, ExpenseSerializer), (RevenueViewSet, RevenueSerializer)):
+            view = self.get_view(viewset_class, 'list')
+            queryset = view.get_queryset().order_by(*viewset_class.ordering)
+            expected = renderer.render(serializer_class(queryset, many=True).data)
+            with self.assertNumQueries(1):
+                rows = view.represent(view.read_queryset(queryset))
+            self.assertEqual(renderer.render(rows), expected)
+
+    def test_retrieve_same_json_as_serializer(self):
+        renderer = JSONRenderer()
+        for viewset_class, serializer_class in ((ExpenseViewSet, ExpenseSerializer), (RevenueViewSet, RevenueSerializer)):
+            view = self.get_view(viewset_class, 'retrieve')
+            instance = view.get_queryset().first()
+            view.kwargs = {'pk': str(instance.pk)}
+            response = view.retrieve(view.request, pk=str(instance.pk))
+            self.assertEqual(renderer.render(response.data), renderer.render(serializer_class(instance).data))
+
+
+class RendererTests(SimpleTestCase):
+    """orjson debe dar exactamente los bytes del JSONRenderer de DRF; MessagePack los mismos valores"""
+
+    def payloads(self):
+        # Como sale del serializer de gastos (decimales y fechas ya en texto) y valores sin convertir
+        yield [
+            {
+                'id': k, 'wallet': k % 3 + 1, 'wallet_name': 'Banco "Nación" ñ', 'name': f'movimiento {k}',
+                'description': '' if k % 3 else 'línea\ncon "comillas"', 'amount': f'{k * 1.5:.2f}',
+                'expense_date': f'2024-01-{k % 28 + 1:02d}',
+            }
+            for k in range(20)
+        ]
+        yield {
+            'total': Decimal('1234.50'), 'cero': Decimal('0.00'), 'fecha': date(2024, 2, 29),
+            'creado': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'local': datetime(2024, 5, 1, 9, 0, tzinfo=dt_timezone(timedelta(hours=-3))),
+            'texto': 'línea\u2028separada\u2029 "comillas" \\ / ñ', 'vacio': None, 'lista': [1, 2.5, True],
+        }
+
+    def test_json_same_bytes_as_drf(self):
+        for data in [*self.payloads(), {'enorme': 2 ** 70, 7: 'clave numérica'}]:
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_json_floats_like_drf(self):
+        data = {
+            'grande': 1e16, 'chico': 1e-05, 'minimo': 5e-324, 'negativo': -1.5e300, 'decimal': Decimal('1E+20'),
+            'normales': [0.0, -0.0, 0.0001, 9999999999999998.0, 0.1, Decimal('0.00001')],
+            'filas': [{'monto': 2.5}, {'monto': 1e17}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'"grande":1e+16', ORJSONRenderer().render(data))
+        for value in (float('nan'), float('inf'), -float('inf'), Decimal('NaN')):
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                with self.assertRaises(ValueError):
+                    renderer.render({'filas': [{'monto': 1.0}, {'monto': value}]})
+
+    def test_json_parser(self):
+        data = {'name': 'ñandú', 'amount': '10.50', 'wallet': 1}
+        self.assertEqual(ORJSONParser().parse(BytesIO(ORJSONRenderer().render(data))), data)
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"name": '))
+
+    def test_msgpack_round_trip(self):
+        for data in self.payloads():
+            expected = ORJSONParser().parse(BytesIO(ORJSONRenderer().render(data)))
+            parsed = MessagePackParser().parse(BytesIO(MessagePackRenderer().render(data)))
+            self.assertEqual(parsed, expected)
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(BytesIO(b'\xc1'))
+
+
+class MetricsTests(SimpleTestCase):
+    """Formato Prometheus y suma de los archivos de varios workers (también los que ya terminaron)"""
+
+    buckets = (0.1, 1)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = metrics.Registry(self.directory, self.buckets, interval=3600, stale_after=60)
+        self.addCleanup(self.registry.retire)
+
+    def worker_file(self, name, requests, cache=None):
+        path = os.path.join(self.directory, name)
+        metrics._write(path, {'buckets': self.buckets, 'requests': requests, 'cache': cache or {}})
+        return path
+
+    def test_render(self):
+        requests = {('wallets-list', 'GET', 200): [3, 1, 1, 2.5, 12]}
+        cache = {'wallets': {'hits': 3, 'misses': 1}, 'dashboard': {'hits': 0, 'misses': 0}}
+        self.assertEqual(metrics.render(requests, cache, self.buckets), '\n'.join([
+            '# HELP http_request_duration_seconds Request latency by view, method and status.',
+            '# TYPE http_request_duration_seconds histogram',
+            'http_request_duration_seconds_bucket{view="wallets-list",method="GET",status="200",le="0.1"} 3',
+            'http_request_duration_seconds_bucket{view="wallets-list",method="GET",status="200",le="1"} 4',
+            'http_request_duration_seconds_bucket{view="wallets-list",method="GET",status="200",le="+Inf"} 5',
+            'http_request_duration_seconds_sum{view="wallets-list",method="GET",status="200"} 2.500000',
+            'http_request_duration_seconds_count{view="wallets-list",method="GET",status="200"} 5',
+            '# HELP http_request_db_queries_total SQL queries executed while serving requests.',
+            '# TYPE http_request_db_queries_total counter',
+            'http_request_db_queries_total{view="wallets-list",method="GET",status="200"} 12',
+            '# HELP response_cache_requests_total Response cache lookups by endpoint and result.',
+            '# TYPE response_cache_requests_total counter',
+            'response_cache_requests_total{endpoint="dashboard",result="hits"} 0',
+            'response_cache_requests_total{endpoint="dashboard",result="misses"} 0',
+            'response_cache_requests_total{endpoint="wallets",result="hits"} 3',
+            'response_cache_requests_total{endpoint="wallets",result="misses"} 1',
+            '# HELP response_cache_hit_ratio Share of response cache lookups served from the cache.',
+            '# TYPE response_cache_hit_ratio gauge',
+            'response_cache_hit_ratio{endpoint="dashboard"} 0.0000',
+            'response_cache_hit_ratio{endpoint="wallets"} 0.7500',
+        ]) + '\n')
+        self.assertIn('{view="a\\"b\\nc"', metrics.render({('a"b\nc', 'GET', 200): [1, 0, 0, 0.0, 0]}, {}, self.buckets))
+
+    def test_collect_sums_workers(self):
+        self.worker_file('100-1.json', [['wallets-list', 'GET', 200, 1, 0, 0, 0.05, 3]], {'wallets': {'hits': 1, 'misses': 0}})
+        self.worker_file('100-2.json', [['wallets-list', 'GET', 200, 0, 2, 0, 0.9, 6]], {'wallets': {'hits': 0, 'misses': 2}})
+        # Otros buckets (configuración vieja): se ignora
+        metrics._write(os.path.join(self.directory, '200-1.json'), {
+            'buckets': [5], 'requests': [['wallets-list', 'GET', 200, 9, 9, 9.0, 9]], 'cache': {}
+        })
+        self.registry.observe('wallets-list', 'GET', 200, 2.0, 1)
+        requests, cache = self.registry.collect()
+        counts = requests[('wallets-list', 'GET', 200)]
+        self.assertEqual(counts[:3] + counts[4:], [1, 2, 1, 10])
+        self.assertAlmostEqual(counts[3], 2.95)
+        self.assertEqual(cache['wallets'], {'hits': 1, 'misses': 2})
+
+    def test_finished_workers_are_archived(self):
+        self.worker_file('100-1.json', [['expenses-list', 'GET', 200, 4, 0, 0, 0.2, 8]])
+        stale = self.worker_file('100-2.json', [['expenses-list', 'GET', 200, 1, 0, 0, 0.01, 2]])
+        old = time.time() - 120
+        os.utime(stale, (old, old))
+        before = self.registry.collect()
+        # El archivo viejo (p. ej. un worker matado) pasa a archive.json: los totales no bajan
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, metrics.ARCHIVE)))
+        self.assertEqual(self.registry.collect(), before)
+
+        # Un worker que sale suma lo suyo al archivo y borra su archivo; uno nuevo con el mismo pid no lo pisa
+        worker = metrics.Registry(self.directory, self.buckets, interval=3600, stale_after=60)
+        worker.observe('expenses-list', 'GET', 200, 0.5, 4)
+        worker.flush()
+        self.assertNotEqual(worker.path, self.registry.path)
+        worker.retire()
+        self.assertFalse(os.path.exists(worker.path))
+        requests, cache = self.registry.collect()
+        counts = requests[('expenses-list', 'GET', 200)]
+        self.assertEqual(counts[:3] + counts[4:], [5, 1, 0, 14])
+        self.assertAlmostEqual(counts[3], 0.71)
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted([
+            '100-1.json', metrics.ARCHIVE, metrics.ARCHIVE_LOCK, os.path.basename(self.registry.path)
+        ]))
+
+    def test_lazy_registry(self):
+        with mock.patch.object(metrics, '_registry', None), override_settings(METRICS_DIR=self.directory):
+            # Sin METRICS_ENABLED el middleware no se instala y no crea el registro
+            with override_settings(METRICS_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+                metrics.MetricsMiddleware(lambda request: None)
+            self.assertIsNone(metrics._registry)
+
+            with override_settings(METRICS_ENABLED=True):
+                middleware = metrics.MetricsMiddleware(lambda request: None)
+            registry = metrics.get_registry()
+            self.addCleanup(registry.retire)
+            self.assertIs(middleware.registry, registry)
+            self.assertIs(metrics.get_registry(), registry)
+            self.assertEqual(os.path.dirname(registry.path), self.directory)
+
+
+@override_settings(METRICS_TOKEN='token-del-scraper')
+class MetricsViewTests(TestCase):
+    """/metrics/ responde a staff o al scraper con METRICS_TOKEN, a nadie más"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry = metrics.Registry(directory.name, (0.1, 1), interval=3600, stale_after=60)
+        self.addCleanup(registry.retire)
+        patcher = mock.patch.object(metrics, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, authorization=None):
+        api = APIClient()
+        if authorization:
+            api.credentials(HTTP_AUTHORIZATION=authorization)
+        return api.get('/metrics/', secure=True)
+
+    def test_access(self):
+        response = self.get('Bearer token-del-scraper')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram', response.content)
+
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get('Bearer otro-token').status_code, 401)
+        user = User.objects.create_user('comun', 'comun@example.com')
+        Client.objects.create(name='comun', email=user.email)
+        token = ClientRefreshToken.for_user(user).access_token
+        self.assertEqual(self.get(f'Bearer {token}').status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.get(f'Bearer {token}').status_code, 200)
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(ClientAPITestCase):
+    """REQUEST_TIMING: cabecera Server-Timing y línea de log JSON.
+
+    override_settings alcanza: el cliente de tests arma un handler (y sus middlewares) por request.
+    """
+
+    username = 'medido'
+
+    def test_server_timing(self):
+        with self.assertLogs('API_revenue_portfolio.timing', 'INFO') as logs:
+            response = self.api.get('/wallets/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        timings = dict(timing.split(';', 1) for timing in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timings), ['db', 'view', 'render', 'total'])
+        self.assertRegex(timings['db'], r'^dur=[0-9.]+;desc="[0-9]+ queries"$')
+        self.assertRegex(timings['render'], r'^dur=[0-9.]+$')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status'], record['repeated_queries']), ('/wallets/', 200, []))
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(record['render_ms'], record['total_ms'])
+
+    @override_settings(REQUEST_TIMING_REPEAT_THRESHOLD=2)
+    def test_repeated_queries(self):
+        body = [
+            {'wallet': self.wallet.id, 'name': f'gasto {k}', 'description': '', 'amount': '1.00',
+             'expense_date': '2024-05-01'}
+            for k in range(3)
+        ]
+        with self.assertLogs('API_revenue_portfolio.timing', 'WARNING') as logs:
+            response = self.api.post('/batch/', {'requests': [
+                {'method': 'POST', 'path': '/expenses/', 'body': item} for item in body
+            ]}, format='json', secure=True)
+        self.assertIn('repeated;desc=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(all(item['count'] >= 2 for item in record['repeated_queries']))
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled(self):
+        self.assertFalse(self.api.get('/wallets/', secure=True).has_header('Server-Timing'))
+
+
+
+class ConditionalGetTests(ClientAPITestCase):
+    """ETag / If-None-Match de list y retrieve: 304 sin cuerpo mientras nada cambie"""
+
+    username = 'condicional'
+
+    def setUp(self):
+        super().setUp()
+        self.other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('0.00'))
+
+    def get(self, url, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.api.get(url, secure=True, headers=headers)
+
+    def etag(self, url):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        return response['ETag']
+
+    def assert_not_modified(self, url, etag, header=None):
+        response = self.get(url, header or etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def assert_changed(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_not_modified(self):
+        for url in ('/expenses/', '/wallets/', f'/wallets/{self.wallet.id}/'):
+            etag = self.etag(url)
+            self.assert_not_modified(url, etag)
+            # Comparación débil y lista de candidatos
+            self.assert_not_modified(url, etag, f'"otro", {etag.removeprefix("W/")}')
+        self.assertEqual(self.get('/wallets/', '"otro"').status_code, 200)
+
+    def test_writes_change_collection_etag(self):
+        url = '/expenses/'
+        etag = self.etag(url)
+        body = {
+            'wallet': self.wallet.id, 'name': 'café', 'description': '', 'amount': '3.00', 'expense_date': '2024-05-01'
+        }
+        expense_id = self.api.post(url, body, format='json', secure=True).json()['id']
+        etag = self.assert_changed(url, etag)
+        self.assert_not_modified(url, etag)
+
+        response = self.api.patch(f'{url}{expense_id}/', {'name': 'té'}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        etag = self.assert_changed(url, etag)
+
+        # El nombre de la billetera aparece en cada gasto (etag_dependencies)
+        self.api.patch(f'/wallets/{self.wallet.id}/', {'name': 'Caja'}, format='json', secure=True)
+        etag = self.assert_changed(url, etag)
+
+        self.assertEqual(self.api.delete(f'{url}{expense_id}/', secure=True).status_code, 204)
+        self.assertTrue(Expense.objects.filter(pk=expense_id, is_deleted=True).exists())
+        self.assert_changed(url, etag)
+
+    def test_balance_changes_wallet_etags(self):
+        urls = ['/wallets/', f'/wallets/{self.other.id}/']
+        etags = [self.etag(url) for url in urls]
+        wallet_services.transfer(self.client_profile.id, self.wallet.id, self.other.id, Decimal('5.00'), 'ahorro')
+        etags = [self.assert_changed(url, etag) for url, etag in zip(urls, etags)]
+
+        # Un crédito pendiente no toca updated_at de la billetera pero sí su saldo visible
+        Wallet.objects.filter(pk=self.other.pk).update(is_hot=True)
+        etags = [self.etag(url) for url in urls]
+        self.assertIsNotNone(wallet_services.credit(self.other.id, Decimal('2.00'), LedgerEntry.DEPOSIT))
+        self.assertEqual(Wallet.objects.get(pk=self.other.pk).balance, Decimal('5.00'))
+        for url, etag in zip(urls, etags):
+            self.assert_changed(url, etag)
+
+    def test_etag_depends_on_media_type(self):
+        url = f'/wallets/{self.wallet.id}/'
+        etags = [self.etag(url), self.etag(f'{url}?format=msgpack')]
+        response = self.api.get(url, secure=True, headers={'Accept': 'application/msgpack'})
+        etags.append(response['ETag'])
+        self.assertNotEqual(etags[0], etags[1])
+        self.assertNotEqual(etags[0], etags[2])
+        # Un ETag de la versión JSON no sirve para pedir msgpack
+        headers = {'Accept': 'application/msgpack', 'If-None-Match': etags[0]}
+        response = self.api.get(url, secure=True, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        list_etags = {self.etag('/expenses/'), self.etag('/expenses/?format=msgpack')}
+        self.assertEqual(len(list_etags), 2)
+
+
+class ExportTests(ClientAPITestCase):
+    """Exports en streaming (CSV y NDJSON): cabecera, filas y filtros de fecha"""
+
+    username = 'exportador'
+
+    def setUp(self):
+        super().setUp()
+        self.other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('50.00'))
+        self.expenses = Expense.objects.bulk_create([
+            Expense(client=self.client_profile, wallet=self.wallet, name=f'gasto {day}', description='a, "b"',
+                    amount=Decimal(f'{day}.50'), expense_date=date(2024, 1, day))
+            for day in (5, 10, 15, 20)
+        ])
+
+    def export(self, url, **params):
+        response = self.api.get(url, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def csv_rows(self, url, **params):
+        response, content = self.export(url, format='csv', **params)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_expenses_csv(self):
+        header, *rows = self.csv_rows('/expenses/export/')
+        self.assertEqual(header, ['id', 'wallet', 'wallet_name', 'name', 'description', 'amount', 'expense_date'])
+        self.assertEqual(rows[0], [
+            str(self.expenses[0].id), str(self.wallet.id), 'Efectivo', 'gasto 5', 'a, "b"', '5.50', '2024-01-05'
+        ])
+        self.assertEqual([row[6] for row in rows], ['2024-01-05', '2024-01-10', '2024-01-15', '2024-01-20'])
+
+        # Los dos extremos son inclusivos
+        header, *rows = self.csv_rows('/expenses/export/', date_from='2024-01-10', date_to='2024-01-15')
+        self.assertEqual([row[6] for row in rows], ['2024-01-10', '2024-01-15'])
+        self.assertEqual(self.csv_rows('/expenses/export/', date_from='2024-02-01'), [header])
+
+    def test_expenses_ndjson(self):
+        response, content = self.export('/expenses/export/', format='ndjson', date_to='2024-01-10')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.ndjson"')
+        self.assertTrue(content.endswith('\n'))
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows[0], {
+            'id': self.expenses[0].id, 'wallet': self.wallet.id, 'wallet_name': 'Efectivo', 'name': 'gasto 5',
+            'description': 'a, "b"', 'amount': '5.50', 'expense_date': '2024-01-05',
+        })
+        self.assertEqual([row['expense_date'] for row in rows], ['2024-01-05', '2024-01-10'])
+
+    def test_invalid_date(self):
+        response = self.api.get('/expenses/export/', {'format': 'csv', 'date_from': '2024-02-30'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(list(csv.reader(io.StringIO(response.content.decode()))), [
+            ['date_from'], ['Invalid date, use YYYY-MM-DD']
+        ])
+        response = self.api.get('/wallets/transfers/export/', {'format': 'ndjson', 'date_to': 'ayer'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'date_to': 'Invalid date, use YYYY-MM-DD'})
+
+    def test_transfers_both_directions(self):
+        third = wallet_services.open_wallet(self.client_profile, 'Ahorro', '', Decimal('0.00'))
+        moves = [
+            (self.wallet, self.other, datetime(2024, 1, 5, 10, tzinfo=dt_timezone.utc)),
+            (self.other, self.wallet, datetime(2024, 1, 10, 23, 59, tzinfo=dt_timezone.utc)),
+            (self.other, third, datetime(2024, 1, 11, tzinfo=dt_timezone.utc)),
+        ]
+        ids = []
+        for source, destination, moment in moves:
+            transfer, _, _ = wallet_services.transfer(
+                self.client_profile.id, source.id, destination.id, Decimal('1.00'), 'movimiento'
+            )
+            Transfer.objects.filter(pk=transfer.pk).update(transfer_date=moment)
+            ids.append(str(transfer.pk))
+
+        header, *rows = self.csv_rows('/wallets/transfers/export/', wallet_id=self.wallet.id)
+        self.assertEqual(header, [
+            'id', 'from_wallet', 'from_wallet_name', 'to_wallet', 'to_wallet_name', 'amount', 'description',
+            'transfer_date'
+        ])
+        self.assertEqual([row[0] for row in rows], ids[:2])
+        self.assertEqual(rows[1][1:6], [str(self.other.id), 'Banco', str(self.wallet.id), 'Efectivo', '1.00'])
+        self.assertEqual(rows[1][7], '2024-01-10T23:59:00+00:00')
+
+        header, *rows = self.csv_rows('/wallets/transfers/export/', wallet_id=self.other.id, date_from='2024-01-10')
+        self.assertEqual([row[0] for row in rows], ids[1:])
+        header, *rows = self.csv_rows('/wallets/transfers/export/', date_to='2024-01-10')
+        self.assertEqual([row[0] for row in rows], ids[:2])
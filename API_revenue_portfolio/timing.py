@@ -0,0 +1,108 @@
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, %s) con distinta cantidad de parámetros es la misma forma de consulta
+_PARAM_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+def query_shape(sql):
+    return _PARAM_LIST.sub('%s, ...', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper que cuenta consultas, suma su duración y agrupa por forma (SQL sin parámetros)"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold):
+        """Formas ejecutadas `threshold` veces o más en el request (típico N+1), de mayor a menor"""
+        return sorted(
+            ((shape, count) for shape, count in self.shapes.items() if count >= threshold),
+            key=lambda item: -item[1]
+        )
+
+
+class RequestTimingMiddleware:
+    """Mide cada request y lo devuelve en la cabecera Server-Timing y en una línea de log JSON.
+
+    - db: consultas SQL (cantidad y tiempo total)
+    - view: la vista (incluye sus consultas y el armado de serializer.data)
+    - render: response.render(), el paso de los datos ya serializados a bytes (JSON u otro formato)
+    - total: todo el request visto desde este middleware
+    Además avisa las consultas repetidas con la misma forma (N+1). Se activa con REQUEST_TIMING.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.REQUEST_TIMING_REPEAT_THRESHOLD
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._timing_render = [0.0, 0.0]
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        render_started, render_finished = request._timing_render
+        render = max(render_finished - render_started, 0.0)
+        repeated = recorder.repeated(self.threshold)
+        metrics = [
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'view;dur={(total - render) * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if repeated:
+            metrics.append(f'repeated;desc="{len(repeated)} repeated query shapes"')
+        response['Server-Timing'] = ', '.join(metrics)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'view_ms': round((total - render) * 1000, 2),
+            'render_ms': round(render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repeated_queries': [{'sql': shape, 'count': count} for shape, count in repeated],
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(record), extra={'timing': record})
+        return response
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan después de este hook; se mide con un callback
+        timing = getattr(request, '_timing_render', None)
+        if timing is not None:
+            timing[0] = time.perf_counter()
+
+            def finished(rendered):
+                timing[1] = time.perf_counter()
+            response.add_post_render_callback(finished)
+        return response
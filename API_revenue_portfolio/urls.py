@@ -3,6 +3,8 @@ from django.urls import include, path, re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .batch import batch
+from .metrics import metrics
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -23,6 +25,8 @@ urlpatterns = [
     path('wallets/', include('wallets.urls')),
     path('expenses/', include('expenses.urls')),
     path('revenue/', include('revenue.urls')),
+    path('batch/', batch, name='batch'),
+    path('metrics/', metrics, name='metrics'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0001_initial"),
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["client", "expense_date", "id"],
+                name="expense_client_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["wallet", "expense_date", "id"],
+                name="expense_wallet_date_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0002_keyset_indexes"),
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0002_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="expense",
+            name="expense_client_date_id_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="expense",
+            name="expense_wallet_date_id_idx",
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["client", "expense_date", "id"],
+                name="expense_client_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["wallet", "expense_date", "id"],
+                name="expense_wallet_date_id_idx",
+            ),
+        ),
+    ]
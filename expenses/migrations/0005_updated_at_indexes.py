@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0004_import_hash"),
+        ("users", "0003_client_data_version"),
+        ("wallets", "0006_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["client", "updated_at"],
+                name="expense_client_updated_idx",
+            ),
+        ),
+    ]
@@ -11,8 +11,37 @@ class Expense(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     expense_date = models.DateField()
     is_deleted = models.BooleanField(default=False)
+    # Sube en cada edición (UPDATE ... WHERE version = n, ver conditional.compare_and_swap);
+    # db_default para los INSERT/COPY en SQL de import_transactions y seed_scale
+    version = models.PositiveIntegerField(default=1, db_default=1, editable=False)
+    # Hash del contenido de la línea del extracto importado (evita duplicar al reimportar)
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Índices parciales (solo filas vivas) para los filtros por cliente/billetera + rango de fechas
+        indexes = [
+            models.Index(
+                fields=['client', 'expense_date', 'id'], name='expense_client_date_id_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            models.Index(
+                fields=['wallet', 'expense_date', 'id'], name='expense_wallet_date_id_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            # ETag de las listas (max(updated_at) y COUNT(*) sin leer la tabla)
+            models.Index(
+                fields=['client', 'updated_at'], name='expense_client_updated_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['wallet', 'import_hash'], name='expense_wallet_import_hash_uniq',
+                condition=models.Q(import_hash__isnull=False)
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name}: {self.description} - {self.amount}"
\ No newline at end of file
@@ -1,10 +1,20 @@
+from decimal import Decimal
 from rest_framework import serializers
+from API_revenue_portfolio.fastread import SparseFieldsMixin
 from .models import Expense
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     wallet_name = serializers.CharField(source='wallet.name', read_only=True)
     
     class Meta:
         model = Expense
         fields = ['id', 'wallet', 'wallet_name', 'name', 'description', 'amount', 'expense_date']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class ExpenseBulkItemSerializer(serializers.Serializer):
+    """Item de /expenses/bulk/; valida sin consultar la base (las billeteras se validan juntas)"""
+    wallet = serializers.IntegerField()
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(allow_blank=True, required=False, default='')
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    expense_date = serializers.DateField()
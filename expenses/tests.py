@@ -1,3 +1,266 @@
-from django.test import TestCase
+import json
+from base64 import urlsafe_b64encode
+from datetime import date
+from decimal import Decimal
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from API_revenue_portfolio.conditional import VersionConflict, compare_and_swap
+from API_revenue_portfolio.testing import ClientAPITestCase
+from rollups.models import MonthlyRollup
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import LedgerEntry
+from .models import Expense
+
+
+class OptimisticWriteTests(ClientAPITestCase):
+    """version + If-Match: una escritura sobre datos viejos no pisa la de otro ni descuadra el balance"""
+
+    username = 'optimista'
+
+    def setUp(self):
+        super().setUp()
+        response = self.api.post('/expenses/', {
+            'wallet': self.wallet.id, 'name': 'Super', 'description': '', 'amount': '10.00',
+            'expense_date': '2024-05-01',
+        }, format='json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/expenses/{response.data['id']}/"
+
+    def patch(self, data, **headers):
+        return self.api.patch(self.url, data, format='json', secure=True, headers=headers)
+
+    def test_if_match(self):
+        etag = self.api.get(self.url, secure=True)['ETag']
+        self.assertTrue(etag.startswith('"1.'))
+        response = self.patch({'amount': '20.00'}, if_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"2.'))
+        self.assertEqual(self.balance(), Decimal('80.00'))
+
+        # Con el ETag viejo (o uno débil) no se aplica y se devuelve el actual
+        for stale in (etag, 'W/' + response['ETag']):
+            conflict = self.patch({'amount': '50.00'}, if_match=stale)
+            self.assertEqual(conflict.status_code, 412)
+            self.assertEqual(conflict['ETag'], response['ETag'])
+        self.assertEqual(self.balance(), Decimal('80.00'))
+
+        self.assertEqual(self.patch({'amount': '5.00'}, if_match=f"{etag}, {response['ETag']}").status_code, 200)
+        self.assertEqual(self.patch({'amount': '6.00'}, if_match='*').status_code, 200)
+        self.assertEqual(self.balance(), Decimal('94.00'))
+        self.assertEqual(self.api.delete(self.url, secure=True, headers={'If-Match': etag}).status_code, 412)
+
+    def test_compare_and_swap(self):
+        first = Expense.objects.get(client=self.client_profile)
+        second = Expense.objects.get(client=self.client_profile)
+        compare_and_swap(first, amount=Decimal('30.00'))
+        self.assertEqual((first.version, first.amount), (2, Decimal('30.00')))
+        # La segunda copia leyó la versión 1: su UPDATE no encuentra la fila
+        with self.assertRaises(VersionConflict):
+            compare_and_swap(second, is_deleted=True)
+        row = Expense.objects.get(pk=first.pk)
+        self.assertEqual((row.version, row.amount, row.is_deleted), (2, Decimal('30.00'), False))
+
+    def test_move_to_other_wallet(self):
+        other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('50.00'))
+        response = self.patch({'wallet': other.id, 'amount': '15.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.balance(), self.balance(other)), (Decimal('100.00'), Decimal('35.00')))
+        rollups = dict(MonthlyRollup.objects.filter(client=self.client_profile).values_list('wallet', 'expense_total'))
+        self.assertEqual(rollups, {self.wallet.id: Decimal('0.00'), other.id: Decimal('15.00')})
+
+        stranger = Client.objects.create(name='otro', email='otro@example.com')
+        foreign = wallet_services.open_wallet(stranger, 'Ajena', '', Decimal('50.00'))
+        self.assertEqual(self.patch({'wallet': foreign.id}).status_code, 404)
+        self.assertEqual(self.balance(foreign), Decimal('50.00'))
+
+
+class SparseFieldsTests(ClientAPITestCase):
+    """?fields= lee solo las columnas pedidas"""
+
+    username = 'ralo'
+
+    def setUp(self):
+        super().setUp()
+        other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('0.00'))
+        wallet_services.transfer(self.client_profile.id, self.wallet.id, other.id, Decimal('5.00'), 'ahorro')
+        Expense.objects.bulk_create([
+            Expense(client=self.client_profile, wallet=self.wallet, name=f'gasto {k}', description='detalle',
+                    amount=Decimal('1.00'), expense_date=date(2024, 1, 1 + k))
+            for k in range(3)
+        ])
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.api.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), ' '.join(query['sql'] for query in captured)
+
+    def test_only_requested_columns(self):
+        data, sql = self.get('/expenses/?fields=amount,name&page_size=2')
+        self.assertEqual([list(item) for item in data['results']], [['name', 'amount']] * 2)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"wallets_wallet"."name"', sql)
+        # El cursor sigue funcionando aunque fecha e id no se devuelvan
+        self.assertEqual(len(self.get(data['next'])[0]['results']), 1)
+
+        data, sql = self.get(f'/expenses/{Expense.objects.first().id}/?fields=wallet_name')
+        self.assertEqual(data, {'wallet_name': 'Efectivo'})
+
+        data, sql = self.get('/wallets/?fields=name')
+        self.assertEqual([item['name'] for item in data['results']], ['Efectivo', 'Banco'])
+        self.assertEqual({len(item) for item in data['results']}, {1})
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"balance"', sql)
+
+        data, sql = self.get(f'/wallets/{self.wallet.id}/transfers/?fields=amount,to_wallet_name')
+        self.assertEqual(data['transfers'], [{'to_wallet_name': 'Banco', 'amount': '5.00'}])
+        self.assertNotIn('"wallets_transfer"."description"', sql)
+
+    def test_unknown_field(self):
+        response = self.api.get('/wallets/?fields=name,password', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', str(response.data['fields']))
+
+
+class KeysetPaginationTests(ClientAPITestCase):
+    """Paginación por cursor sobre (expense_date, id): sin filas repetidas ni salteadas, ni COUNT"""
+
+    username = 'paginado'
+
+    def setUp(self):
+        super().setUp()
+        # Varias filas por fecha: el desempate por id es lo que separa las páginas dentro de un mismo día
+        Expense.objects.bulk_create([
+            Expense(client=self.client_profile, wallet=self.wallet, name=f'gasto {k}', amount=Decimal('1.00'),
+                    expense_date=date(2024, 1, 1 + k % 3))
+            for k in range(8)
+        ])
+        expenses = Expense.objects.filter(client=self.client_profile).order_by('-expense_date', '-id')
+        self.expected = list(expenses.values_list('id', flat=True))
+
+    def page(self, url):
+        response = self.api.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(list(data), ['next', 'previous', 'results'])
+        return data
+
+    def cursor(self, payload):
+        return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_walk_pages(self):
+        pages = [self.page('/expenses/?page_size=3')]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 2])
+        self.assertEqual([item['id'] for page in pages for item in page['results']], self.expected)
+
+        # De vuelta con previous: las mismas páginas, en el mismo orden interno
+        back = [pages[-1]]
+        while back[-1]['previous']:
+            back.append(self.page(back[-1]['previous']))
+        self.assertEqual(
+            [[item['id'] for item in page['results']] for page in reversed(back)],
+            [[item['id'] for item in page['results']] for page in pages]
+        )
+        self.assertIsNotNone(back[-1]['next'])
+
+    def test_same_date_tie_break(self):
+        # Cada página corta en medio de un día: sin el id en el cursor se repetirían o perderían filas
+        url, seen = '/expenses/?page_size=1', []
+        while url:
+            data = self.page(url)
+            seen.extend(item['id'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_invalid_cursor(self):
+        cursors = [
+            'no-es-un-cursor', '%%%', self.cursor([1, 2]), self.cursor({'p': 5}), self.cursor({'p': ['2024-01-01']}),
+            self.cursor({'p': ['ayer', 1]}), self.cursor({'p': ['2024-01-01', 'uno']}),
+            self.cursor({'p': [None, 1]}), self.cursor({'p': ['2024-01-01', None]}),
+            self.cursor({'p': [{'a': 1}, 1]}), self.cursor({'p': ['2024-01-01', 10 ** 30]}),
+            urlsafe_b64encode(b'\xff\xfe').decode(),
+        ]
+        for cursor in cursors:
+            response = self.api.get('/expenses/', {'cursor': cursor}, secure=True)
+            self.assertIn(response.status_code, (400, 404), cursor)
+
+
+class BulkExpenseTests(ClientAPITestCase):
+    """POST /expenses/bulk/: todo el lote o nada, con el saldo controlado sobre el total por billetera"""
+
+    username = 'masivo'
+
+    def setUp(self):
+        super().setUp()
+        self.other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('50.00'))
+
+    def item(self, wallet, amount, day=date(2024, 1, 15)):
+        return {'wallet': wallet.id, 'name': 'gasto', 'amount': amount, 'expense_date': day.isoformat()}
+
+    def bulk(self, items):
+        return self.api.post('/expenses/bulk/', items, format='json', secure=True)
+
+    def assert_nothing_created(self):
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('100.00'), Decimal('50.00')))
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(LedgerEntry.objects.exclude(kind=LedgerEntry.OPENING).exists())
+        self.assertFalse(MonthlyRollup.objects.exists())
+
+    def test_bulk(self):
+        response = self.bulk([
+            self.item(self.wallet, '10.00'), self.item(self.wallet, '2.50', date(2024, 1, 31)),
+            self.item(self.wallet, '7.25', date(2024, 2, 1)), self.item(self.other, '50.00'),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 4, 'wallets': [
+            {'id': self.wallet.id, 'balance': '80.25'}, {'id': self.other.id, 'balance': '0.00'},
+        ]})
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('80.25'), Decimal('0.00')))
+
+        expenses = Expense.objects.filter(client=self.client_profile)
+        entries = LedgerEntry.objects.filter(kind=LedgerEntry.EXPENSE)
+        self.assertEqual(
+            sorted(entries.values_list('reference_id', 'wallet_id', 'amount')),
+            sorted((expense.id, expense.wallet_id, -expense.amount) for expense in expenses)
+        )
+        rollups = MonthlyRollup.objects.filter(client=self.client_profile).values_list(
+            'wallet_id', 'month', 'expense_total', 'expense_count'
+        )
+        self.assertEqual(sorted(rollups), sorted([
+            (self.wallet.id, date(2024, 1, 1), Decimal('12.50'), 2),
+            (self.wallet.id, date(2024, 2, 1), Decimal('7.25'), 1),
+            (self.other.id, date(2024, 1, 1), Decimal('50.00'), 1),
+        ]))
+
+    def test_total_over_balance(self):
+        # Cada gasto de Banco entra solo (30 <= 50) pero no los dos juntos; el de Efectivo se deshace también
+        response = self.bulk([
+            self.item(self.wallet, '10.00'), self.item(self.other, '30.00'), self.item(self.other, '30.00'),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Insufficient balance', 'wallet': self.other.id})
+        self.assert_nothing_created()
+
+    def test_other_client_wallet(self):
+        stranger = Client.objects.create(name='otro', email='otro@example.com')
+        foreign = wallet_services.open_wallet(stranger, 'Ajena', '', Decimal('50.00'))
+        response = self.bulk([self.item(self.wallet, '1.00'), self.item(foreign, '1.00')])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['wallets'], [foreign.id])
+        self.assert_nothing_created()
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_limits(self):
+        response = self.bulk([self.item(self.wallet, '1.00')] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'At most 2 expenses per request'})
+        self.assertEqual(self.bulk([]).status_code, 400)
+        self.assertEqual(self.bulk([self.item(self.wallet, '1.00'), self.item(self.wallet, '0')]).status_code, 400)
+        self.assert_nothing_created()
+        self.assertEqual(self.bulk([self.item(self.wallet, '1.00')] * 2).status_code, 201)
 
-# Create your tests here.
@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def replay(record, digest):
+    if record.request_hash != digest:
+        return Response(
+            {"error": "Idempotency-Key already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view_method):
+    """Hace idempotente una acción POST de un viewset cuando el cliente envía Idempotency-Key.
+
+    La clave se reserva (INSERT sobre el índice único client+key) en la misma transacción
+    que la operación, así un reintento concurrente espera a que termine la primera y luego
+    recibe la respuesta guardada. Un reintento posterior la obtiene con una sola consulta.
+    Las respuestas 5xx o con rollback no se guardan: el reintento vuelve a ejecutar.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        client = getattr(request, 'client', None)
+        if not key or client is None:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = request_hash(request)
+        keys = IdempotencyKey.objects.filter(client_id=client.id, key=key)
+        record = keys.first()
+        if record is not None:
+            if record.created_at >= timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL):
+                return replay(record, digest)
+            # Vencida pero todavía no purgada: se trata como una clave nueva
+            keys.filter(pk=record.pk).delete()
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        client_id=client.id, key=key, request_hash=digest, status_code=0
+                    )
+            except IntegrityError:
+                record = None
+            if record is not None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500 and not transaction.get_rollback():
+                    record.status_code = response.status_code
+                    record.response = response.data
+                    record.save(update_fields=['status_code', 'response'])
+                else:
+                    transaction.set_rollback(True)
+                return response
+
+        # Otro request con la misma clave terminó mientras esperábamos el índice único
+        record = keys.first()
+        if record is None:
+            return Response(
+                {"error": f"A request with this {HEADER} failed, retry it"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return replay(record, digest)
+
+    return wrapper
@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from API_revenue_portfolio.testing import ClientAPITestCase
+from expenses.models import Expense
+from .decorators import HEADER, REPLAYED_HEADER, idempotent
+from .models import IdempotencyKey
+
+
+class IdempotentCreateTests(ClientAPITestCase):
+    """Un POST reintentado con la misma Idempotency-Key se ejecuta una sola vez"""
+
+    username = 'idempotente'
+
+    def create_expense(self, key, amount='10.00'):
+        body = {
+            'wallet': self.wallet.id, 'name': 'café', 'description': '', 'amount': amount,
+            'expense_date': date(2024, 3, 9).isoformat(),
+        }
+        return self.api.post('/expenses/', body, format='json', secure=True, headers={HEADER: key})
+
+    def test_replay_returns_stored_response(self):
+        first = self.create_expense('clave-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(first.has_header(REPLAYED_HEADER))
+
+        retry = self.create_expense('clave-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry[REPLAYED_HEADER], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Expense.objects.filter(client=self.client_profile).count(), 1)
+        self.assertEqual(self.balance(), Decimal('90.00'))
+
+    def test_same_key_different_body(self):
+        self.create_expense('clave-1')
+        response = self.create_expense('clave-1', amount='20.00')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Expense.objects.filter(client=self.client_profile).count(), 1)
+        self.assertEqual(self.balance(), Decimal('90.00'))
+
+    def test_first_attempt_failed(self):
+        # El INSERT choca con la clave de un request concurrente que después hizo rollback
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=IntegrityError):
+            response = self.create_expense('clave-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Expense.objects.filter(client=self.client_profile).exists())
+        # El reintento ejecuta normalmente
+        self.assertEqual(self.create_expense('clave-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.balance(), Decimal('90.00'))
+
+    def test_server_error_is_not_stored(self):
+        responses = [
+            Response({'error': 'Service unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE),
+            Response({'id': 1}, status=status.HTTP_201_CREATED),
+        ]
+
+        class View:
+            @idempotent
+            def create(self, request):
+                return responses.pop(0)
+
+        def post():
+            django_request = APIRequestFactory().post('/flaky/', {'a': 1}, format='json', headers={HEADER: 'clave-1'})
+            request = Request(django_request, parsers=[JSONParser()])
+            request.client = self.client_profile
+            return View().create(request)
+
+        self.assertEqual(post().status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        retry = post()
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(retry.has_header(REPLAYED_HEADER))
+        record = IdempotencyKey.objects.get()
+        self.assertEqual((record.status_code, record.response), (201, {'id': 1}))
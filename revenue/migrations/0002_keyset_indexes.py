@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("revenue", "0001_initial"),
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="revenue",
+            index=models.Index(
+                fields=["client", "revenue_date", "id"],
+                name="revenue_client_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="revenue",
+            index=models.Index(
+                fields=["wallet", "revenue_date", "id"],
+                name="revenue_wallet_date_id_idx",
+            ),
+        ),
+    ]
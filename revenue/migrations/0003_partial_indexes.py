@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("revenue", "0002_keyset_indexes"),
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0002_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="revenue",
+            name="revenue_client_date_id_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="revenue",
+            name="revenue_wallet_date_id_idx",
+        ),
+        migrations.AddIndex(
+            model_name="revenue",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["client", "revenue_date", "id"],
+                name="revenue_client_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="revenue",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["wallet", "revenue_date", "id"],
+                name="revenue_wallet_date_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("revenue", "0003_partial_indexes"),
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0003_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="revenue",
+            name="import_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="revenue",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("import_hash__isnull", False)),
+                fields=("wallet", "import_hash"),
+                name="revenue_wallet_import_hash_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("revenue", "0005_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="revenue",
+            name="version",
+            field=models.PositiveIntegerField(db_default=1, default=1, editable=False),
+        ),
+    ]
@@ -1,10 +1,20 @@
+from decimal import Decimal
 from rest_framework import serializers
+from API_revenue_portfolio.fastread import SparseFieldsMixin
 from .models import Revenue
 
-class RevenueSerializer(serializers.ModelSerializer):
+class RevenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     wallet_name = serializers.CharField(source='wallet.name', read_only=True)
     
     class Meta:
         model = Revenue
         fields = ['id', 'wallet', 'wallet_name', 'name', 'description', 'amount', 'revenue_date']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class RevenueBulkItemSerializer(serializers.Serializer):
+    """Item de /revenue/bulk/; valida sin consultar la base (las billeteras se validan juntas)"""
+    wallet = serializers.IntegerField()
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(allow_blank=True, required=False, default='')
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    revenue_date = serializers.DateField()
@@ -1,3 +1,106 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from django.test import override_settings
+from API_revenue_portfolio.testing import ClientAPITestCase
+from rollups.models import MonthlyRollup
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import LedgerEntry, PendingCredit, Wallet
+from .models import Revenue
 
-# Create your tests here.
+
+class BulkRevenueTests(ClientAPITestCase):
+    """POST /revenue/bulk/: todo el lote o nada, un UPDATE de balance por billetera"""
+
+    username = 'masivo'
+
+    def setUp(self):
+        super().setUp()
+        self.other = wallet_services.open_wallet(self.client_profile, 'Banco', '', Decimal('50.00'))
+
+    def item(self, wallet, amount, day=date(2024, 1, 15)):
+        return {'wallet': wallet.id, 'name': 'ingreso', 'amount': amount, 'revenue_date': day.isoformat()}
+
+    def bulk(self, items):
+        return self.api.post('/revenue/bulk/', items, format='json', secure=True)
+
+    def assert_nothing_created(self):
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('100.00'), Decimal('50.00')))
+        self.assertFalse(Revenue.objects.exists())
+        self.assertFalse(LedgerEntry.objects.exclude(kind=LedgerEntry.OPENING).exists())
+        self.assertFalse(MonthlyRollup.objects.exists())
+
+    def test_bulk(self):
+        response = self.bulk([
+            self.item(self.wallet, '10.00'), self.item(self.wallet, '2.50', date(2024, 1, 31)),
+            self.item(self.wallet, '7.25', date(2024, 2, 1)), self.item(self.other, '50.00'),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 4, 'wallets': [
+            {'id': self.wallet.id, 'balance': '119.75'}, {'id': self.other.id, 'balance': '100.00'},
+        ]})
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('119.75'), Decimal('100.00')))
+
+        revenues = Revenue.objects.filter(client=self.client_profile)
+        entries = LedgerEntry.objects.filter(kind=LedgerEntry.REVENUE)
+        self.assertEqual(
+            sorted(entries.values_list('reference_id', 'wallet_id', 'amount')),
+            sorted(revenues.values_list('id', 'wallet_id', 'amount'))
+        )
+        rollups = MonthlyRollup.objects.filter(client=self.client_profile).values_list(
+            'wallet_id', 'month', 'revenue_total', 'revenue_count'
+        )
+        self.assertEqual(sorted(rollups), sorted([
+            (self.wallet.id, date(2024, 1, 1), Decimal('12.50'), 2),
+            (self.wallet.id, date(2024, 2, 1), Decimal('7.25'), 1),
+            (self.other.id, date(2024, 1, 1), Decimal('50.00'), 1),
+        ]))
+
+    def test_hot_wallet(self):
+        # La billetera hot no recibe el UPDATE: cada revenue queda como crédito pendiente
+        Wallet.objects.filter(pk=self.other.pk).update(is_hot=True)
+        response = self.bulk([
+            self.item(self.wallet, '10.00'), self.item(self.other, '20.00'),
+            self.item(self.other, '5.00', date(2024, 2, 1)),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['wallets'], [
+            {'id': self.wallet.id, 'balance': '110.00'}, {'id': self.other.id, 'balance': '75.00'},
+        ])
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('110.00'), Decimal('50.00')))
+        self.assertEqual(
+            sorted(PendingCredit.objects.values_list('wallet_id', 'amount', 'revenue_month')),
+            [(self.other.id, Decimal('5.00'), date(2024, 2, 1)), (self.other.id, Decimal('20.00'), date(2024, 1, 1))]
+        )
+        self.assertEqual(LedgerEntry.objects.filter(wallet=self.other, kind=LedgerEntry.REVENUE).count(), 2)
+        self.assertFalse(MonthlyRollup.objects.filter(wallet=self.other).exists())
+
+        # Al consolidar se suman el balance y los totales mensuales
+        self.assertEqual(wallet_services.fold_pending(self.other.id), Decimal('25.00'))
+        self.assertEqual(self.balance(self.other), Decimal('75.00'))
+        rollups = MonthlyRollup.objects.filter(client=self.client_profile).values_list(
+            'wallet_id', 'month', 'revenue_total', 'revenue_count'
+        )
+        self.assertEqual(sorted(rollups), sorted([
+            (self.wallet.id, date(2024, 1, 1), Decimal('10.00'), 1),
+            (self.other.id, date(2024, 1, 1), Decimal('20.00'), 1),
+            (self.other.id, date(2024, 2, 1), Decimal('5.00'), 1),
+        ]))
+
+    def test_other_client_wallet(self):
+        stranger = Client.objects.create(name='otro', email='otro@example.com')
+        foreign = wallet_services.open_wallet(stranger, 'Ajena', '', Decimal('50.00'))
+        response = self.bulk([self.item(self.wallet, '1.00'), self.item(foreign, '1.00')])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['wallets'], [foreign.id])
+        self.assert_nothing_created()
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_limits(self):
+        response = self.bulk([self.item(self.wallet, '1.00')] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'At most 2 revenues per request'})
+        self.assertEqual(self.bulk({'wallet': self.wallet.id}).status_code, 400)
+        self.assertEqual(self.bulk([self.item(self.wallet, '1.00'), self.item(self.wallet, '-1.00')]).status_code, 400)
+        self.assert_nothing_created()
+        self.assertEqual(self.bulk([self.item(self.wallet, '1.00')] * 2).status_code, 201)
@@ -1,22 +1,46 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from decimal import Decimal, InvalidOperation
 from .models import Revenue
-from .serializers import RevenueSerializer
-from wallets.models import Wallet
+from .serializers import RevenueSerializer, RevenueBulkItemSerializer
+from wallets.models import LedgerEntry, PendingCredit, Wallet
+from wallets import services as wallet_services
 from users.models import Client
+from users.authentication import get_request_client
+from idempotency.decorators import idempotent
+from API_revenue_portfolio.cache import ClientDataVersionMixin
+from API_revenue_portfolio.conditional import (
+    ConditionalGetMixin, OptimisticWriteMixin, VersionConflict, compare_and_swap
+)
+from API_revenue_portfolio.fastread import ValuesReadMixin
+from rollups import services as rollups
+from API_revenue_portfolio.exports import EXPORT_RENDERERS, export_response, parse_date_range
 
-class RevenueViewSet(viewsets.ModelViewSet):
+class RevenueViewSet(
+    ClientDataVersionMixin, ConditionalGetMixin, OptimisticWriteMixin, ValuesReadMixin, viewsets.ModelViewSet
+):
     serializer_class = RevenueSerializer
     permission_classes = [IsAuthenticated]
+    # wallet_name aparece en cada fila: renombrar la billetera cambia el ETag
+    etag_dependencies = ('wallet',)
+    # list/retrieve leen wallet_name con un JOIN en vez de una consulta por fila
+    read_expressions = {'wallet_name': 'wallet__name'}
+    # Orden de la paginación por cursor (ver API_revenue_portfolio.pagination)
+    ordering = ('-revenue_date', '-id')
     
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Wallet.objects.none()
         try:
-            client = Client.objects.get(email=self.request.user.email)
-            queryset = Revenue.objects.filter(client=client, is_deleted=False)
+            client = get_request_client(self.request)
+            queryset = Revenue.objects.filter(client=client, is_deleted=False).select_related('wallet')
             
             wallet_id = self.request.query_params.get('wallet_id', None)
             if wallet_id:
@@ -26,9 +50,10 @@ class RevenueViewSet(viewsets.ModelViewSet):
         except Client.DoesNotExist:
             return Revenue.objects.none()
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         try:
-            client = Client.objects.get(email=request.user.email)
+            client = get_request_client(request)
             wallet_id = request.data.get('wallet')
             amount_str = request.data.get('amount')
             
@@ -48,17 +73,22 @@ class RevenueViewSet(viewsets.ModelViewSet):
             
             wallet = Wallet.objects.get(id=wallet_id, client=client, is_deleted=False)
             
-            revenue = Revenue.objects.create(
-                client=client,
-                wallet=wallet,
-                name=request.data.get('name'),
-                description=request.data.get('description'),
-                amount=amount,
-                revenue_date=request.data.get('revenue_date')
-            )
-            
-            wallet.balance += amount
-            wallet.save()
+            with transaction.atomic():
+                revenue = Revenue.objects.create(
+                    client=client,
+                    wallet=wallet,
+                    name=request.data.get('name'),
+                    description=request.data.get('description'),
+                    amount=amount,
+                    revenue_date=request.data.get('revenue_date')
+                )
+                
+                pending = wallet_services.credit(
+                    wallet.id, amount, LedgerEntry.REVENUE, revenue.id, revenue_date=revenue.revenue_date
+                )
+                if pending is None:
+                    # En billeteras hot el total mensual se suma al consolidar el crédito
+                    rollups.add_revenue(client.id, wallet.id, revenue.revenue_date, amount)
             
             serializer = self.get_serializer(revenue)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -80,70 +110,226 @@ class RevenueViewSet(viewsets.ModelViewSet):
     
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        
-        try:
-            client = Client.objects.get(email=request.user.email)
-            if instance.client != client:
+        for attempt in self.write_attempts(request):
+            instance = self.get_object()
+            
+            try:
+                client = get_request_client(request)
+                if instance.client_id != client.id:
+                    return Response(
+                        {"error": "You don't have permission to edit this revenue"},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+            except Client.DoesNotExist:
                 return Response(
-                    {"error": "You don't have permission to edit this revenue"},
-                    status=status.HTTP_403_FORBIDDEN
+                    {"error": "Client profile not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
                 )
+            failed = self.check_if_match(request, instance)
+            if failed is not None:
+                return failed
+            
+            old_amount = instance.amount
+            old_wallet_id = instance.wallet_id
+            old_date = instance.revenue_date
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            
+            new_amount_str = serializer.validated_data.get('amount', old_amount)
+            
+            try:
+                new_amount = Decimal(str(new_amount_str))
+                if new_amount <= 0:
+                    return Response(
+                        {"error": "Amount must be greater than 0"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            except (ValueError, InvalidOperation):
+                return Response(
+                    {"error": "Invalid amount format"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            new_wallet = serializer.validated_data.get('wallet')
+            if new_wallet is not None and (new_wallet.client_id != client.id or new_wallet.is_deleted):
+                return Response(
+                    {"error": "Wallet not found or doesn't belong to you"}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            try:
+                with transaction.atomic():
+                    # Primero la fila: si otro PATCH la cambió desde la lectura no se toca el balance
+                    compare_and_swap(instance, **serializer.validated_data)
+                    if instance.wallet_id == old_wallet_id:
+                        difference = new_amount - old_amount
+                        if difference > 0:
+                            wallet_services.credit(old_wallet_id, difference, LedgerEntry.REVENUE, instance.id)
+                        elif difference < 0:
+                            wallet_services.debit(
+                                old_wallet_id, -difference, LedgerEntry.REVENUE, instance.id, allow_negative=True
+                            )
+                    else:
+                        # Cambio de billetera: se descuenta el monto viejo y se acredita el nuevo en la otra
+                        wallet_services.debit(
+                            old_wallet_id, old_amount, LedgerEntry.REVENUE, instance.id, allow_negative=True
+                        )
+                        wallet_services.credit(instance.wallet_id, new_amount, LedgerEntry.REVENUE, instance.id)
+                    
+                    rollups.remove_revenue(instance.client_id, old_wallet_id, old_date, old_amount)
+                    rollups.add_revenue(instance.client_id, instance.wallet_id, instance.revenue_date, instance.amount)
+            except VersionConflict:
+                continue
+            return self.tag(Response(serializer.data), self.object_etag(request))
+        return self.write_conflict(request)
+    
+    def destroy(self, request, *args, **kwargs):
+        for attempt in self.write_attempts(request):
+            instance = self.get_object()
+            
+            try:
+                client = get_request_client(request)
+                if instance.client_id != client.id:
+                    return Response(
+                        {"error": "You don't have permission to delete this revenue"},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+            except Client.DoesNotExist:
+                return Response(
+                    {"error": "Client profile not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            failed = self.check_if_match(request, instance)
+            if failed is not None:
+                return failed
+            
+            try:
+                with transaction.atomic():
+                    # Dos DELETE concurrentes: solo el que marca la fila descuenta el monto
+                    compare_and_swap(instance, is_deleted=True)
+                    wallet_services.debit(
+                        instance.wallet_id, instance.amount, LedgerEntry.REVENUE, instance.id, allow_negative=True
+                    )
+                    rollups.remove_revenue(instance.client_id, instance.wallet_id, instance.revenue_date, instance.amount)
+            except VersionConflict:
+                continue
+            
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.write_conflict(request)
+    
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Exporta los revenues en streaming (?format=csv|ndjson, ?wallet_id=, ?date_from=, ?date_to=)"""
+        date_from, date_to = parse_date_range(request)
+        queryset = self.get_queryset()
+        if date_from:
+            queryset = queryset.filter(revenue_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(revenue_date__lte=date_to)
+        header = ['id', 'wallet', 'wallet_name', 'name', 'description', 'amount', 'revenue_date']
+        rows = queryset.order_by('revenue_date', 'id').values_list(
+            'id', 'wallet_id', 'wallet__name', 'name', 'description', 'amount', 'revenue_date'
+        )
+        return export_response(request, rows, header, 'revenue')
+    
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        """Crea muchos revenues en una transacción: un INSERT por lote y un UPDATE de balance por billetera.
+
+        En billeteras hot cada revenue queda como crédito pendiente (como en services.credit) y su
+        total mensual se suma al consolidarlo.
+        """
+        try:
+            client = get_request_client(request)
         except Client.DoesNotExist:
             return Response(
                 {"error": "Client profile not found"}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        old_amount = instance.amount
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        
-        new_amount_str = serializer.validated_data.get('amount', old_amount)
-        
-        try:
-            new_amount = Decimal(str(new_amount_str))
-            if new_amount <= 0:
-                return Response(
-                    {"error": "Amount must be greater than 0"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except (ValueError, InvalidOperation):
+        items = request.data
+        if not isinstance(items, list) or not items:
             return Response(
-                {"error": "Invalid amount format"},
+                {"error": "Expected a non-empty list of revenues"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {"error": f"At most {settings.BULK_MAX_ITEMS} revenues per request"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        difference = new_amount - old_amount
-        
-        wallet = instance.wallet
-        wallet.balance += difference 
-        wallet.save()
-        
-        self.perform_update(serializer)
-        return Response(serializer.data)
-    
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
+        serializer = RevenueBulkItemSerializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
         
-        try:
-            client = Client.objects.get(email=request.user.email)
-            if instance.client != client:
-                return Response(
-                    {"error": "You don't have permission to delete this revenue"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except Client.DoesNotExist:
+        wallet_ids = {row['wallet'] for row in rows}
+        wallets = set(
+            Wallet.objects.filter(id__in=wallet_ids, client=client, is_deleted=False)
+            .values_list('id', flat=True)
+        )
+        if wallets != wallet_ids:
             return Response(
-                {"error": "Client profile not found"}, 
+                {"error": "Wallet not found or doesn't belong to you", "wallets": sorted(wallet_ids - wallets)}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        wallet = instance.wallet
-        wallet.balance -= instance.amount
-        wallet.save()
+        totals = defaultdict(Decimal)
+        months = defaultdict(lambda: [Decimal('0'), 0])
+        for row in rows:
+            totals[row['wallet']] += row['amount']
+            bucket = months[(row['wallet'], rollups.month_of(row['revenue_date']))]
+            bucket[0] += row['amount']
+            bucket[1] += 1
         
-        instance.is_deleted = True
-        instance.save()
+        now = timezone.now()
+        with transaction.atomic():
+            # Orden por id para que dos lotes concurrentes bloqueen las billeteras en el mismo orden
+            hot_wallets = set()
+            for wallet_id in sorted(totals):
+                updated = Wallet.objects.filter(pk=wallet_id, is_hot=False).update(
+                    balance=F('balance') + totals[wallet_id], updated_at=now
+                )
+                if not updated:
+                    hot_wallets.add(wallet_id)
+            
+            created = Revenue.objects.bulk_create(
+                [
+                    Revenue(
+                        client=client,
+                        wallet_id=row['wallet'],
+                        name=row['name'],
+                        description=row['description'],
+                        amount=row['amount'],
+                        revenue_date=row['revenue_date']
+                    )
+                    for row in rows
+                ],
+                batch_size=settings.BULK_BATCH_SIZE
+            )
+            LedgerEntry.objects.bulk_create(
+                [
+                    LedgerEntry(wallet_id=item.wallet_id, kind=LedgerEntry.REVENUE, amount=item.amount, reference_id=item.id)
+                    for item in created
+                ],
+                batch_size=settings.BULK_BATCH_SIZE
+            )
+            PendingCredit.objects.bulk_create(
+                [
+                    PendingCredit(
+                        wallet_id=item.wallet_id, amount=item.amount, revenue_month=rollups.month_of(item.revenue_date)
+                    )
+                    for item in created if item.wallet_id in hot_wallets
+                ],
+                batch_size=settings.BULK_BATCH_SIZE
+            )
+            for (wallet_id, month), (total, count) in months.items():
+                if wallet_id not in hot_wallets:
+                    rollups.add_revenue(client.id, wallet_id, month, total, count=count)
         
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        balances = wallet_services.available_balances(wallet_ids)
+        return Response({
+            'created': len(rows),
+            'wallets': [{'id': wallet_id, 'balance': str(balances[wallet_id])} for wallet_id in sorted(balances)]
+        }, status=status.HTTP_201_CREATED)
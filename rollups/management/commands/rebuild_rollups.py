@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from expenses.models import Expense
+from revenue.models import Revenue
+from rollups import services as rollup_services
+from rollups.models import MonthlyRollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero la tabla de totales mensuales a partir de gastos e ingresos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client', type=int, help='Reconstruir solo este cliente (id)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        client_id = options['client']
+        expenses = Expense.objects.filter(is_deleted=False)
+        revenues = Revenue.objects.filter(is_deleted=False)
+        rollups = MonthlyRollup.objects.all()
+        if client_id:
+            expenses = expenses.filter(client_id=client_id)
+            revenues = revenues.filter(client_id=client_id)
+            rollups = rollups.filter(client_id=client_id)
+
+        with transaction.atomic():
+            rollups.delete()
+
+            buckets = rollup_services.monthly_rollups(expenses, revenues)
+            MonthlyRollup.objects.bulk_create(buckets, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{len(buckets)} monthly rollups rebuilt'))
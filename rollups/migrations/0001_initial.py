@@ -0,0 +1,64 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("month", models.DateField()),
+                (
+                    "revenue_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("revenue_count", models.IntegerField(default=0)),
+                (
+                    "expense_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("expense_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "client",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_rollups",
+                        to="users.client",
+                    ),
+                ),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_rollups",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["client", "month"], name="rollup_client_month_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("client", "wallet", "month"),
+                        name="rollup_client_wallet_month_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
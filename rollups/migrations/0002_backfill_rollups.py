@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:30
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+# Copia congelada de rollups.services.monthly_rollups (que usa rebuild_rollups): una migración
+# trabaja con los modelos históricos de `apps` y no debe importar código de la app, así que esta
+# copia no se actualiza cuando cambia el helper.
+def backfill_rollups(apps, schema_editor):
+    Expense = apps.get_model("expenses", "Expense")
+    Revenue = apps.get_model("revenue", "Revenue")
+    MonthlyRollup = apps.get_model("rollups", "MonthlyRollup")
+
+    buckets = {}
+    for kind, model, date_field in (
+        ("expense", Expense, "expense_date"),
+        ("revenue", Revenue, "revenue_date"),
+    ):
+        grouped = (
+            model.objects.filter(is_deleted=False)
+            .annotate(month=TruncMonth(date_field))
+            .values("client_id", "wallet_id", "month")
+            .annotate(total=Sum("amount"), count=Count("id"))
+            .order_by()
+        )
+        for row in grouped.iterator():
+            key = (row["client_id"], row["wallet_id"], row["month"])
+            rollup = buckets.get(key)
+            if rollup is None:
+                rollup = buckets[key] = MonthlyRollup(
+                    client_id=row["client_id"],
+                    wallet_id=row["wallet_id"],
+                    month=row["month"],
+                )
+            setattr(rollup, f"{kind}_total", row["total"])
+            setattr(rollup, f"{kind}_count", row["count"])
+
+    MonthlyRollup.objects.bulk_create(buckets.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0001_initial"),
+        ("revenue", "0001_initial"),
+        ("rollups", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
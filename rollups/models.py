@@ -0,0 +1,26 @@
+from django.db import models
+from users.models import Client
+from wallets.models import Wallet
+
+class MonthlyRollup(models.Model):
+    """Totales de ingresos y gastos por cliente, billetera y mes"""
+    id = models.BigAutoField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="monthly_rollups")
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="monthly_rollups")
+    month = models.DateField()
+    revenue_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    revenue_count = models.IntegerField(default=0)
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'wallet', 'month'], name='rollup_client_wallet_month_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['client', 'month'], name='rollup_client_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} wallet {self.wallet_id}: +{self.revenue_total} / -{self.expense_total}"
@@ -0,0 +1,113 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, ValueRange, Window
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import MonthlyRollup
+
+
+def month_of(value):
+    """Primer día del mes de una fecha (acepta date o 'YYYY-MM-DD')"""
+    if isinstance(value, str):
+        value = parse_date(value)
+    return value.replace(day=1)
+
+
+def _apply(client_id, wallet_id, day, **deltas):
+    """Suma los deltas a la fila del mes; la crea si todavía no existe.
+
+    Debe llamarse dentro de la misma transacción que modifica el gasto/ingreso.
+    """
+    month = month_of(day)
+    rollups = MonthlyRollup.objects.filter(client_id=client_id, wallet_id=wallet_id, month=month)
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if rollups.update(updated_at=timezone.now(), **changes):
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRollup.objects.create(client_id=client_id, wallet_id=wallet_id, month=month, **deltas)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        rollups.update(updated_at=timezone.now(), **changes)
+
+
+def add_expense(client_id, wallet_id, day, amount, count=1):
+    _apply(client_id, wallet_id, day, expense_total=amount, expense_count=count)
+
+
+def remove_expense(client_id, wallet_id, day, amount, count=1):
+    _apply(client_id, wallet_id, day, expense_total=-amount, expense_count=-count)
+
+
+def add_revenue(client_id, wallet_id, day, amount, count=1):
+    _apply(client_id, wallet_id, day, revenue_total=amount, revenue_count=count)
+
+
+def remove_revenue(client_id, wallet_id, day, amount, count=1):
+    _apply(client_id, wallet_id, day, revenue_total=-amount, revenue_count=-count)
+
+
+def monthly_rollups(expenses, revenues):
+    """Totales mensuales por (cliente, billetera, mes) de los querysets de gastos e ingresos.
+
+    Devuelve las filas de MonthlyRollup sin guardar; una consulta agrupada por cada queryset.
+    """
+    buckets = {}
+    for kind, queryset, date_field in (
+        ('expense', expenses, 'expense_date'),
+        ('revenue', revenues, 'revenue_date'),
+    ):
+        grouped = (
+            queryset.annotate(month=TruncMonth(date_field))
+            .values('client_id', 'wallet_id', 'month')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by()
+        )
+        for row in grouped.iterator():
+            key = (row['client_id'], row['wallet_id'], row['month'])
+            rollup = buckets.get(key)
+            if rollup is None:
+                rollup = buckets[key] = MonthlyRollup(
+                    client_id=row['client_id'], wallet_id=row['wallet_id'], month=row['month']
+                )
+            setattr(rollup, f'{kind}_total', row['total'])
+            setattr(rollup, f'{kind}_count', row['count'])
+    return list(buckets.values())
+
+
+def _shift_month(month, offset):
+    index = month.year * 12 + month.month - 1 + offset
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def historical_balance(client_id, months=6, until=None):
+    """Balance acumulado (ingresos - gastos) al cierre de cada uno de los últimos `months` meses.
+
+    Una sola consulta: SUM acumulado (ventana) sobre los totales mensuales del cliente.
+    """
+    last_month = month_of(until or timezone.localdate())
+    # RANGE incluye las filas "pares": todas las billeteras del mismo mes dan el mismo acumulado
+    running = (
+        MonthlyRollup.objects.filter(client_id=client_id, month__lte=last_month)
+        .annotate(balance=Window(
+            Sum(F('revenue_total') - F('expense_total')),
+            order_by=F('month').asc(),
+            frame=ValueRange(start=None, end=0)
+        ))
+        .values_list('month', 'balance')
+        .order_by('month')
+        .distinct()
+    )
+
+    # Los meses sin movimientos conservan el balance del último mes con datos
+    months_list = [_shift_month(last_month, -offset) for offset in reversed(range(months))]
+    history = []
+    balance = 0
+    pending = iter(running)
+    row = next(pending, None)
+    for month in months_list:
+        while row is not None and row[0] <= month:
+            balance = row[1]
+            row = next(pending, None)
+        history.append({'month': month.strftime('%Y-%m'), 'balance': float(balance)})
+    return history
@@ -0,0 +1,157 @@
+import importlib
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.apps import apps
+from django.core.management import call_command
+from django.db.models import F, QuerySet, Sum
+from django.test import TestCase
+from unittest import mock
+from expenses.models import Expense
+from revenue.models import Revenue
+from users.models import Client
+from wallets.models import Wallet
+from . import services as rollups
+from .models import MonthlyRollup
+
+
+class ApplyTests(TestCase):
+    """_apply: UPDATE de la fila del mes y, si no existe, INSERT (con reintento si otro la creó antes)"""
+
+    def setUp(self):
+        self.client_profile = Client.objects.create(name='rollup', email='rollup@example.com')
+        self.wallet = Wallet.objects.create(client=self.client_profile, name='Efectivo')
+
+    def row(self, month):
+        return MonthlyRollup.objects.get(client=self.client_profile, wallet=self.wallet, month=month)
+
+    def test_update_or_insert(self):
+        rollups.add_expense(self.client_profile.id, self.wallet.id, date(2024, 3, 9), Decimal('10.00'))
+        rollups.add_expense(self.client_profile.id, self.wallet.id, '2024-03-31', Decimal('2.50'))
+        rollups.remove_expense(self.client_profile.id, self.wallet.id, date(2024, 3, 1), Decimal('10.00'))
+        rollups.add_revenue(self.client_profile.id, self.wallet.id, date(2024, 4, 1), Decimal('7.00'))
+        march = self.row(date(2024, 3, 1))
+        self.assertEqual((march.expense_total, march.expense_count), (Decimal('2.50'), 1))
+        self.assertEqual((march.revenue_total, march.revenue_count), (Decimal('0.00'), 0))
+        self.assertEqual(self.row(date(2024, 4, 1)).revenue_total, Decimal('7.00'))
+        self.assertEqual(MonthlyRollup.objects.count(), 2)
+
+    def test_insert_race_retries_update(self):
+        original_update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1 and queryset.model is MonthlyRollup:
+                # Otra transacción inserta la fila del mes justo después de nuestro UPDATE (0 filas)
+                MonthlyRollup.objects.bulk_create([MonthlyRollup(
+                    client=self.client_profile, wallet=self.wallet, month=date(2024, 3, 1),
+                    expense_total=Decimal('5.00'), expense_count=1
+                )])
+                return 0
+            return original_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            rollups.add_expense(self.client_profile.id, self.wallet.id, date(2024, 3, 9), Decimal('10.00'))
+        # UPDATE, INSERT que choca con el índice único y UPDATE de nuevo: no se pierde ninguno de los dos
+        self.assertEqual(len(calls), 2)
+        march = self.row(date(2024, 3, 1))
+        self.assertEqual((march.expense_total, march.expense_count), (Decimal('15.00'), 2))
+        self.assertEqual(MonthlyRollup.objects.count(), 1)
+
+
+class HistoricalBalanceTests(TestCase):
+    """historical_balance: acumulado de todas las billeteras al cierre de cada mes"""
+
+    def setUp(self):
+        self.client_profile = Client.objects.create(name='historia', email='historia@example.com')
+        cash = Wallet.objects.create(client=self.client_profile, name='Efectivo')
+        bank = Wallet.objects.create(client=self.client_profile, name='Banco')
+        client_id = self.client_profile.id
+        # Antes de la ventana: cuenta para el acumulado
+        rollups.add_revenue(client_id, cash.id, date(2023, 10, 5), Decimal('20.00'))
+        rollups.add_revenue(client_id, cash.id, date(2024, 1, 5), Decimal('100.00'))
+        rollups.add_expense(client_id, cash.id, date(2024, 1, 20), Decimal('30.00'))
+        rollups.add_revenue(client_id, bank.id, date(2024, 1, 31), Decimal('50.00'))
+        # Febrero sin movimientos
+        rollups.add_expense(client_id, cash.id, date(2024, 3, 2), Decimal('45.50'))
+        rollups.add_revenue(client_id, bank.id, date(2024, 4, 10), Decimal('10.00'))
+        # Después de `until` y de otro cliente: no cuentan
+        rollups.add_revenue(client_id, cash.id, date(2024, 5, 1), Decimal('1000.00'))
+        other = Client.objects.create(name='otro', email='otro@example.com')
+        rollups.add_revenue(other.id, Wallet.objects.create(client=other, name='x').id, date(2024, 1, 1), Decimal('999.00'))
+
+    def test_balance_at_month_close(self):
+        history = rollups.historical_balance(self.client_profile.id, months=5, until=date(2024, 4, 15))
+        self.assertEqual(history, [
+            {'month': '2023-12', 'balance': 20.0},
+            {'month': '2024-01', 'balance': 140.0},
+            {'month': '2024-02', 'balance': 140.0},
+            {'month': '2024-03', 'balance': 94.5},
+            {'month': '2024-04', 'balance': 104.5},
+        ])
+        # Igual a sumar todos los meses hasta el cierre, sin ventana
+        for entry in history:
+            year, month = map(int, entry['month'].split('-'))
+            total = MonthlyRollup.objects.filter(
+                client=self.client_profile, month__lte=date(year, month, 1)
+            ).aggregate(total=Sum(F('revenue_total') - F('expense_total')))['total']
+            self.assertEqual(Decimal(str(entry['balance'])), total)
+
+    def test_no_rollups(self):
+        history = rollups.historical_balance(self.client_profile.id, months=2, until=date(2023, 9, 30))
+        self.assertEqual(history, [{'month': '2023-08', 'balance': 0.0}, {'month': '2023-09', 'balance': 0.0}])
+
+
+class RebuildTests(TestCase):
+    """rebuild_rollups (monthly_rollups) da lo mismo que los totales incrementales y que la migración 0002"""
+
+    def setUp(self):
+        self.client_profile = Client.objects.create(name='rearmado', email='rearmado@example.com')
+        self.other = Client.objects.create(name='ajeno', email='ajeno@example.com')
+        cash = Wallet.objects.create(client=self.client_profile, name='Efectivo')
+        bank = Wallet.objects.create(client=self.client_profile, name='Banco')
+        foreign = Wallet.objects.create(client=self.other, name='Ajena')
+        movements = [
+            (Expense, self.client_profile, cash, date(2024, 1, 5), '10.00'),
+            (Expense, self.client_profile, cash, date(2024, 1, 31), '2.50'),
+            (Expense, self.client_profile, bank, date(2024, 2, 1), '7.00'),
+            (Revenue, self.client_profile, cash, date(2024, 1, 15), '100.00'),
+            (Revenue, self.client_profile, bank, date(2024, 3, 1), '40.00'),
+            (Revenue, self.other, foreign, date(2024, 1, 1), '9.00'),
+        ]
+        for model, client, wallet, day, amount in movements:
+            field = 'expense_date' if model is Expense else 'revenue_date'
+            model.objects.create(client=client, wallet=wallet, name='x', amount=Decimal(amount), **{field: day})
+            add = rollups.add_expense if model is Expense else rollups.add_revenue
+            add(client.id, wallet.id, day, Decimal(amount))
+        # Borrado: no cuenta
+        Expense.objects.create(
+            client=self.client_profile, wallet=cash, name='x', amount=Decimal('99.00'), expense_date=date(2024, 1, 9),
+            is_deleted=True
+        )
+        self.expected = self.rows()
+
+    def rows(self):
+        return sorted(MonthlyRollup.objects.values_list(
+            'client_id', 'wallet_id', 'month', 'expense_total', 'expense_count', 'revenue_total', 'revenue_count'
+        ))
+
+    def test_rebuild(self):
+        MonthlyRollup.objects.update(expense_total=Decimal('1.00'), revenue_count=7)
+        stdout = StringIO()
+        call_command('rebuild_rollups', client=self.client_profile.id, stdout=stdout)
+        self.assertIn('3 monthly rollups rebuilt', stdout.getvalue())
+        rebuilt = [row for row in self.rows() if row[0] == self.client_profile.id]
+        self.assertEqual(rebuilt, [row for row in self.expected if row[0] == self.client_profile.id])
+        self.assertEqual(len(self.rows()), 4)
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rows(), self.expected)
+
+    def test_migration_copy(self):
+        MonthlyRollup.objects.all().delete()
+        migration = importlib.import_module('rollups.migrations.0002_backfill_rollups')
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(self.rows(), self.expected)
+
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Client
+
+CLIENT_ID_CLAIM = 'client_id'
+
+
+class ClientIdCache:
+    """Cache LRU acotada (por proceso) de user_id -> client_id para tokens sin el claim"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            client_id = self._data.get(user_id)
+            if client_id is not None:
+                self._data.move_to_end(user_id)
+            return client_id
+
+    def set(self, user_id, client_id):
+        with self._lock:
+            self._data[user_id] = client_id
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+client_ids = ClientIdCache(settings.CLIENT_ID_CACHE_SIZE)
+
+
+def resolve_client_id(user_id, email=None):
+    """Devuelve el id del Client asociado al usuario (cache primero, luego una consulta)"""
+    client_id = client_ids.get(user_id)
+    if client_id is not None:
+        return client_id
+    if email is not None:
+        clients = Client.objects.filter(email=email)
+    else:
+        clients = Client.objects.filter(email__in=User.objects.filter(pk=user_id).values('email'))
+    client_id = clients.values_list('id', flat=True).first()
+    if client_id is not None:
+        client_ids.set(user_id, client_id)
+    return client_id
+
+
+def forget_client(user_id):
+    client_ids.discard(user_id)
+
+
+def get_request_client(request):
+    """Client autenticado del request; lanza Client.DoesNotExist si no tiene perfil"""
+    client = getattr(request, 'client', None)
+    if client is None:
+        raise Client.DoesNotExist
+    return client
+
+
+class ClientRefreshToken(RefreshToken):
+    """Refresh token que incluye el claim client_id (y lo copia a los access tokens)"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        client_id = resolve_client_id(user.pk, user.email)
+        if client_id is not None:
+            token[CLIENT_ID_CLAIM] = client_id
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if CLIENT_ID_CLAIM not in access:
+            # Refresh tokens emitidos antes de agregar el claim
+            client_id = resolve_client_id(self.payload.get(api_settings.USER_ID_CLAIM))
+            if client_id is not None:
+                access[CLIENT_ID_CLAIM] = client_id
+        return access
+
+
+class ClientJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que además deja el perfil en request.client sin consultar la base de datos.
+
+    request.client solo tiene cargado el id; es suficiente para filtrar y asignar FKs.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, token = result
+        client_id = token.get(CLIENT_ID_CLAIM) or resolve_client_id(user.pk, user.email)
+        request.client = Client(id=client_id) if client_id is not None else None
+        return result
+
+
+def authenticate_django_request(request):
+    """Autentica un HttpRequest de Django con el JWT (para vistas que no son de DRF, p. ej. async).
+
+    Devuelve (user, client) o None si no hay credenciales; lanza AuthenticationFailed si el token
+    no es válido. Hace consultas: en una vista async llamarla con sync_to_async.
+    """
+    drf_request = Request(request)
+    result = ClientJWTAuthentication().authenticate(drf_request)
+    if result is None:
+        return None
+    return result[0], drf_request.client
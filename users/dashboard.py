@@ -0,0 +1,162 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+from expenses.models import Expense
+from revenue.models import Revenue
+from rollups.models import MonthlyRollup
+from rollups import services as rollups
+from wallets.models import Wallet
+from wallets import services as wallet_services
+
+MAX_HISTORY_MONTHS = 600
+
+
+class DashboardParams:
+    """Parámetros del dashboard (?year=, ?month=, ?months=, ?sections=) ya validados"""
+
+    def __init__(self, query_params):
+        self.year = query_params.get('year', datetime.now().year)
+        self.month = query_params.get('month', None)
+        try:
+            self.months = int(query_params.get('months', 6))
+        except ValueError:
+            self.months = 0
+        if not 1 <= self.months <= MAX_HISTORY_MONTHS:
+            raise ValueError(f"months must be an integer between 1 and {MAX_HISTORY_MONTHS}")
+        # ?sections=summary,top_expenses: solo se calculan (y consultan) esas secciones
+        requested = {name.strip() for name in query_params.get('sections', '').split(',') if name.strip()}
+        unknown = requested - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}; use {', '.join(SECTIONS)}")
+        self.sections = [name for name in SECTIONS if not requested or name in requested]
+
+
+# Cada sección es independiente (sus propias consultas), así se pueden calcular en paralelo
+
+def summary(client_id, params):
+    """Totales generales (desde la tabla de totales mensuales)"""
+    rollups_qs = MonthlyRollup.objects.filter(client_id=client_id, month__year=params.year)
+    if params.month:
+        rollups_qs = rollups_qs.filter(month__month=params.month)
+    totals = rollups_qs.aggregate(
+        expenses=Sum('expense_total'),
+        revenues=Sum('revenue_total')
+    )
+    total_expenses = totals['expenses'] or 0
+    total_revenues = totals['revenues'] or 0
+    return {
+        'total_revenues': str(total_revenues),
+        'total_expenses': str(total_expenses),
+        'balance': str(total_revenues - total_expenses),
+        'period': f"{params.year}" + (f"-{params.month}" if params.month else "")
+    }
+
+
+def monthly_comparison(client_id, params):
+    """Totales por mes del año"""
+    by_month = (
+        MonthlyRollup.objects.filter(client_id=client_id, month__year=params.year)
+        .values('month')
+        .annotate(
+            expenses=Sum('expense_total'),
+            expense_count=Sum('expense_count'),
+            revenues=Sum('revenue_total'),
+            revenue_count=Sum('revenue_count')
+        )
+        .order_by('month')
+    )
+    return {
+        'expenses': [
+            {
+                'month': item['month'].strftime('%Y-%m'),
+                'total': str(item['expenses'])
+            } for item in by_month if item['expense_count']
+        ],
+        'revenues': [
+            {
+                'month': item['month'].strftime('%Y-%m'),
+                'total': str(item['revenues'])
+            } for item in by_month if item['revenue_count']
+        ]
+    }
+
+
+def wallets_summary(client_id, params):
+    """Balance por wallet"""
+    return [{
+        'id': w.id,
+        'name': w.name,
+        'balance': str(w.available_balance)
+    } for w in wallet_services.load_pending(list(Wallet.objects.filter(client_id=client_id)))]
+
+
+def historical_balance(client_id, params):
+    """Balance histórico (últimos N meses, por defecto 6)"""
+    return rollups.historical_balance(client_id, months=params.months)
+
+
+def top_expenses(client_id, params):
+    """Top 5 gastos más grandes"""
+    expenses_qs = Expense.objects.filter(client_id=client_id, is_deleted=False, expense_date__year=params.year)
+    if params.month:
+        expenses_qs = expenses_qs.filter(expense_date__month=params.month)
+    return list(expenses_qs.order_by('-amount')[:5].values('id', 'name', 'amount', 'expense_date'))
+
+
+def top_revenues(client_id, params):
+    """Top 5 ingresos más grandes"""
+    revenues_qs = Revenue.objects.filter(client_id=client_id, is_deleted=False, revenue_date__year=params.year)
+    if params.month:
+        revenues_qs = revenues_qs.filter(revenue_date__month=params.month)
+    return list(revenues_qs.order_by('-amount')[:5].values('id', 'name', 'amount', 'revenue_date'))
+
+
+SECTIONS = {
+    'summary': summary,
+    'monthly_comparison': monthly_comparison,
+    'wallets_summary': wallets_summary,
+    'historical_balance': historical_balance,
+    'top_expenses': top_expenses,
+    'top_revenues': top_revenues,
+}
+
+
+def build(client_id, params):
+    """Calcula las secciones pedidas una después de otra (vista sync)"""
+    return {name: SECTIONS[name](client_id, params) for name in params.sections}
+
+
+# Pool acotado para las secciones del dashboard async: cada hilo usa su propia conexión
+# (las conexiones de Django son por hilo), así que el tamaño del pool acota las conexiones extra.
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard'
+        )
+    return _executor
+
+
+def _run_section(section, client_id, params):
+    try:
+        return section(client_id, params)
+    finally:
+        # Cierra la conexión del hilo si venció CONN_MAX_AGE (o si es 0), como al final de un request
+        close_old_connections()
+
+
+async def build_concurrently(client_id, params):
+    """Calcula las secciones en paralelo: la latencia es la de la sección más lenta, no la suma"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, _run_section, SECTIONS[name], client_id, params)
+        for name in params.sections
+    ))
+    return dict(zip(params.sections, results))
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from users import dashboard
+from users.models import Client
+from users.seeding import delete_seeded, seed_client
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la latencia del dashboard calculado en secuencia (vista sync) contra '
+        'las secciones en paralelo (vista async)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client', type=int, help='Usar este cliente en vez de crear datos de prueba')
+        parser.add_argument('--wallets', type=int, default=5)
+        parser.add_argument('--rows', type=int, default=5000, help='Gastos e ingresos por billetera')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--months', type=int, default=24)
+        parser.add_argument('--year', type=int, default=date.today().year)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        seeded = None
+        if options['client']:
+            if not Client.objects.filter(pk=options['client']).exists():
+                raise CommandError(f"Client {options['client']} not found")
+            client_id = options['client']
+        else:
+            year = options['year']
+            seeded = seed_client(
+                wallets=options['wallets'], rows=options['rows'], seed=options['seed'],
+                start=date(year, 1, 1) - timedelta(days=30 * options['months']), end=date(year, 12, 31),
+                stdout=self.stdout
+            )
+            client_id = seeded[1].id
+
+        params = dashboard.DashboardParams(QueryDict(f"year={options['year']}&months={options['months']}"))
+        try:
+            # Una vuelta de cada uno para calentar conexiones y caches del motor
+            dashboard.build(client_id, params)
+            asyncio.run(dashboard.build_concurrently(client_id, params))
+
+            sync_times = []
+            for _ in range(options['iterations']):
+                began = time.perf_counter()
+                dashboard.build(client_id, params)
+                sync_times.append(time.perf_counter() - began)
+
+            async def run_async():
+                times = []
+                for _ in range(options['iterations']):
+                    began = time.perf_counter()
+                    await dashboard.build_concurrently(client_id, params)
+                    times.append(time.perf_counter() - began)
+                return times
+
+            async_times = asyncio.run(run_async())
+        finally:
+            if seeded is not None:
+                delete_seeded(*seeded)
+
+        self.report('sync ', sync_times)
+        self.report('async', async_times)
+        speedup = self.percentile(sync_times, 0.5) / self.percentile(async_times, 0.5)
+        self.stdout.write(self.style.SUCCESS(f'p50 speedup: {speedup:.2f}x'))
+
+    @staticmethod
+    def percentile(times, p):
+        ordered = sorted(times)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def report(self, label, times):
+        self.stdout.write(
+            f'{label}: p50 {self.percentile(times, 0.5) * 1000:.1f}ms '
+            f'p95 {self.percentile(times, 0.95) * 1000:.1f}ms '
+            f'p99 {self.percentile(times, 0.99) * 1000:.1f}ms '
+            f'mean {sum(times) / len(times) * 1000:.1f}ms'
+        )
@@ -0,0 +1,221 @@
+import json
+import math
+import time
+from datetime import date
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from API_revenue_portfolio.cache import RESPONSE_CACHE
+from expenses.models import Expense
+from revenue.models import Revenue
+from users.authentication import ClientRefreshToken
+from users.seeding import delete_seeded, seed_client
+from wallets import services as wallet_services
+from wallets.models import Wallet
+
+DEFAULT_BUDGETS = Path(settings.BASE_DIR) / 'bench_budgets.json'
+
+
+def _percentile(times, p):
+    ordered = sorted(times)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Endpoint:
+    """Un endpoint a medir: `prepare(ctx, i)` arma (path, body) fuera de la medición"""
+
+    def __init__(self, name, method, prepare, uncached=False):
+        self.name = name
+        self.method = method
+        self.prepare = prepare
+        # Para dashboard y my_profile: se vacía la cache de respuestas antes de cada request
+        self.uncached = uncached
+
+
+def _new_wallet(ctx, i):
+    wallet = wallet_services.open_wallet(ctx['client'], f'delete{i}', '', 0)
+    return f'/wallets/{wallet.id}/', None
+
+
+ENDPOINTS = [
+    Endpoint('wallet_list', 'get', lambda ctx, i: ('/wallets/', None)),
+    Endpoint('wallet_create', 'post', lambda ctx, i: ('/wallets/', {'name': f'new{i}', 'balance': '10.00'})),
+    Endpoint('wallet_retrieve', 'get', lambda ctx, i: (f"/wallets/{ctx['wallet']}/", None)),
+    Endpoint('wallet_update', 'patch', lambda ctx, i: (f"/wallets/{ctx['wallet']}/", {'description': f'bench {i}'})),
+    Endpoint('wallet_delete', 'delete', _new_wallet),
+    Endpoint('transfer', 'post', lambda ctx, i: (
+        f"/wallets/{ctx['wallet']}/transfer/", {'to_wallet': ctx['other_wallet'], 'amount': '1.00'}
+    )),
+    Endpoint('transfers_history', 'get', lambda ctx, i: (f"/wallets/{ctx['wallet']}/transfers/", None)),
+    Endpoint('expense_list', 'get', lambda ctx, i: ('/expenses/', None)),
+    Endpoint('expense_create', 'post', lambda ctx, i: ('/expenses/', {
+        'wallet': ctx['wallet'], 'name': 'bench', 'description': '', 'amount': '1.00',
+        'expense_date': date.today().isoformat()
+    })),
+    Endpoint('expense_update', 'patch', lambda ctx, i: (f"/expenses/{ctx['expense']}/", {'amount': f'{1 + i % 2}.00'})),
+    Endpoint('revenue_list', 'get', lambda ctx, i: ('/revenue/', None)),
+    Endpoint('revenue_create', 'post', lambda ctx, i: ('/revenue/', {
+        'wallet': ctx['wallet'], 'name': 'bench', 'description': '', 'amount': '1.00',
+        'revenue_date': date.today().isoformat()
+    })),
+    Endpoint('revenue_update', 'patch', lambda ctx, i: (f"/revenue/{ctx['revenue']}/", {'amount': f'{1 + i % 2}.00'})),
+    Endpoint('dashboard', 'get', lambda ctx, i: ('/users/dashboard/', None), uncached=True),
+    Endpoint('my_profile', 'get', lambda ctx, i: ('/users/me/', None), uncached=True),
+    # Pantalla de inicio de la app en un round trip: lo mismo que wallet_list + wallet_retrieve +
+    # expense_list + revenue_list + my_profile por separado
+    Endpoint('batch', 'post', lambda ctx, i: ('/batch/', {'requests': [
+        {'method': 'GET', 'path': '/wallets/'},
+        {'method': 'GET', 'path': f"/wallets/{ctx['wallet']}/"},
+        {'method': 'GET', 'path': '/expenses/'},
+        {'method': 'GET', 'path': '/revenue/'},
+        {'method': 'GET', 'path': '/users/me/'},
+    ]}), uncached=True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99) y cantidad de consultas SQL de cada endpoint sobre un dataset '
+        'sintético y falla si alguno supera el presupuesto de bench_budgets.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets', type=int, default=5)
+        parser.add_argument('--rows', type=int, default=2000, help='Gastos e ingresos por billetera')
+        parser.add_argument('--transfers', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='+', metavar='ENDPOINT', help='Medir solo estos endpoints')
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS), help='Archivo JSON de presupuestos')
+        parser.add_argument(
+            '--latency-tolerance', type=float, default=1.0,
+            help='Multiplica las líneas base de p95 (máquinas más lentas que la de referencia)'
+        )
+        parser.add_argument('--no-latency', action='store_true', help='Controlar solo la cantidad de consultas')
+        parser.add_argument(
+            '--write-budgets', action='store_true',
+            help='Guardar los resultados de esta corrida como nuevos presupuestos en vez de compararlos'
+        )
+        parser.add_argument('--output', help='Guardar los resultados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options['only']:
+            unknown = set(options['only']) - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in options['only']]
+
+        budgets = {}
+        if not options['write_budgets']:
+            try:
+                with open(options['budgets']) as budgets_file:
+                    budgets = json.load(budgets_file)
+            except FileNotFoundError:
+                raise CommandError(f"Budgets file {options['budgets']} not found (use --write-budgets)")
+
+        user, client = seed_client(
+            wallets=max(options['wallets'], 2), rows=options['rows'], transfers=options['transfers'],
+            seed=options['seed'], stdout=self.stdout
+        )
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = self.run(user, client, endpoints, options['iterations'])
+        finally:
+            delete_seeded(user, client)
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2, sort_keys=True)
+
+        if options['write_budgets']:
+            self.write_budgets(options['budgets'], results)
+            return
+
+        failures = self.check_budgets(results, budgets, options['latency_tolerance'], not options['no_latency'])
+        if failures:
+            raise CommandError('Performance budget exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+
+    def run(self, user, client, endpoints, iterations):
+        token = ClientRefreshToken.for_user(user).access_token
+        http = HttpClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        wallets = list(Wallet.objects.filter(client=client).order_by('id').values_list('id', flat=True))
+        ctx = {
+            'client': client,
+            'wallet': wallets[0],
+            'other_wallet': wallets[1],
+            'expense': Expense.objects.filter(wallet_id=wallets[0]).values_list('id', flat=True).first(),
+            'revenue': Revenue.objects.filter(wallet_id=wallets[0]).values_list('id', flat=True).first(),
+        }
+
+        results = {}
+        for endpoint in endpoints:
+            times, queries = [], []
+            # La primera vuelta no se mide (conexión, caches del motor)
+            for i in range(-1, iterations):
+                path, body = endpoint.prepare(ctx, i)
+                if endpoint.uncached:
+                    caches[RESPONSE_CACHE].clear()
+                request = getattr(http, endpoint.method)
+                with CaptureQueriesContext(connection) as captured:
+                    began = time.perf_counter()
+                    # secure=True: sin DEBUG, SECURE_SSL_REDIRECT respondería 301 a todo
+                    if body is None:
+                        response = request(path, secure=True)
+                    else:
+                        response = request(path, body, content_type='application/json', secure=True)
+                    elapsed = time.perf_counter() - began
+                if not 200 <= response.status_code < 300:
+                    raise CommandError(
+                        f'{endpoint.name}: {endpoint.method.upper()} {path} returned {response.status_code}: '
+                        f'{response.content[:200]!r}'
+                    )
+                if i >= 0:
+                    times.append(elapsed)
+                    queries.append(len(captured))
+            results[endpoint.name] = {
+                'queries': max(queries),
+                'p50_ms': round(_percentile(times, 0.5) * 1000, 2),
+                'p95_ms': round(_percentile(times, 0.95) * 1000, 2),
+                'p99_ms': round(_percentile(times, 0.99) * 1000, 2),
+            }
+        return results
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':<20}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['queries']:>8}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
+
+    @staticmethod
+    def check_budgets(results, budgets, tolerance, check_latency):
+        failures = []
+        for name, result in results.items():
+            budget = budgets.get(name)
+            if budget is None:
+                failures.append(f'{name}: no budget (use --write-budgets)')
+                continue
+            if result['queries'] > budget['queries']:
+                failures.append(f"{name}: {result['queries']} queries > budget {budget['queries']}")
+            if check_latency and result['p95_ms'] > budget['p95_ms'] * tolerance:
+                failures.append(f"{name}: p95 {result['p95_ms']}ms > baseline {budget['p95_ms'] * tolerance:.2f}ms")
+        return failures
+
+    def write_budgets(self, path, results):
+        # Las consultas son exactas; la latencia lleva un margen del 50% para absorber ruido
+        budgets = {
+            name: {'queries': result['queries'], 'p95_ms': math.ceil(result['p95_ms'] * 1.5)}
+            for name, result in results.items()
+        }
+        with open(path, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=2, sort_keys=True)
+            budgets_file.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Budgets written to {path}'))
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.test import Client as HttpClient
+from django.test.utils import override_settings
+from expenses.models import Expense
+from rollups import services as rollups
+from rollups.models import MonthlyRollup
+from users.authentication import ClientRefreshToken
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import LedgerEntry, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de contención de PATCH /expenses/{id}/: varios hilos editan el monto de pocos gastos '
+        'a la vez y al final se verifica que ninguna edición se perdió ni descuadró el balance'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--updates', type=int, default=200, help='PATCH por hilo')
+        parser.add_argument('--expenses', type=int, default=2, help='Menos gastos = más contención')
+        parser.add_argument(
+            '--if-match', action='store_true',
+            help='Cada PATCH lleva el ETag de un GET previo (412 si otro escribió en el medio)'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='No borrar los datos creados')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and options['threads'] > 1:
+            self.stderr.write(self.style.WARNING(
+                'SQLite serializes writers: expect "database is locked" errors with several threads'
+            ))
+
+        suffix = uuid.uuid4().hex
+        user = User.objects.create_user(f'bench-{suffix}', f'bench-{suffix}@example.com')
+        client = Client.objects.create(name='bench', email=user.email)
+        initial = Decimal('1000000.00')
+        wallet = wallet_services.open_wallet(client, 'bench', '', initial)
+        expense_ids = []
+        for i in range(options['expenses']):
+            expense = Expense.objects.create(
+                client=client, wallet=wallet, name=f'bench{i}', description='', amount=Decimal('1.00'),
+                expense_date=date.today()
+            )
+            wallet_services.debit(wallet.id, expense.amount, LedgerEntry.EXPENSE, expense.id)
+            rollups.add_expense(client.id, wallet.id, expense.expense_date, expense.amount)
+            expense_ids.append(expense.id)
+        token = ClientRefreshToken.for_user(user).access_token
+
+        results = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'] + 1)
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            http = HttpClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+            stats = {'ok': 0, 'precondition_failed': 0, 'conflicts': 0, 'errors': 0, 'latencies': []}
+            try:
+                start.wait()
+                for _ in range(options['updates']):
+                    path = f'/expenses/{rng.choice(expense_ids)}/'
+                    body = {'amount': f'{rng.randint(1, 100)}.00'}
+                    began = time.perf_counter()
+                    try:
+                        headers = {}
+                        if options['if_match']:
+                            headers['If-Match'] = http.get(path, secure=True)['ETag']
+                        response = http.patch(
+                            path, body, content_type='application/json', secure=True, headers=headers
+                        )
+                    except DatabaseError:
+                        # Deadlocks, timeouts de lock, "database is locked"...
+                        stats['errors'] += 1
+                        continue
+                    stats['latencies'].append(time.perf_counter() - began)
+                    if response.status_code == 200:
+                        stats['ok'] += 1
+                    elif response.status_code == 412:
+                        stats['precondition_failed'] += 1
+                    elif response.status_code == 409:
+                        stats['conflicts'] += 1
+                    else:
+                        stats['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    results.append(stats)
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+        try:
+            self.report(results, elapsed)
+            self.check_consistency(client, wallet, expense_ids, initial, sum(r['ok'] for r in results))
+        finally:
+            if not options['keep']:
+                client.delete()
+                user.delete()
+
+    def report(self, results, elapsed):
+        ok = sum(r['ok'] for r in results)
+        latencies = sorted(latency for r in results for latency in r['latencies'])
+        if not latencies:
+            return
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f"{ok} updates ok, {sum(r['precondition_failed'] for r in results)} rejected (412), "
+            f"{sum(r['conflicts'] for r in results)} gave up (409), {sum(r['errors'] for r in results)} errors"
+        )
+        self.stdout.write(
+            f'{elapsed:.2f}s, {ok / elapsed:,.0f} updates/s, '
+            f'latency p50 {percentile(0.5):.1f}ms p95 {percentile(0.95):.1f}ms p99 {percentile(0.99):.1f}ms'
+        )
+
+    def check_consistency(self, client, wallet, expense_ids, initial, ok):
+        expenses = Expense.objects.filter(id__in=expense_ids)
+        # Cada PATCH exitoso sube la versión exactamente una vez: si no, una edición pisó a otra
+        bumps = sum(version - 1 for version in expenses.values_list('version', flat=True))
+        if bumps != ok:
+            raise CommandError(f'{ok} successful updates but versions moved {bumps} times')
+
+        spent = expenses.aggregate(total=Sum('amount'))['total']
+        balance = Wallet.objects.get(pk=wallet.pk).balance
+        if balance != initial - spent:
+            raise CommandError(f'Balance {balance}, expenses imply {initial - spent}')
+        ledger = LedgerEntry.objects.filter(wallet=wallet).aggregate(total=Sum('amount'))['total']
+        if ledger != balance:
+            raise CommandError(f'Balance {balance}, ledger sums {ledger}')
+        rollup = MonthlyRollup.objects.filter(client=client).aggregate(total=Sum('expense_total'))['total']
+        if rollup != spent:
+            raise CommandError(f'Expenses sum {spent}, monthly rollups sum {rollup}')
+        self.stdout.write(self.style.SUCCESS(f'No lost updates: balance {balance} matches expenses, ledger and rollups'))
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils.dateparse import parse_date
+from users.seeding import PLANNED_TABLES, SCALE_TABLES, plan_client, reserve_ids, seed_chunk
+
+
+def _date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un dataset sintético grande (usuarios, clientes, billeteras, gastos, ingresos, '
+        'transferencias, ledger y totales mensuales) determinista a partir de --seed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--expenses', type=int, default=200, help='Gastos promedio por cliente')
+        parser.add_argument('--revenues', type=int, default=24, help='Ingresos sueltos promedio por cliente (además del salario mensual)')
+        parser.add_argument('--transfers', type=int, default=20, help='Transferencias promedio por cliente')
+        parser.add_argument('--max-wallets', type=int, default=5)
+        parser.add_argument('--months', type=int, default=36, help='Meses de historia')
+        parser.add_argument(
+            '--end', type=_date, default=date.today(),
+            help='Último día de la historia (YYYY-MM-DD); fijarlo para que dos corridas den lo mismo'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.2,
+            help='Alfa de la Pareto del volumen por cliente: cuanto más bajo, más peso en unos pocos clientes'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='Prefijo de usernames y emails')
+        parser.add_argument('--password', help='Contraseña de todos los usuarios (por defecto no pueden hacer login)')
+        parser.add_argument('--workers', type=int, help='Procesos en paralelo (por defecto, uno por CPU en PostgreSQL)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Clientes por transacción')
+
+    def handle(self, *args, **options):
+        if options['clients'] <= 0 or options['months'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('--clients, --months and --chunk-size must be positive')
+        if options['skew'] <= 0:
+            raise CommandError('--skew must be positive')
+
+        workers = options['workers'] or (os.cpu_count() if connection.vendor == 'postgresql' else 1)
+        if workers > 1 and connection.vendor != 'postgresql':
+            raise CommandError('Parallel workers require PostgreSQL (SQLite allows a single writer)')
+        if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Parallel workers require fork(); use --workers 1 on this platform')
+
+        seed = options['seed']
+        generation = {
+            key: options[key]
+            for key in ('expenses', 'revenues', 'transfers', 'max_wallets', 'months', 'end', 'skew', 'prefix')
+        }
+        # Un solo hash para todos: make_password cuesta cientos de milisegundos
+        generation['password'] = make_password(options['password'])
+
+        # Planificación: filas por cliente y tabla, para reservar rangos de ids consecutivos
+        started = time.monotonic()
+        chunks = []
+        totals = [0] * len(PLANNED_TABLES)
+        for first in range(0, options['clients'], options['chunk_size']):
+            last = min(first + options['chunk_size'], options['clients'])
+            counts = [0] * len(PLANNED_TABLES)
+            for index in range(first, last):
+                counts = [a + b for a, b in zip(counts, plan_client(seed, index, generation))]
+            chunks.append((first, last, list(totals)))
+            totals = [a + b for a, b in zip(totals, counts)]
+
+        starts = [
+            reserve_ids(SCALE_TABLES[table][0], total) if total else 0
+            for table, total in zip(PLANNED_TABLES, totals)
+        ]
+        tasks = [
+            (seed, first, last, [start + offset for start, offset in zip(starts, offsets)], generation)
+            for first, last, offsets in chunks
+        ]
+        self.stdout.write(
+            f"Planned {options['clients']} clients: "
+            + ', '.join(f'{total} {table}' for table, total in zip(PLANNED_TABLES[1:], totals[1:]))
+        )
+
+        written = {table: 0 for table in SCALE_TABLES}
+        if workers == 1:
+            results = (seed_chunk(*task) for task in tasks)
+            self.collect(results, written, len(tasks), started)
+        else:
+            # Los hijos heredan Django ya configurado; cada uno abre su propia conexión
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [pool.submit(seed_chunk, *task) for task in tasks]
+                self.collect((future.result() for future in as_completed(futures)), written, len(tasks), started)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model, _, _ in SCALE_TABLES.values():
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rows = sum(written.values())
+        self.stdout.write(', '.join(f'{count} {table}' for table, count in written.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s, {workers} workers)'
+        ))
+
+    def collect(self, results, written, total, started):
+        for done, counts in enumerate(results, 1):
+            for table, count in counts.items():
+                written[table] += count
+            self.stdout.write(f'  chunk {done}/{total} ({time.monotonic() - started:.1f}s)')
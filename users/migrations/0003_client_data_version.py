@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_remove_client_password"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="data_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -4,6 +4,8 @@ class Client(models.Model):
     id = models.BigAutoField(primary_key=True)
     name = models.TextField(null=False)
     email = models.EmailField(unique=True, null=False)
+    # Se incrementa en cada escritura del cliente; forma parte de la clave de la cache de respuestas
+    data_version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,336 @@
+import calendar
+import csv
+import io
+import math
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.utils import timezone
+from expenses.models import Expense
+from revenue.models import Revenue
+from rollups.models import MonthlyRollup
+from users.models import Client
+from wallets.models import LedgerEntry, Transfer, Wallet
+
+OPENING_BALANCE = Decimal('1000000.00')
+BATCH_SIZE = 1000
+
+
+def _amount(rng):
+    return Decimal(rng.randint(100, 100000)) / 100
+
+
+def seed_client(wallets=5, rows=1000, transfers=100, start=None, end=None, seed=0, stdout=None):
+    """Crea un usuario + cliente con datos sintéticos para benchmarks.
+
+    Cada billetera recibe `rows` gastos y `rows` ingresos entre `start` y `end`, y entre
+    billeteras consecutivas se crean `transfers` transferencias. Los balances, el ledger y
+    los totales mensuales quedan consistentes, como si todo hubiera pasado por la API.
+    Devuelve (user, client); borrar ambos elimina todo lo creado.
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = start or end - timedelta(days=365)
+    span = (end - start).days
+    tag = uuid.uuid4().hex
+    email = f'bench-{tag}@example.com'
+
+    with transaction.atomic():
+        user = User.objects.create_user(username=f'bench-{tag}', email=email, password=None)
+        client = Client.objects.create(name='bench', email=email)
+        wallet_objs = Wallet.objects.bulk_create([
+            Wallet(client=client, name=f'bench{i}', balance=OPENING_BALANCE) for i in range(wallets)
+        ])
+        balances = {wallet.id: OPENING_BALANCE for wallet in wallet_objs}
+        ledger = [
+            LedgerEntry(wallet=wallet, kind=LedgerEntry.OPENING, amount=OPENING_BALANCE)
+            for wallet in wallet_objs
+        ]
+
+        for wallet in wallet_objs:
+            for model, date_field, kind, sign in (
+                (Expense, 'expense_date', LedgerEntry.EXPENSE, -1),
+                (Revenue, 'revenue_date', LedgerEntry.REVENUE, 1),
+            ):
+                created = model.objects.bulk_create([
+                    model(**{
+                        'client': client, 'wallet': wallet, 'name': f'bench {kind}', 'description': '',
+                        'amount': _amount(rng), date_field: start + timedelta(days=rng.randint(0, span)),
+                    })
+                    for _ in range(rows)
+                ], batch_size=BATCH_SIZE)
+                for item in created:
+                    balances[wallet.id] += sign * item.amount
+                    ledger.append(LedgerEntry(wallet=wallet, kind=kind, amount=sign * item.amount, reference_id=item.id))
+
+        pairs = list(zip(wallet_objs, wallet_objs[1:]))
+        if pairs:
+            created = Transfer.objects.bulk_create([
+                Transfer(client=client, from_wallet=from_wallet, to_wallet=to_wallet, amount=_amount(rng))
+                for from_wallet, to_wallet in (rng.choice(pairs) for _ in range(transfers))
+            ], batch_size=BATCH_SIZE)
+            for item in created:
+                balances[item.from_wallet_id] -= item.amount
+                balances[item.to_wallet_id] += item.amount
+                ledger += [
+                    LedgerEntry(wallet_id=item.from_wallet_id, kind=LedgerEntry.TRANSFER, amount=-item.amount, reference_id=item.id),
+                    LedgerEntry(wallet_id=item.to_wallet_id, kind=LedgerEntry.TRANSFER, amount=item.amount, reference_id=item.id),
+                ]
+
+        LedgerEntry.objects.bulk_create(ledger, batch_size=BATCH_SIZE)
+        for wallet in wallet_objs:
+            wallet.balance = balances[wallet.id]
+        Wallet.objects.bulk_update(wallet_objs, ['balance'])
+
+    call_command('rebuild_rollups', client=client.id, **({'stdout': stdout} if stdout else {}))
+    return user, client
+
+
+def delete_seeded(user, client):
+    """Borra lo creado por seed_client (las billeteras, movimientos y rollups caen en cascada)"""
+    client.delete()
+    user.delete()
+
+
+# Datasets grandes (seed_scale): cada cliente sale de su propio Random(seed, índice), así el
+# resultado no depende de cuántos workers lo generen ni en qué orden terminen.
+
+# Peso relativo de cada mes (enero..diciembre): rebajas de enero, vacaciones, fiestas
+SEASONALITY = (1.05, 0.85, 0.95, 0.95, 1.0, 1.0, 1.1, 1.1, 0.9, 0.95, 1.15, 1.5)
+# Tope del peso de actividad de un cliente (cola de la Pareto)
+MAX_WEIGHT = 200
+EXPENSE_NAMES = (
+    'Supermercado', 'Transporte', 'Restaurante', 'Servicios', 'Alquiler', 'Salud',
+    'Entretenimiento', 'Ropa', 'Educación', 'Viajes',
+)
+REVENUE_NAMES = ('Freelance', 'Venta', 'Intereses', 'Reembolso', 'Bono')
+# Modelo, campos (en orden de columna) y si el id se asigna de antemano (lo referencian otras filas)
+SCALE_TABLES = {
+    'users': (User, ('password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+                     'is_staff', 'is_active', 'date_joined'), False),
+    'clients': (Client, ('id', 'name', 'email', 'data_version', 'created_at', 'updated_at'), True),
+    'wallets': (Wallet, ('id', 'client', 'name', 'description', 'balance', 'is_deleted',
+                         'created_at', 'updated_at'), True),
+    'expenses': (Expense, ('id', 'client', 'wallet', 'name', 'description', 'amount', 'expense_date',
+                           'is_deleted', 'created_at', 'updated_at'), True),
+    'revenues': (Revenue, ('id', 'client', 'wallet', 'name', 'description', 'amount', 'revenue_date',
+                           'is_deleted', 'created_at', 'updated_at'), True),
+    'transfers': (Transfer, ('id', 'client', 'from_wallet', 'to_wallet', 'amount', 'description',
+                             'transfer_date', 'created_at', 'updated_at'), True),
+    'ledger': (LedgerEntry, ('wallet', 'kind', 'amount', 'reference_id', 'created_at'), False),
+    'rollups': (MonthlyRollup, ('client', 'wallet', 'month', 'revenue_total', 'revenue_count',
+                                'expense_total', 'expense_count', 'updated_at'), False),
+}
+# Tablas con id reservado, en el orden de las tuplas que devuelve plan_client
+PLANNED_TABLES = ('clients', 'wallets', 'expenses', 'revenues', 'transfers')
+
+
+def scale_months(end, months):
+    """Primer día de cada uno de los `months` meses que terminan en el de `end`"""
+    index = end.year * 12 + end.month - 1
+    return [date(i // 12, i % 12 + 1, 1) for i in range(index - months + 1, index + 1)]
+
+
+def _pareto_mean(alpha, cap):
+    # E[min(X, cap)] para X ~ Pareto(alpha, xm=1)
+    if alpha == 1:
+        return 1 + math.log(cap)
+    return (alpha - cap ** (1 - alpha)) / (alpha - 1)
+
+
+def plan_client(seed, index, options):
+    """Cuántas filas de cada tabla tendrá el cliente: (1, billeteras, gastos, ingresos, transferencias).
+
+    Usa su propio Random para que el proceso principal pueda reservar ids sin generar las filas.
+    """
+    rng = random.Random(f'{seed}:{index}:plan')
+    weight = min(rng.paretovariate(options['skew']), MAX_WEIGHT)
+    scale = weight / _pareto_mean(options['skew'], MAX_WEIGHT)
+    wallets = min(options['max_wallets'], 1 + rng.randrange(2) + int(math.log2(weight)))
+    expenses = round(options['expenses'] * scale * rng.uniform(0.5, 1.5))
+    # Un salario por mes más ingresos sueltos
+    revenues = options['months'] + round(options['revenues'] * scale * rng.uniform(0.5, 1.5))
+    transfers = round(options['transfers'] * scale * rng.uniform(0.5, 1.5)) if wallets > 1 else 0
+    return 1, wallets, expenses, revenues, transfers
+
+
+def _money(rng, mu, sigma, low=Decimal('1.00'), high=Decimal('50000.00')):
+    value = Decimal(str(round(rng.lognormvariate(mu, sigma), 2)))
+    return min(max(value, low), high)
+
+
+class _Calendar:
+    """Sortea fechas del período con la estacionalidad de SEASONALITY"""
+
+    def __init__(self, months, end):
+        self.months = months
+        self.end = end
+        self.cum_weights = []
+        total = 0
+        for month in months:
+            total += SEASONALITY[month.month - 1] * self.days(month)
+            self.cum_weights.append(total)
+
+    def days(self, month):
+        last = calendar.monthrange(month.year, month.month)[1]
+        if (month.year, month.month) == (self.end.year, self.end.month):
+            last = self.end.day
+        return last
+
+    def day(self, rng):
+        month = rng.choices(self.months, cum_weights=self.cum_weights)[0]
+        return month.replace(day=rng.randint(1, self.days(month)))
+
+
+def _moment(rng, day):
+    return datetime.combine(day, time(), tzinfo=dt_timezone.utc) + timedelta(seconds=rng.randrange(86400))
+
+
+def generate_client(seed, index, ids, options, out):
+    """Genera las filas de un cliente en `out` (tabla -> lista de tuplas) con los ids recibidos.
+
+    Los balances son la suma del historial; el saldo de apertura de cada billetera alcanza
+    para que ningún movimiento la deje en negativo, como pasaría usando la API.
+    """
+    rng = random.Random(f'{seed}:{index}:rows')
+    client_id, wallet_ids, expense_ids, revenue_ids, transfer_ids = ids
+    months = scale_months(options['end'], options['months'])
+    dates = _Calendar(months, options['end'])
+    adapt_dt = connection.ops.adapt_datetimefield_value
+    start = _moment(rng, months[0]) - timedelta(days=rng.randint(1, 60))
+    email = f"{options['prefix']}{seed}-{index}@example.com"
+
+    out['users'].append((
+        options['password'], False, f"{options['prefix']}{seed}-{index}", '', '', email, False, True, adapt_dt(start)
+    ))
+    out['clients'].append((client_id, f'Client {index}', email, 0, adapt_dt(start), adapt_dt(start)))
+
+    # (momento, billetera, monto con signo, tipo, referencia)
+    events = []
+    salary = _money(rng, 7.5, 0.5)
+    salary_ids = revenue_ids[:len(months)]
+    for revenue_id, month in zip(salary_ids, months):
+        day = month.replace(day=min(rng.randint(1, 5), dates.days(month)))
+        amount = (salary * Decimal(str(rng.uniform(0.97, 1.03)))).quantize(Decimal('0.01'))
+        events.append((_moment(rng, day), wallet_ids[0], amount, 'revenue', revenue_id, 'Salario'))
+    for revenue_id in revenue_ids[len(months):]:
+        events.append((
+            _moment(rng, dates.day(rng)), rng.choice(wallet_ids), _money(rng, 5, 1), 'revenue',
+            revenue_id, rng.choice(REVENUE_NAMES)
+        ))
+    for expense_id in expense_ids:
+        events.append((
+            _moment(rng, dates.day(rng)), rng.choice(wallet_ids), -_money(rng, 3.5, 1), 'expense',
+            expense_id, rng.choice(EXPENSE_NAMES)
+        ))
+    for transfer_id in transfer_ids:
+        from_wallet, to_wallet = rng.sample(wallet_ids, 2)
+        events.append((
+            _moment(rng, dates.day(rng)), from_wallet, _money(rng, 5, 1), 'transfer', transfer_id, to_wallet
+        ))
+    events.sort(key=lambda event: (event[0], event[4]))
+
+    running = {wallet_id: Decimal('0.00') for wallet_id in wallet_ids}
+    lowest = dict(running)
+    ledger = []
+    rollups = {}
+    for moment, wallet_id, amount, kind, reference_id, extra in events:
+        created = adapt_dt(moment)
+        if kind == 'transfer':
+            to_wallet = extra
+            out['transfers'].append((reference_id, client_id, wallet_id, to_wallet, amount, '', created, created, created))
+            ledger += [
+                (wallet_id, LedgerEntry.TRANSFER, -amount, reference_id, created),
+                (to_wallet, LedgerEntry.TRANSFER, amount, reference_id, created),
+            ]
+            running[wallet_id] -= amount
+            running[to_wallet] += amount
+        else:
+            table = 'expenses' if kind == 'expense' else 'revenues'
+            out[table].append((
+                reference_id, client_id, wallet_id, extra, '', abs(amount), moment.date(), False, created, created
+            ))
+            ledger.append((wallet_id, kind, amount, reference_id, created))
+            running[wallet_id] += amount
+            rollup = rollups.setdefault((wallet_id, moment.date().replace(day=1)), [Decimal('0.00'), 0, Decimal('0.00'), 0])
+            offset = 0 if kind == 'revenue' else 2
+            rollup[offset] += abs(amount)
+            rollup[offset + 1] += 1
+        for touched in (wallet_id, extra) if kind == 'transfer' else (wallet_id,):
+            lowest[touched] = min(lowest[touched], running[touched])
+
+    now = adapt_dt(timezone.now())
+    for position, wallet_id in enumerate(wallet_ids):
+        opening = -lowest[wallet_id] + _money(rng, 6, 1)
+        wallet_created = adapt_dt(start + timedelta(minutes=position))
+        out['wallets'].append((
+            wallet_id, client_id, f'Billetera {position + 1}', '', opening + running[wallet_id], False,
+            wallet_created, wallet_created
+        ))
+        out['ledger'].append((wallet_id, LedgerEntry.OPENING, opening, None, wallet_created))
+    out['ledger'] += ledger
+    for (wallet_id, month), (revenue_total, revenue_count, expense_total, expense_count) in rollups.items():
+        out['rollups'].append((client_id, wallet_id, month, revenue_total, revenue_count, expense_total, expense_count, now))
+
+
+def write_rows(cursor, model, fields, rows):
+    """Inserta filas crudas: COPY en PostgreSQL, executemany en el resto de los motores"""
+    if not rows:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    model_fields = [model._meta.get_field(name) for name in fields]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in model_fields)
+    if connection.vendor == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        # En CSV un campo vacío es NULL; los de texto vacíos tienen que llegar como ''
+        text = [
+            connection.ops.quote_name(field.column) for field in model_fields
+            if isinstance(field, (models.CharField, models.TextField))
+        ]
+        copy_options = 'FORMAT csv' + (f", FORCE_NOT_NULL ({', '.join(text)})" if text else '')
+        cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH ({copy_options})', buffer)
+    else:
+        placeholders = ', '.join(['%s'] * len(fields))
+        cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+
+
+def seed_chunk(seed, first, last, bases, options):
+    """Genera y escribe los clientes [first, last) en una transacción; devuelve filas por tabla.
+
+    `bases` es el primer id reservado de cada tabla de PLANNED_TABLES para este bloque.
+    """
+    out = {table: [] for table in SCALE_TABLES}
+    next_ids = dict(zip(PLANNED_TABLES, bases))
+    for index in range(first, last):
+        ids = []
+        for table, count in zip(PLANNED_TABLES, plan_client(seed, index, options)):
+            ids.append(list(range(next_ids[table], next_ids[table] + count)))
+            next_ids[table] += count
+        ids[0] = ids[0][0]
+        generate_client(seed, index, ids, options, out)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, (model, fields, _) in SCALE_TABLES.items():
+            write_rows(cursor, model, fields, out[table])
+    return {table: len(rows) for table, rows in out.items()}
+
+
+def reserve_ids(model, count):
+    """Reserva `count` ids consecutivos de la tabla y devuelve el primero"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT setval(pg_get_serial_sequence(%s, %s), nextval(pg_get_serial_sequence(%s, %s)) + %s - 1)',
+                [table, 'id', table, 'id', count]
+            )
+            return cursor.fetchone()[0] - count + 1
+        # Con un solo proceso escribiendo alcanza con continuar después del id más alto
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
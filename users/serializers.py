@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth.models import User
+from .authentication import ClientRefreshToken
 from .models import Client
 
 class WalletBasicSerializer(serializers.Serializer):
@@ -35,4 +37,11 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             name=validated_data['username'],
             email=validated_data['email']
         )
-        return user
\ No newline at end of file
+        return user
+
+class ClientTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClientRefreshToken
+
+
+class ClientTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClientRefreshToken
@@ -1,3 +1,355 @@
-from django.test import TestCase
+import json
+import re
+import os
+import tempfile
+import threading
+from asgiref.sync import sync_to_async
+from datetime import date
+from io import StringIO
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.http import QueryDict
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from API_revenue_portfolio.cache import CACHE_HEADER, RESPONSE_CACHE
+from API_revenue_portfolio.testing import ClientAPITestCase
+from users.authentication import (
+    CLIENT_ID_CLAIM, ClientIdCache, ClientJWTAuthentication, ClientRefreshToken, client_ids
+)
+from expenses.models import Expense
+from revenue.models import Revenue
+from rollups import services as rollups
+from rollups.models import MonthlyRollup
+from users import dashboard as dashboard_sections
+from users.dashboard import DashboardParams
+from users.models import Client
+from wallets import services as wallet_services
+from wallets.models import LedgerEntry, Transfer, Wallet
+
+
+class ResponseCacheTests(ClientAPITestCase):
+    """Una escritura exitosa sube Client.data_version y el siguiente GET no usa la cache; una fallida no"""
+
+    username = 'cacheado'
+
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        super().setUp()
+
+    def data_version(self):
+        return Client.objects.get(pk=self.client_profile.pk).data_version
+
+    def dashboard(self):
+        response = self.api.get('/users/dashboard/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def create_expense(self, amount):
+        body = {
+            'wallet': self.wallet.id, 'name': 'café', 'description': '', 'amount': amount,
+            'expense_date': date.today().isoformat(),
+        }
+        return self.api.post('/expenses/', body, format='json', secure=True)
+
+    def test_write_invalidates(self):
+        first = self.dashboard()
+        self.assertEqual(first[CACHE_HEADER], 'MISS')
+        self.assertEqual(self.dashboard()[CACHE_HEADER], 'HIT')
+
+        version = self.data_version()
+        self.assertEqual(self.create_expense('10.00').status_code, 201)
+        self.assertEqual(self.data_version(), version + 1)
+        after = self.dashboard()
+        self.assertEqual(after[CACHE_HEADER], 'MISS')
+        self.assertNotEqual(after.json(), first.json())
+        self.assertEqual(self.dashboard()[CACHE_HEADER], 'HIT')
+
+        self.api.get('/users/me/', secure=True)
+        self.assertEqual(self.api.get('/users/me/', secure=True)[CACHE_HEADER], 'HIT')
+        response = self.api.patch(f'/wallets/{self.wallet.id}/', {'name': 'Caja'}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.data_version(), version + 2)
+        self.assertEqual(self.api.get('/users/me/', secure=True)[CACHE_HEADER], 'MISS')
+
+    def test_failed_write_keeps_cache(self):
+        self.dashboard()
+        version = self.data_version()
+        self.assertEqual(self.create_expense('-1').status_code, 400)
+        self.assertEqual(self.create_expense('1000.00').status_code, 400)
+        response = self.api.patch('/wallets/999999/', {'name': 'Caja'}, format='json', secure=True)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.data_version(), version)
+        self.assertEqual(self.dashboard()[CACHE_HEADER], 'HIT')
+
+
+class ClientIdCacheTests(SimpleTestCase):
+    def test_lru(self):
+        cache = ClientIdCache(maxsize=2)
+        cache.set(1, 10)
+        cache.set(2, 20)
+        self.assertEqual(cache.get(1), 10)
+        # El 2 es el menos usado: sale al agregar el 3
+        cache.set(3, 30)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual((cache.get(1), cache.get(3)), (10, 30))
+        cache.discard(1)
+        self.assertIsNone(cache.get(1))
+
+
+class ClientJWTAuthenticationTests(TestCase):
+    """request.client sale del claim client_id; los tokens viejos sin claim usan la cache user -> client"""
+
+    def setUp(self):
+        client_ids.clear()
+        self.addCleanup(client_ids.clear)
+        self.user = User.objects.create_user('autenticado', 'autenticado@example.com')
+        self.client_profile = Client.objects.create(name='autenticado', email=self.user.email)
+
+    def authenticate(self, token):
+        request = Request(APIRequestFactory().get('/wallets/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = ClientJWTAuthentication().authenticate(request)
+        self.assertEqual((user, request.client.id), (self.user, self.client_profile.id))
+        return [query['sql'] for query in queries.captured_queries if 'users_client' in query['sql']]
+
+    def test_claim_skips_client_query(self):
+        token = ClientRefreshToken.for_user(self.user).access_token
+        self.assertEqual(token[CLIENT_ID_CLAIM], self.client_profile.id)
+        client_ids.clear()
+        self.assertEqual(self.authenticate(token), [])
+        self.assertIsNone(client_ids.get(self.user.pk))
+
+    def test_legacy_token_uses_cache(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.assertNotIn(CLIENT_ID_CLAIM, token)
+        self.assertEqual(len(self.authenticate(token)), 1)
+        self.assertEqual(client_ids.get(self.user.pk), self.client_profile.id)
+        self.assertEqual(self.authenticate(token), [])
+        # Al refrescar un refresh token viejo el access nuevo ya trae el claim
+        refresh = str(RefreshToken.for_user(self.user))
+        response = APIClient().post('/users/token/refresh/', {'refresh': refresh}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authenticate(response.json()['access']), [])
+
+    def test_delete_user_evicts_cache(self):
+        self.authenticate(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(client_ids.get(self.user.pk), self.client_profile.id)
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser('raiz', 'raiz@example.com', 'clave'))
+        response = admin.delete(f'/users/admin/{self.user.pk}/', secure=True)
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(client_ids.get(self.user.pk))
+
+
+class DashboardSectionsTests(ClientAPITestCase):
+    """?sections= solo calcula (y consulta) las secciones pedidas"""
+
+    username = 'secciones'
+
+    def setUp(self):
+        super().setUp()
+        Expense.objects.bulk_create([
+            Expense(client=self.client_profile, wallet=self.wallet, name=f'gasto {k}', description='detalle',
+                    amount=Decimal('1.00'), expense_date=date(2024, 1, 1 + k))
+            for k in range(3)
+        ])
+
+    def test_dashboard_sections(self):
+        params = DashboardParams(QueryDict('sections=summary,top_expenses&year=2024'))
+        with self.assertNumQueries(2):
+            data = dashboard_sections.build(self.client_profile.id, params)
+        self.assertEqual(list(data), ['summary', 'top_expenses'])
+        self.assertEqual(len(data['top_expenses']), 3)
+        everything = dashboard_sections.build(self.client_profile.id, DashboardParams(QueryDict()))
+        self.assertEqual(list(everything), list(dashboard_sections.SECTIONS))
+        with self.assertRaises(ValueError):
+            DashboardParams(QueryDict('sections=summary,secret'))
+
+        response = self.api.get('/users/dashboard/?sections=summary&year=2024', secure=True)
+        self.assertEqual(list(response.json()), ['summary'])
+        self.assertEqual(self.api.get('/users/dashboard/?sections=secret', secure=True).status_code, 400)
+
+
+class DashboardAsyncTests(TransactionTestCase):
+    """/users/dashboard/async/ responde lo mismo que /users/dashboard/.
+
+    TransactionTestCase: las secciones corren en hilos con su propia conexión, que no verían
+    los datos dentro de la transacción de un TestCase.
+    """
+
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        self.addCleanup(caches[RESPONSE_CACHE].clear)
+        user = User.objects.create_user('asincrono', 'asincrono@example.com', 'secreto123')
+        client = Client.objects.create(name='asincrono', email=user.email)
+        wallet = wallet_services.open_wallet(client, 'Efectivo', '', Decimal('100.00'))
+        for day, amount in ((date(2023, 12, 30), '7.00'), (date(2024, 1, 5), '12.50'), (date(2024, 3, 9), '3.25')):
+            Expense.objects.create(client=client, wallet=wallet, name='gasto', amount=Decimal(amount), expense_date=day)
+            rollups.add_expense(client.id, wallet.id, day, Decimal(amount))
+        Revenue.objects.create(client=client, wallet=wallet, name='sueldo', amount=Decimal('40.00'),
+                               revenue_date=date(2024, 2, 1))
+        rollups.add_revenue(client.id, wallet.id, date(2024, 2, 1), Decimal('40.00'))
+        self.authorization = f'Bearer {ClientRefreshToken.for_user(user).access_token}'
+        self.addCleanup(self.close_worker_connections)
+
+    def close_worker_connections(self):
+        # Con CONN_MAX_AGE cada hilo del pool conserva su conexión y la base de tests no se podría borrar.
+        # La barrera hace que cada tarea corra en un hilo distinto.
+        workers = settings.DASHBOARD_WORKERS
+        barrier = threading.Barrier(workers)
+
+        def close():
+            barrier.wait(timeout=10)
+            connections.close_all()
+
+        executor = dashboard_sections.get_executor()
+        for future in [executor.submit(close) for _ in range(workers)]:
+            future.result()
+
+    async def get_async(self, query, **headers):
+        return await AsyncClient().get(f'/users/dashboard/async/{query}', secure=True, headers=headers)
+
+    def get_sync(self, query):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=self.authorization)
+        return api.get(f'/users/dashboard/{query}', secure=True)
+
+    async def test_same_as_sync(self):
+        for query in ('', '?year=2024', '?year=2023&sections=summary,top_expenses', '?sections=wallets_summary'):
+            response = await self.get_async(query, Authorization=self.authorization)
+            self.assertEqual(response.status_code, 200, query)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            # Cada vista con la cache vacía: la respuesta sale de calcular las secciones, no de la otra
+            await sync_to_async(caches[RESPONSE_CACHE].clear)()
+            expected = await sync_to_async(self.get_sync)(query)
+            await sync_to_async(caches[RESPONSE_CACHE].clear)()
+            self.assertEqual(expected.status_code, 200, query)
+            self.assertEqual(json.loads(response.content), expected.json(), query)
+
+    async def test_errors(self):
+        response = await self.get_async('')
+        self.assertEqual(response.status_code, 401)
+        response = await self.get_async('', Authorization='Bearer no-es-un-token')
+        self.assertEqual(response.status_code, 401)
+        response = await self.get_async('?sections=secret', Authorization=self.authorization)
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchEndpointsTests(TransactionTestCase):
+    """bench_endpoints --no-latency contra la base de tests: las consultas de cada endpoint vs. el presupuesto.
+
+    TransactionTestCase: dentro de la transacción de TestCase cada atomic sería un SAVEPOINT más
+    y las consultas no darían lo mismo que en producción.
+    """
+
+    def bench(self, *args, **options):
+        stdout = StringIO()
+        call_command(
+            'bench_endpoints', '--no-latency', *args, wallets=2, rows=20, transfers=5, iterations=2,
+            stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def budgets_file(self, budgets):
+        budgets_file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        self.addCleanup(os.remove, budgets_file.name)
+        with budgets_file:
+            json.dump(budgets, budgets_file)
+        return budgets_file.name
+
+    def test_within_budget(self):
+        output = self.bench()
+        self.assertIn('All endpoints within budget', output)
+        # Los datos sembrados se borran al terminar
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Client.objects.exists())
+
+    def test_over_budget(self):
+        budgets = self.budgets_file({
+            'wallet_list': {'queries': 1, 'p95_ms': 1000},
+            'my_profile': {'queries': 100, 'p95_ms': 0.001},
+        })
+        with self.assertRaises(CommandError) as raised:
+            self.bench('--only', 'wallet_list', 'my_profile', 'expense_list', budgets=budgets)
+        message = str(raised.exception)
+        self.assertIn('wallet_list: 4 queries > budget 1', message)
+        self.assertIn('expense_list: no budget', message)
+        # --no-latency: el p95 de my_profile no cuenta
+        self.assertNotIn('my_profile', message)
+
+    def test_write_budgets(self):
+        budgets = self.budgets_file({})
+        self.bench('--only', 'wallet_list', '--write-budgets', budgets=budgets)
+        with open(budgets) as budgets_file:
+            written = json.load(budgets_file)
+        self.assertEqual(list(written), ['wallet_list'])
+        self.assertEqual(written['wallet_list']['queries'], 4)
+        self.assertIn('All endpoints within budget', self.bench('--only', 'wallet_list', budgets=budgets))
+
+
+class SeedScaleTests(TestCase):
+    """seed_scale: las filas planificadas se escriben y son consistentes (balance = ledger = rollups)"""
+
+    def seed(self, **options):
+        stdout = StringIO()
+        call_command(
+            'seed_scale', clients=5, expenses=20, revenues=4, transfers=6, months=3, end=date(2024, 3, 31),
+            chunk_size=2, workers=1, stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def test_rows(self):
+        output = self.seed()
+        planned = dict(
+            (table, int(count)) for count, table in re.findall(r'(\d+) (\w+)', output.splitlines()[0].split(':', 1)[1])
+        )
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Client.objects.count(), 5)
+        self.assertEqual(planned, {
+            'wallets': Wallet.objects.count(), 'expenses': Expense.objects.count(),
+            'revenues': Revenue.objects.count(), 'transfers': Transfer.objects.count(),
+        })
+        # Apertura por billetera, uno por gasto e ingreso y dos por transferencia
+        self.assertEqual(
+            LedgerEntry.objects.count(),
+            planned['wallets'] + planned['expenses'] + planned['revenues'] + 2 * planned['transfers']
+        )
+        self.assertIn('chunk 3/3', output)
+
+    def test_balances_match_ledger_and_rollups(self):
+        self.seed()
+        ledger = dict(
+            LedgerEntry.objects.values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total')
+        )
+        balances = dict(Wallet.objects.values_list('id', 'balance'))
+        self.assertEqual(ledger, balances)
+        self.assertTrue(all(balance >= 0 for balance in balances.values()))
+
+        rollups = {
+            (row['wallet_id'], row['month']): row
+            for row in MonthlyRollup.objects.values(
+                'wallet_id', 'month', 'expense_total', 'expense_count', 'revenue_total', 'revenue_count'
+            )
+        }
+        for model, prefix, day in ((Expense, 'expense', 'expense_date'), (Revenue, 'revenue', 'revenue_date')):
+            months = model.objects.annotate(month=TruncMonth(day)).values('wallet_id', 'month').annotate(
+                total=Sum('amount'), count=Count('id')
+            )
+            self.assertEqual(
+                {(row['wallet_id'], row['month']): (row['total'], row['count']) for row in months},
+                {
+                    key: (row[f'{prefix}_total'], row[f'{prefix}_count'])
+                    for key, row in rollups.items() if row[f'{prefix}_count']
+                }
+            )
+        self.assertEqual({month for _, month in rollups}, {date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)})
 
-# Create your tests here.
@@ -6,14 +6,16 @@ from .views import (
     list_all_users, 
     delete_user, 
     change_user_password,
-    dashboard
+    dashboard,
+    dashboard_async
 )
+from .serializers import ClientTokenObtainPairSerializer, ClientTokenRefreshSerializer
 
 urlpatterns = [
     # Públicas
     path('register/', register, name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='login'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', TokenObtainPairView.as_view(serializer_class=ClientTokenObtainPairSerializer), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(serializer_class=ClientTokenRefreshSerializer), name='token_refresh'),
     
     # Usuario autenticado
     path('me/', my_profile, name='my_profile'),
@@ -25,4 +27,5 @@ urlpatterns = [
     
     # Dashboard
     path('dashboard/', dashboard, name='dashboard'),
+    path('dashboard/async/', dashboard_async, name='dashboard_async'),
 ]
@@ -1,16 +1,20 @@
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncMonth
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from datetime import datetime, timedelta
+from .authentication import authenticate_django_request, forget_client, get_request_client
+from API_revenue_portfolio import cache as response_cache
+from API_revenue_portfolio.cache import cached_per_client
+from API_revenue_portfolio.renderers import ORJSONRenderer
+from .dashboard import DashboardParams
+from . import dashboard as dashboard_sections
 from .models import Client
 from .serializers import UserRegistrationSerializer, ClientWithWalletsSerializer
-from expenses.models import Expense
-from revenue.models import Revenue
-from wallets.models import Wallet
 
 
 @api_view(['POST'])
@@ -27,9 +31,10 @@ def register(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_per_client('my_profile')
 def my_profile(request):
     try:
-        client = Client.objects.get(email=request.user.email)
+        client = Client.objects.get(pk=get_request_client(request).pk)
         serializer = ClientWithWalletsSerializer(client)
         return Response(serializer.data)
     except Client.DoesNotExist:
@@ -66,6 +71,7 @@ def delete_user(request, user_id):
                 status=status.HTTP_403_FORBIDDEN
             )
         user.delete()
+        forget_client(user_id)
         return Response(
             {"message": "User deleted successfully"}, 
             status=status.HTTP_204_NO_CONTENT
@@ -99,122 +105,59 @@ def change_user_password(request, user_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_per_client('dashboard')
 def dashboard(request):
     """Dashboard con estadísticas financieras del usuario"""
     try:
-        client = Client.objects.get(email=request.user.email)
+        client = get_request_client(request)
         
         # Parámetros opcionales
-        year = request.query_params.get('year', datetime.now().year)
-        month = request.query_params.get('month', None)
-        
-        # Filtros base
-        expenses_qs = Expense.objects.filter(client=client)
-        revenues_qs = Revenue.objects.filter(client=client)
-        
-        # Filtrar por año
-        expenses_qs = expenses_qs.filter(expense_date__year=year)
-        revenues_qs = revenues_qs.filter(revenue_date__year=year)
-        
-        # Si se especifica mes, filtrar
-        if month:
-            expenses_qs = expenses_qs.filter(expense_date__month=month)
-            revenues_qs = revenues_qs.filter(revenue_date__month=month)
-        
-        # Totales generales
-        total_expenses = expenses_qs.aggregate(total=Sum('amount'))['total'] or 0
-        total_revenues = revenues_qs.aggregate(total=Sum('amount'))['total'] or 0
-        balance = total_revenues - total_expenses
-        
-        # Totales por mes
-        expenses_by_month = (
-            Expense.objects.filter(client=client, expense_date__year=year)
-            .annotate(month=TruncMonth('expense_date'))
-            .values('month')
-            .annotate(total=Sum('amount'))
-            .order_by('month')
-        )
-        
-        revenues_by_month = (
-            Revenue.objects.filter(client=client, revenue_date__year=year)
-            .annotate(month=TruncMonth('revenue_date'))
-            .values('month')
-            .annotate(total=Sum('amount'))
-            .order_by('month')
-        )
-        
-        # Balance por wallet
-        wallets = Wallet.objects.filter(client=client)
-        wallets_summary = [{
-            'id': w.id,
-            'name': w.name,
-            'balance': str(w.balance)
-        } for w in wallets]
-        
-        # Balance histórico (últimos 6 meses)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        historical_balance = []
-        
-        for i in range(6):
-            date = datetime.now() - timedelta(days=30*i)
-            month_start = date.replace(day=1)
-            
-            month_revenues = Revenue.objects.filter(
-                client=client,
-                revenue_date__lte=date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            month_expenses = Expense.objects.filter(
-                client=client,
-                expense_date__lte=date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            historical_balance.insert(0, {
-                'month': month_start.strftime('%Y-%m'),
-                'balance': float(month_revenues - month_expenses)
-            })
-        
-        # Top 5 gastos más grandes
-        top_expenses = expenses_qs.order_by('-amount')[:5].values(
-            'id', 'name', 'amount', 'expense_date'
-        )
-        
-        # Top 5 ingresos más grandes
-        top_revenues = revenues_qs.order_by('-amount')[:5].values(
-            'id', 'name', 'amount', 'revenue_date'
-        )
-        
-        data = {
-            'summary': {
-                'total_revenues': str(total_revenues),
-                'total_expenses': str(total_expenses),
-                'balance': str(balance),
-                'period': f"{year}" + (f"-{month}" if month else "")
-            },
-            'monthly_comparison': {
-                'expenses': [
-                    {
-                        'month': item['month'].strftime('%Y-%m'),
-                        'total': str(item['total'])
-                    } for item in expenses_by_month
-                ],
-                'revenues': [
-                    {
-                        'month': item['month'].strftime('%Y-%m'),
-                        'total': str(item['total'])
-                    } for item in revenues_by_month
-                ]
-            },
-            'wallets_summary': wallets_summary,
-            'historical_balance': historical_balance,
-            'top_expenses': list(top_expenses),
-            'top_revenues': list(top_revenues)
-        }
+        try:
+            params = DashboardParams(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(data)
+        return Response(dashboard_sections.build(client.id, params))
         
     except Client.DoesNotExist:
         return Response(
             {"error": "Client profile not found"}, 
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+@require_GET
+async def dashboard_async(request):
+    """Mismo dashboard, para servir con ASGI: las secciones se consultan en paralelo"""
+    try:
+        auth = await sync_to_async(authenticate_django_request)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    client = auth[1]
+    if client is None:
+        return JsonResponse({"error": "Client profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        params = DashboardParams(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    key, data = await sync_to_async(response_cache.lookup)('dashboard', client.id, request.GET)
+    if key is None:
+        return JsonResponse({"error": "Client profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    outcome = 'HIT'
+    if data is None:
+        outcome = 'MISS'
+        data = await dashboard_sections.build_concurrently(client.id, params)
+        await sync_to_async(response_cache.store)(key, data)
+    
+    response = HttpResponse(ORJSONRenderer().render(data), content_type='application/json')
+    response[response_cache.CACHE_HEADER] = outcome
+    return response
@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from users.models import Client
+from wallets import services
+from wallets.models import LedgerEntry, Transfer, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del motor de transferencias: varios hilos transfieren al azar entre '
+        'pocas billeteras y al final se verifica que el dinero total se conserve'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transfers', type=int, default=2000, help='Transferencias por hilo')
+        parser.add_argument('--wallets', type=int, default=4, help='Menos billeteras = más contención')
+        parser.add_argument('--balance', default='1000.00', help='Balance inicial de cada billetera')
+        parser.add_argument('--max-amount', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='No borrar los datos creados')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and options['threads'] > 1:
+            self.stderr.write(self.style.WARNING(
+                'SQLite serializes writers: expect "database is locked" errors with several threads'
+            ))
+
+        client = Client.objects.create(name='bench', email=f'bench-{uuid.uuid4().hex}@example.com')
+        initial = Decimal(options['balance'])
+        wallets = Wallet.objects.bulk_create([
+            Wallet(client=client, name=f'bench{i}', balance=initial) for i in range(options['wallets'])
+        ])
+        wallet_ids = [wallet.id for wallet in wallets]
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(wallet_id=wallet_id, kind=LedgerEntry.OPENING, amount=initial) for wallet_id in wallet_ids
+        ])
+        expected_total = initial * len(wallet_ids)
+
+        results = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'] + 1)
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            stats = {'ok': 0, 'insufficient': 0, 'errors': 0, 'latencies': []}
+            try:
+                start.wait()
+                for _ in range(options['transfers']):
+                    source, target = rng.sample(wallet_ids, 2)
+                    amount = Decimal(rng.randint(1, options['max_amount']))
+                    began = time.perf_counter()
+                    try:
+                        services.transfer(client.id, source, target, amount, 'bench')
+                        stats['ok'] += 1
+                    except services.InsufficientBalance:
+                        stats['insufficient'] += 1
+                    except DatabaseError:
+                        # Deadlocks, timeouts de lock, "database is locked"...
+                        stats['errors'] += 1
+                    stats['latencies'].append(time.perf_counter() - began)
+            finally:
+                connection.close()
+                with lock:
+                    results.append(stats)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        try:
+            self.report(results, elapsed)
+            self.check_consistency(client, wallet_ids, expected_total, sum(r['ok'] for r in results))
+        finally:
+            if not options['keep']:
+                client.delete()
+
+    def report(self, results, elapsed):
+        ok = sum(r['ok'] for r in results)
+        insufficient = sum(r['insufficient'] for r in results)
+        errors = sum(r['errors'] for r in results)
+        latencies = sorted(latency for r in results for latency in r['latencies'])
+        if not latencies:
+            return
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f'{ok} transfers ok, {insufficient} rejected (insufficient balance), {errors} database errors'
+        )
+        self.stdout.write(
+            f'{elapsed:.2f}s, {ok / elapsed:,.0f} transfers/s, '
+            f'latency p50 {percentile(0.5):.1f}ms p95 {percentile(0.95):.1f}ms p99 {percentile(0.99):.1f}ms'
+        )
+
+    def check_consistency(self, client, wallet_ids, expected_total, ok):
+        balances = dict(Wallet.objects.filter(id__in=wallet_ids).values_list('id', 'balance'))
+        total = sum(balances.values())
+        if total != expected_total:
+            raise CommandError(f'Money not conserved: expected {expected_total}, got {total}')
+        negative = [wallet_id for wallet_id, balance in balances.items() if balance < 0]
+        if negative:
+            raise CommandError(f'Negative balance on wallets {negative}')
+
+        transfers = Transfer.objects.filter(client=client)
+        if transfers.count() != ok:
+            raise CommandError(f'{ok} successful transfers but {transfers.count()} rows')
+        # Cada balance debe ser el inicial + lo recibido - lo enviado según las transferencias registradas
+        initial = expected_total / len(wallet_ids)
+        sent = dict(transfers.values_list('from_wallet').annotate(total=Sum('amount')).order_by())
+        received = dict(transfers.values_list('to_wallet').annotate(total=Sum('amount')).order_by())
+        for wallet_id, balance in balances.items():
+            expected = initial - sent.get(wallet_id, 0) + received.get(wallet_id, 0)
+            if balance != expected:
+                raise CommandError(f'Wallet {wallet_id}: balance {balance}, transfers imply {expected}')
+        ledger = dict(
+            LedgerEntry.objects.filter(wallet_id__in=wallet_ids)
+            .values_list('wallet_id').annotate(total=Sum('amount')).order_by()
+        )
+        for wallet_id, balance in balances.items():
+            if ledger.get(wallet_id) != balance:
+                raise CommandError(f'Wallet {wallet_id}: balance {balance}, ledger sums {ledger.get(wallet_id)}')
+        self.stdout.write(self.style.SUCCESS(f'Total money conserved: {total}'))
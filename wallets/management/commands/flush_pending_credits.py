@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from wallets import services
+
+
+class Command(BaseCommand):
+    help = (
+        'Suma al balance de las billeteras hot (Wallet.is_hot) los créditos pendientes en '
+        'PendingCredit; con --interval queda corriendo y consolida cada N segundos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Segundos entre pasadas; sin esta opción hace una sola pasada (para cron)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is not None and interval <= 0:
+            raise CommandError('--interval must be positive')
+
+        while True:
+            started = time.monotonic()
+            wallets, credits = services.flush_pending()
+            if credits or interval is None:
+                self.stdout.write(self.style.SUCCESS(f'{credits} pending credits folded into {wallets} wallets'))
+            if interval is None:
+                return
+            # Como al terminar un request: descarta la conexión si venció CONN_MAX_AGE o quedó rota
+            close_old_connections()
+            time.sleep(max(interval - (time.monotonic() - started), 0))
@@ -0,0 +1,334 @@
+import csv
+import hashlib
+import io
+import re
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from API_revenue_portfolio.cache import bump_data_version
+from expenses.models import Expense
+from revenue.models import Revenue
+from rollups.models import MonthlyRollup
+from wallets.models import LedgerEntry, Wallet
+
+READ_SIZE = 64 * 1024
+MAX_AMOUNT = Decimal('99999999.99')
+OFX_TOKEN = re.compile(r'<(/?[A-Za-z0-9.]+)>([^<]*)')
+
+STAGING_SQL = """
+    CREATE TEMP TABLE import_staging (
+        line_no bigint NOT NULL,
+        kind char(1) NOT NULL,
+        tx_date date NOT NULL,
+        amount numeric(10, 2) NOT NULL,
+        name varchar(100) NOT NULL,
+        description text NOT NULL,
+        content_hash varchar(64) NOT NULL,
+        has_fitid boolean NOT NULL
+    ) ON COMMIT DROP
+"""
+
+# Un solo statement: inserta lo nuevo (el índice único parcial descarta lo ya importado),
+# suma los totales mensuales, agrega los movimientos al ledger y recalcula el balance de la
+# billetera con lo insertado.
+# Sin FITID, el hash es el contenido + su número de repetición en el archivo, así dos
+# movimientos idénticos del mismo día no se fusionan pero reimportar el archivo no duplica.
+MERGE_SQL = """
+    WITH numbered AS (
+        SELECT kind, tx_date, amount, name, description,
+               CASE WHEN has_fitid THEN content_hash
+                    ELSE encode(sha256(convert_to(
+                        content_hash || ':' || row_number() OVER (PARTITION BY content_hash ORDER BY line_no),
+                        'UTF8'
+                    )), 'hex')
+               END AS import_hash
+        FROM import_staging
+    ),
+    src AS (
+        SELECT DISTINCT ON (import_hash) kind, tx_date, amount, name, description, import_hash
+        FROM numbered
+        ORDER BY import_hash
+    ),
+    ins_e AS (
+        INSERT INTO {expense} (client_id, wallet_id, name, description, amount, expense_date,
+                               is_deleted, import_hash, created_at, updated_at)
+        SELECT %(client)s, %(wallet)s, name, description, amount, tx_date, false, import_hash, now(), now()
+        FROM src WHERE kind = 'E'
+        ON CONFLICT (wallet_id, import_hash) WHERE import_hash IS NOT NULL DO NOTHING
+        RETURNING id, amount, expense_date AS tx_date
+    ),
+    ins_r AS (
+        INSERT INTO {revenue} (client_id, wallet_id, name, description, amount, revenue_date,
+                               is_deleted, import_hash, created_at, updated_at)
+        SELECT %(client)s, %(wallet)s, name, description, amount, tx_date, false, import_hash, now(), now()
+        FROM src WHERE kind = 'R'
+        ON CONFLICT (wallet_id, import_hash) WHERE import_hash IS NOT NULL DO NOTHING
+        RETURNING id, amount, revenue_date AS tx_date
+    ),
+    by_month AS (
+        SELECT date_trunc('month', tx_date)::date AS month,
+               SUM(CASE WHEN kind = 'R' THEN amount ELSE 0 END) AS revenue_total,
+               COUNT(*) FILTER (WHERE kind = 'R') AS revenue_count,
+               SUM(CASE WHEN kind = 'E' THEN amount ELSE 0 END) AS expense_total,
+               COUNT(*) FILTER (WHERE kind = 'E') AS expense_count
+        FROM (
+            SELECT 'E' AS kind, amount, tx_date FROM ins_e
+            UNION ALL
+            SELECT 'R' AS kind, amount, tx_date FROM ins_r
+        ) inserted
+        GROUP BY 1
+    ),
+    rollups AS (
+        INSERT INTO {rollup} AS r (client_id, wallet_id, month, revenue_total, revenue_count,
+                                   expense_total, expense_count, updated_at)
+        SELECT %(client)s, %(wallet)s, month, revenue_total, revenue_count, expense_total, expense_count, now()
+        FROM by_month
+        ON CONFLICT (client_id, wallet_id, month) DO UPDATE SET
+            revenue_total = r.revenue_total + EXCLUDED.revenue_total,
+            revenue_count = r.revenue_count + EXCLUDED.revenue_count,
+            expense_total = r.expense_total + EXCLUDED.expense_total,
+            expense_count = r.expense_count + EXCLUDED.expense_count,
+            updated_at = now()
+    ),
+    ledger AS (
+        INSERT INTO {ledger} (wallet_id, kind, amount, reference_id, created_at)
+        SELECT %(wallet)s, 'expense', -amount, id, now() FROM ins_e
+        UNION ALL
+        SELECT %(wallet)s, 'revenue', amount, id, now() FROM ins_r
+    )
+    UPDATE {wallet}
+    SET balance = balance
+            + (SELECT COALESCE(SUM(amount), 0) FROM ins_r)
+            - (SELECT COALESCE(SUM(amount), 0) FROM ins_e),
+        updated_at = now()
+    WHERE id = %(wallet)s
+    RETURNING balance, (SELECT COUNT(*) FROM ins_e), (SELECT COUNT(*) FROM ins_r)
+"""
+
+
+class RowError(ValueError):
+    pass
+
+
+class IteratorFile(io.TextIOBase):
+    """Adapta un generador de strings a un archivo de solo lectura para COPY FROM STDIN"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(value.strip().replace(' ', ''))
+    except (InvalidOperation, AttributeError):
+        raise RowError(f'invalid amount {value!r}')
+    if abs(amount) > MAX_AMOUNT:
+        raise RowError(f'amount out of range {value!r}')
+    return amount.quantize(Decimal('0.01'))
+
+
+def read_csv(stream, date_format):
+    """Filas de un CSV con columnas date, amount y opcionales name, description, type.
+
+    amount con signo (negativo = gasto) salvo que la columna type diga expense/revenue.
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {'date', 'amount'} - set(reader.fieldnames)
+    if missing:
+        raise CommandError(f'Missing CSV columns: {", ".join(sorted(missing))}')
+    for row in reader:
+        try:
+            day = datetime.strptime(row['date'].strip(), date_format).date()
+        except (ValueError, AttributeError):
+            raise RowError(f'invalid date {row["date"]!r}')
+        amount = parse_amount(row['amount'])
+        kind = (row.get('type') or '').strip().lower()
+        if kind in ('expense', 'debit', 'e'):
+            amount = -abs(amount)
+        elif kind in ('revenue', 'credit', 'r'):
+            amount = abs(amount)
+        description = (row.get('description') or '').strip()
+        name = (row.get('name') or '').strip() or description or 'Imported'
+        yield day, amount, name, description, None
+
+
+def read_ofx(stream):
+    """Transacciones <STMTTRN> de un OFX (SGML 1.x o XML 2.x), leyendo el archivo por bloques"""
+    buffer = ''
+    current = None
+    while True:
+        chunk = stream.read(READ_SIZE)
+        buffer += chunk
+        # Se deja sin procesar el último token por si quedó cortado entre dos bloques
+        cut = buffer.rfind('<') if chunk else len(buffer)
+        if cut < 0:
+            cut = len(buffer)
+        for match in OFX_TOKEN.finditer(buffer, 0, cut):
+            tag, value = match.group(1).upper(), match.group(2).strip()
+            if tag == 'STMTTRN':
+                current = {}
+            elif tag == '/STMTTRN' and current is not None:
+                try:
+                    day = datetime.strptime(current.get('DTPOSTED', '')[:8], '%Y%m%d').date()
+                except ValueError:
+                    raise RowError(f'invalid DTPOSTED {current.get("DTPOSTED")!r}')
+                amount = parse_amount(current.get('TRNAMT', ''))
+                description = current.get('MEMO', '')
+                name = current.get('NAME', '') or description or current.get('TRNTYPE', 'Imported')
+                yield day, amount, name, description, current.get('FITID')
+                current = None
+            elif current is not None and not tag.startswith('/'):
+                current[tag] = value
+        buffer = buffer[cut:]
+        if not chunk:
+            break
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa un extracto bancario (CSV u OFX) a una billetera usando COPY a una tabla '
+        'temporal y un merge en SQL; descarta las líneas ya importadas (PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo a importar ('-' para stdin)")
+        parser.add_argument('--wallet', type=int, required=True, help='Id de la billetera destino')
+        parser.add_argument('--format', choices=['csv', 'ofx'], help='Por defecto según la extensión')
+        parser.add_argument('--date-format', default='%Y-%m-%d', help='Formato de la columna date del CSV')
+        parser.add_argument('--encoding', default='utf-8')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('import_transactions requires PostgreSQL (COPY FROM STDIN)')
+
+        try:
+            wallet = Wallet.objects.get(pk=options['wallet'], is_deleted=False)
+        except Wallet.DoesNotExist:
+            raise CommandError(f'Wallet {options["wallet"]} not found')
+
+        path = options['path']
+        fmt = options['format'] or ('ofx' if path.lower().endswith(('.ofx', '.qfx')) else 'csv')
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding=options['encoding'], newline='')
+        else:
+            stream = open(path, encoding=options['encoding'], errors='replace', newline='')
+
+        started = time.monotonic()
+        counter = {'read': 0}
+        with stream:
+            if fmt == 'ofx':
+                transactions = read_ofx(stream)
+            else:
+                transactions = read_csv(stream, options['date_format'])
+            staging_rows = self.staging_rows(wallet.id, transactions, counter)
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(STAGING_SQL)
+                try:
+                    cursor.copy_expert(
+                        'COPY import_staging (line_no, kind, tx_date, amount, name, description, content_hash, has_fitid) '
+                        'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (name, description))',
+                        IteratorFile(staging_rows)
+                    )
+                except Exception:
+                    # psycopg2 aborta el COPY y relanza su propio error; el detalle quedó en counter
+                    if 'error' in counter:
+                        raise counter['error'] from None
+                    raise
+                copied = time.monotonic()
+
+                cursor.execute(MERGE_SQL.format(
+                    expense=connection.ops.quote_name(Expense._meta.db_table),
+                    revenue=connection.ops.quote_name(Revenue._meta.db_table),
+                    rollup=connection.ops.quote_name(MonthlyRollup._meta.db_table),
+                    wallet=connection.ops.quote_name(Wallet._meta.db_table),
+                    ledger=connection.ops.quote_name(LedgerEntry._meta.db_table),
+                ), {'client': wallet.client_id, 'wallet': wallet.id})
+                balance, expenses, revenues = cursor.fetchone()
+                # ON COMMIT DROP no alcanza si el comando corre dentro de otra transacción
+                cursor.execute('DROP TABLE import_staging')
+                if expenses or revenues:
+                    bump_data_version(wallet.client_id)
+
+        finished = time.monotonic()
+        read = counter['read']
+        inserted = expenses + revenues
+        elapsed = max(finished - started, 1e-9)
+        self.stdout.write(
+            f'{read} rows read, {inserted} imported ({expenses} expenses, {revenues} revenues), '
+            f'{read - inserted} duplicates skipped'
+        )
+        self.stdout.write(
+            f'copy {copied - started:.2f}s, merge {finished - copied:.2f}s, '
+            f'total {elapsed:.2f}s ({read / elapsed:,.0f} rows/s)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wallet {wallet.id} balance: {balance}'))
+
+    def staging_rows(self, wallet_id, transactions, counter):
+        """Convierte las transacciones en líneas CSV para COPY, en bloques de ~64KB.
+
+        content_hash identifica la línea del extracto: el FITID si existe, si no el contenido.
+        La numeración de repeticiones se hace en el merge (SQL), así que acá no se guarda
+        estado por fila y la memoria no crece con el archivo.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        transactions = iter(transactions)
+        while True:
+            try:
+                day, amount, name, description, fitid = next(transactions)
+            except StopIteration:
+                break
+            except RowError as e:
+                counter['error'] = CommandError(f'Row {counter["read"] + 1}: {e}')
+                raise
+            except CommandError as e:
+                # Errores del archivo (p. ej. columnas faltantes), no de una fila
+                counter['error'] = e
+                raise
+            counter['read'] += 1
+            if amount == 0:
+                continue
+            if fitid:
+                key = f'{wallet_id}|fitid|{fitid}'
+            else:
+                key = f'{wallet_id}|{day.isoformat()}|{amount}|{name}|{description}'
+            writer.writerow([
+                counter['read'],
+                'E' if amount < 0 else 'R',
+                day.isoformat(),
+                abs(amount),
+                name[:100],
+                description,
+                hashlib.sha256(key.encode('utf-8')).hexdigest(),
+                't' if fitid else 'f',
+            ])
+            if buffer.tell() >= READ_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
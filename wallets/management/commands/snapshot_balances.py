@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from wallets.models import BalanceSnapshot, LedgerEntry, Wallet
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda un snapshot del balance de cada billetera con movimientos nuevos en el ledger, '
+        'para que /wallets/{id}/balance/?at= solo sume los movimientos posteriores al snapshot'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-entries', type=int, default=1,
+            help='Solo billeteras con al menos esta cantidad de movimientos desde su último snapshot'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Los movimientos más recientes pueden ser de transacciones todavía abiertas:
+        # el snapshot se toma LEDGER_SNAPSHOT_LAG segundos en el pasado para no dejar ninguno afuera.
+        taken_at = timezone.now() - timedelta(seconds=settings.LEDGER_SNAPSHOT_LAG)
+
+        snapshots = BalanceSnapshot.objects.filter(wallet=OuterRef('pk')).order_by('-taken_at')
+        entries = (
+            LedgerEntry.objects.filter(
+                wallet=OuterRef('pk'), created_at__gt=OuterRef('since'), created_at__lte=taken_at
+            )
+            .order_by()
+            .values('wallet')
+        )
+        wallets = (
+            Wallet.objects.annotate(
+                since=Coalesce(Subquery(snapshots.values('taken_at')[:1]), Value(EPOCH)),
+                base=Coalesce(
+                    Subquery(snapshots.values('balance')[:1]), Value(Decimal('0.00')),
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ),
+            )
+            .annotate(
+                delta=Subquery(entries.annotate(total=Sum('amount')).values('total')),
+                entries=Subquery(entries.annotate(count=Count('id')).values('count')),
+            )
+            .filter(entries__gte=options['min_entries'])
+            .values_list('id', 'base', 'delta')
+        )
+
+        batch, created = [], 0
+        for wallet_id, base, delta in wallets.iterator(chunk_size=options['batch_size']):
+            batch.append(BalanceSnapshot(wallet_id=wallet_id, balance=base + delta, taken_at=taken_at))
+            if len(batch) >= options['batch_size']:
+                created += len(BalanceSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        created += len(BalanceSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+
+        self.stdout.write(self.style.SUCCESS(f'{created} balance snapshots taken at {taken_at:%Y-%m-%d %H:%M:%S}'))
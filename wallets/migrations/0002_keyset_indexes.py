@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="wallet",
+            index=models.Index(
+                fields=["client", "created_at", "id"],
+                name="wallet_client_created_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_remove_client_password"),
+        ("wallets", "0002_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="wallet",
+            name="wallet_client_created_id_idx",
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["from_wallet", "transfer_date"], name="transfer_from_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["to_wallet", "transfer_date"], name="transfer_to_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallet",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["client", "created_at", "id"],
+                name="wallet_client_created_id_idx",
+            ),
+        ),
+    ]
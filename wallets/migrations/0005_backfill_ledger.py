@@ -0,0 +1,78 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:47
+
+from django.db import migrations
+
+
+def backfill_ledger(apps, schema_editor):
+    Wallet = apps.get_model("wallets", "Wallet")
+    Transfer = apps.get_model("wallets", "Transfer")
+    LedgerEntry = apps.get_model("wallets", "LedgerEntry")
+    Expense = apps.get_model("expenses", "Expense")
+    Revenue = apps.get_model("revenue", "Revenue")
+
+    batch = []
+
+    def append(**fields):
+        batch.append(LedgerEntry(**fields))
+        if len(batch) >= 1000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch.clear()
+
+    # Movimientos que todavía existen, en el momento en que se registraron
+    sources = (
+        (
+            Expense.objects.filter(is_deleted=False),
+            "wallet_id",
+            "created_at",
+            -1,
+            "expense",
+        ),
+        (
+            Revenue.objects.filter(is_deleted=False),
+            "wallet_id",
+            "created_at",
+            1,
+            "revenue",
+        ),
+        (Transfer.objects.all(), "from_wallet_id", "transfer_date", -1, "transfer"),
+        (Transfer.objects.all(), "to_wallet_id", "transfer_date", 1, "transfer"),
+    )
+    totals = {}
+    for queryset, wallet_field, date_field, sign, kind in sources:
+        rows = queryset.values_list("id", wallet_field, "amount", date_field)
+        for reference_id, wallet_id, amount, created_at in rows.iterator():
+            append(
+                wallet_id=wallet_id,
+                kind=kind,
+                amount=sign * amount,
+                reference_id=reference_id,
+                created_at=created_at,
+            )
+            totals[wallet_id] = totals.get(wallet_id, 0) + sign * amount
+
+    # El resto del balance (saldo inicial y add_balance, que no dejaban rastro) como apertura
+    for wallet_id, balance, created_at in Wallet.objects.values_list(
+        "id", "balance", "created_at"
+    ).iterator():
+        opening = balance - totals.get(wallet_id, 0)
+        if opening:
+            append(
+                wallet_id=wallet_id,
+                kind="opening",
+                amount=opening,
+                created_at=created_at,
+            )
+    LedgerEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0004_import_hash"),
+        ("revenue", "0004_import_hash"),
+        ("wallets", "0004_ledger"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
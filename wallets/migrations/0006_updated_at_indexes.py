@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_client_data_version"),
+        ("wallets", "0005_backfill_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="wallet",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["client", "updated_at"],
+                name="wallet_client_updated_idx",
+            ),
+        ),
+    ]
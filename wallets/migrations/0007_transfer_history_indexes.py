@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_client_data_version"),
+        ("wallets", "0006_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transfer",
+            name="transfer_from_date_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="transfer",
+            name="transfer_to_date_idx",
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["from_wallet", "transfer_date", "id"],
+                name="transfer_from_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["to_wallet", "transfer_date", "id"],
+                name="transfer_to_date_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0007_transfer_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wallet",
+            name="is_hot",
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+        migrations.CreateModel(
+            name="PendingCredit",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("revenue_month", models.DateField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pending",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+    ]
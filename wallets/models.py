@@ -1,4 +1,6 @@
+from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from users.models import Client
 
 class Wallet(models.Model):
@@ -8,11 +10,55 @@ class Wallet(models.Model):
     description = models.TextField(blank=True, null=True)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     is_deleted = models.BooleanField(default=False)
+    # Billetera con muchos créditos por segundo: los créditos van a PendingCredit sin tocar esta
+    # fila y services.fold_pending() los suma en lote (ver flush_pending_credits)
+    is_hot = models.BooleanField(default=False, db_default=False)
+    # Sube al editar o borrar la billetera (UPDATE ... WHERE version = n, ver
+    # conditional.compare_and_swap); los movimientos de balance no la tocan. db_default para seed_scale
+    version = models.PositiveIntegerField(default=1, db_default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Créditos todavía en PendingCredit; services.load_pending() lo completa en billeteras hot
+    pending_credits = Decimal('0.00')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['client', 'created_at', 'id'], name='wallet_client_created_id_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            # ETag de las listas (max(updated_at) y COUNT(*) sin leer la tabla)
+            models.Index(
+                fields=['client', 'updated_at'], name='wallet_client_updated_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} - Balance: {self.balance}"
+
+    @property
+    def available_balance(self):
+        """Balance que ve el cliente: el de la fila más los créditos pendientes de sumar"""
+        return self.balance + self.pending_credits
+
+
+class PendingCredit(models.Model):
+    """Crédito a una billetera hot que todavía no se sumó a Wallet.balance.
+
+    El movimiento ya está en el ledger; services.fold_pending() suma estas filas al balance (y al
+    total mensual de ingresos, si vienen de un ingreso) y las borra, todo en una transacción.
+    """
+    id = models.BigAutoField(primary_key=True)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="pending")
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    # Mes del ingreso que originó el crédito (null en depósitos, transferencias y reintegros)
+    revenue_month = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"+{self.amount} wallet {self.wallet_id} (pending)"
     
 class Transfer(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -25,5 +71,61 @@ class Transfer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Historial de una billetera: un rango de cada índice, en el orden del cursor (fecha, id)
+        indexes = [
+            models.Index(fields=['from_wallet', 'transfer_date', 'id'], name='transfer_from_date_id_idx'),
+            models.Index(fields=['to_wallet', 'transfer_date', 'id'], name='transfer_to_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Transfer {self.amount} from {self.from_wallet.name} to {self.to_wallet.name}"
+
+
+class LedgerEntry(models.Model):
+    """Movimiento de balance de una billetera (solo se agregan filas, nunca se editan)"""
+    OPENING = 'opening'
+    DEPOSIT = 'deposit'
+    TRANSFER = 'transfer'
+    EXPENSE = 'expense'
+    REVENUE = 'revenue'
+    KIND_CHOICES = [
+        (OPENING, 'Opening balance'),
+        (DEPOSIT, 'Deposit'),
+        (TRANSFER, 'Transfer'),
+        (EXPENSE, 'Expense'),
+        (REVENUE, 'Revenue'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="ledger_entries")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Con signo: positivo suma al balance, negativo resta
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    # Id del expense, revenue o transfer que originó el movimiento
+    reference_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'created_at'], name='ledger_wallet_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.amount} wallet {self.wallet_id}"
+
+
+class BalanceSnapshot(models.Model):
+    """Balance de una billetera incluyendo todos los movimientos hasta taken_at"""
+    id = models.BigAutoField(primary_key=True)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="balance_snapshots")
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'taken_at'], name='snapshot_wallet_taken_uniq'),
+        ]
+
     def __str__(self):
-        return f"Transfer {self.amount} from {self.from_wallet.name} to {self.to_wallet.name}"
\ No newline at end of file
+        return f"wallet {self.wallet_id} at {self.taken_at:%Y-%m-%d %H:%M}: {self.balance}"
@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from API_revenue_portfolio.conditional import compare_and_swap
+from API_revenue_portfolio.fastread import SparseFieldsMixin
 from .models import Wallet, Transfer
 
-class WalletSerializer(serializers.ModelSerializer):
+class WalletSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Incluye los créditos pendientes de las billeteras hot (services.load_pending)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, source='available_balance', read_only=True)
+
     class Meta:
         model = Wallet
         fields = ['id', 'name', 'description', 'balance']
@@ -15,7 +20,12 @@ class WalletSerializer(serializers.ModelSerializer):
         wallet = Wallet.objects.create(balance=balance, **validated_data)
         return wallet
     
-class TransferSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        # Solo las columnas editadas (un save() completo pisaría el balance de una transferencia
+        # concurrente) y solo si nadie la editó desde la lectura: si no, VersionConflict
+        return compare_and_swap(instance, **validated_data)
+    
+class TransferSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     from_wallet_name = serializers.CharField(source='from_wallet.name', read_only=True)
     to_wallet_name = serializers.CharField(source='to_wallet.name', read_only=True)
     
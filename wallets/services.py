@@ -0,0 +1,200 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from API_revenue_portfolio.cache import bump_data_version
+from rollups import services as rollups
+from .models import BalanceSnapshot, LedgerEntry, PendingCredit, Transfer, Wallet
+
+
+class InsufficientBalance(Exception):
+    """La billetera no tiene saldo suficiente para el débito"""
+
+    def __init__(self, wallet_id):
+        super().__init__('Insufficient balance')
+        self.wallet_id = wallet_id
+
+
+class SameWalletTransfer(Exception):
+    pass
+
+
+def record(wallet_id, amount, kind, reference_id=None):
+    """Agrega el movimiento al ledger; debe llamarse en la misma transacción que cambia el balance"""
+    return LedgerEntry.objects.create(wallet_id=wallet_id, amount=amount, kind=kind, reference_id=reference_id)
+
+
+def credit(wallet_id, amount, kind, reference_id=None, revenue_date=None):
+    """Suma `amount` al balance con un UPDATE atómico (sin leer el balance en Python).
+
+    En billeteras hot no toca la fila de la billetera (que serializaría los créditos
+    concurrentes): agrega el crédito a PendingCredit y lo devuelve. `revenue_date` indica que el
+    crédito es un ingreso de ese día; su total mensual se suma al consolidarlo. Si el crédito se
+    aplicó directamente devuelve None y el total mensual queda a cargo de quien llama.
+    """
+    updated = Wallet.objects.filter(pk=wallet_id, is_hot=False).update(
+        balance=F('balance') + amount, updated_at=timezone.now()
+    )
+    pending = None
+    if not updated:
+        if not Wallet.objects.filter(pk=wallet_id).exists():
+            raise Wallet.DoesNotExist
+        pending = PendingCredit.objects.create(
+            wallet_id=wallet_id, amount=amount,
+            revenue_month=rollups.month_of(revenue_date) if revenue_date else None
+        )
+    record(wallet_id, amount, kind, reference_id)
+    return pending
+
+
+def debit(wallet_id, amount, kind, reference_id=None, allow_negative=False):
+    """Resta `amount` del balance; el UPDATE condicional falla si el saldo no alcanza.
+
+    Si no alcanza y la billetera tiene créditos pendientes, los consolida y vuelve a intentar:
+    el saldo disponible de una billetera hot es el balance más lo pendiente.
+    """
+    wallets = Wallet.objects.filter(pk=wallet_id)
+    if not allow_negative:
+        wallets = wallets.filter(balance__gte=amount)
+    if not wallets.update(balance=F('balance') - amount, updated_at=timezone.now()):
+        if allow_negative or not Wallet.objects.filter(pk=wallet_id).exists():
+            raise Wallet.DoesNotExist
+        if not fold_pending(wallet_id) or not wallets.update(balance=F('balance') - amount, updated_at=timezone.now()):
+            raise InsufficientBalance(wallet_id)
+    record(wallet_id, -amount, kind, reference_id)
+
+
+def fold_pending(wallet_id):
+    """Suma al balance los créditos pendientes de la billetera y los borra; devuelve el monto sumado.
+
+    Bloquea la fila de la billetera, así dos consolidaciones (o una consolidación y un débito)
+    no se pisan. Los créditos que se confirmen mientras tanto quedan para la próxima pasada.
+    """
+    with transaction.atomic():
+        client_id = (
+            Wallet.objects.select_for_update().filter(pk=wallet_id).values_list('client_id', flat=True).first()
+        )
+        pending = list(PendingCredit.objects.filter(wallet_id=wallet_id).values_list('id', 'amount', 'revenue_month'))
+        if client_id is None or not pending:
+            return Decimal('0.00')
+
+        total = sum(amount for _, amount, _ in pending)
+        months = defaultdict(lambda: [Decimal('0'), 0])
+        for _, amount, month in pending:
+            if month is not None:
+                months[month][0] += amount
+                months[month][1] += 1
+        PendingCredit.objects.filter(id__in=[pending_id for pending_id, _, _ in pending]).delete()
+        Wallet.objects.filter(pk=wallet_id).update(balance=F('balance') + total, updated_at=timezone.now())
+        for month, (month_total, count) in months.items():
+            rollups.add_revenue(client_id, wallet_id, month, month_total, count=count)
+    if months:
+        # Los totales mensuales cambiaron: el dashboard cacheado del cliente ya no vale
+        bump_data_version(client_id)
+    return total
+
+
+def flush_pending():
+    """Consolida los créditos pendientes de todas las billeteras (una transacción corta por billetera).
+
+    Devuelve (billeteras, créditos) consolidados.
+    """
+    wallets = credits = 0
+    queued = PendingCredit.objects.values('wallet_id').annotate(count=Count('id')).order_by('wallet_id')
+    for row in queued:
+        if fold_pending(row['wallet_id']):
+            wallets += 1
+            credits += row['count']
+    return wallets, credits
+
+
+def load_pending(wallets):
+    """Completa `pending_credits` de las billeteras hot de la lista (una consulta; ninguna si no hay)"""
+    hot = {wallet.id: wallet for wallet in wallets if wallet.is_hot}
+    if not hot:
+        return wallets
+    for wallet in hot.values():
+        wallet.pending_credits = Decimal('0.00')
+    totals = (
+        PendingCredit.objects.filter(wallet_id__in=hot)
+        .values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total')
+    )
+    for wallet_id, total in totals:
+        hot[wallet_id].pending_credits = total
+    return wallets
+
+
+def available_balances(wallet_ids):
+    """{id: balance + créditos pendientes} de las billeteras"""
+    wallets = list(Wallet.objects.filter(id__in=wallet_ids).only('id', 'balance', 'is_hot'))
+    return {wallet.id: wallet.available_balance for wallet in load_pending(wallets)}
+
+
+def open_wallet(client, name, description, balance):
+    """Crea la billetera y registra el balance inicial en el ledger"""
+    with transaction.atomic():
+        wallet = Wallet.objects.create(client=client, name=name, description=description, balance=balance)
+        if balance:
+            record(wallet.id, balance, LedgerEntry.OPENING)
+    return wallet
+
+
+def transfer(client_id, from_wallet_id, to_wallet_id, amount, description=''):
+    """Mueve `amount` entre dos billeteras del cliente en una sola transacción.
+
+    Bloquea ambas filas (SELECT ... FOR UPDATE) siempre en orden de id, así dos
+    transferencias cruzadas A->B y B->A esperan en la misma fila en vez de bloquearse
+    mutuamente. Devuelve (transfer, balance de origen, balance de destino).
+    """
+    if from_wallet_id == to_wallet_id:
+        raise SameWalletTransfer
+    with transaction.atomic():
+        locked = {
+            wallet.id: wallet
+            for wallet in Wallet.objects.select_for_update()
+            .filter(id__in=[from_wallet_id, to_wallet_id], client_id=client_id, is_deleted=False)
+            .order_by('id')
+        }
+        if from_wallet_id not in locked or to_wallet_id not in locked:
+            raise Wallet.DoesNotExist
+
+        transfer = Transfer.objects.create(
+            client_id=client_id,
+            from_wallet=locked[from_wallet_id],
+            to_wallet=locked[to_wallet_id],
+            amount=amount,
+            description=description
+        )
+        debit(from_wallet_id, amount, LedgerEntry.TRANSFER, transfer.id)
+        credit(to_wallet_id, amount, LedgerEntry.TRANSFER, transfer.id)
+        if locked[from_wallet_id].is_hot or locked[to_wallet_id].is_hot:
+            # El débito pudo consolidar créditos pendientes y el crédito pudo quedar pendiente
+            balances = available_balances([from_wallet_id, to_wallet_id])
+            return transfer, balances[from_wallet_id], balances[to_wallet_id]
+    # Con las filas bloqueadas nadie más pudo cambiar los balances leídos
+    return (
+        transfer,
+        locked[from_wallet_id].balance - amount,
+        locked[to_wallet_id].balance + amount,
+    )
+
+
+def balance_at(wallet_id, at):
+    """Balance de la billetera en el instante `at`.
+
+    Parte del último snapshot anterior a `at` (una búsqueda en el índice único wallet+taken_at)
+    y suma solo los movimientos del ledger entre ese snapshot y `at`.
+    """
+    snapshot = (
+        BalanceSnapshot.objects.filter(wallet_id=wallet_id, taken_at__lte=at)
+        .order_by('-taken_at')
+        .values_list('taken_at', 'balance')
+        .first()
+    )
+    entries = LedgerEntry.objects.filter(wallet_id=wallet_id, created_at__lte=at)
+    balance = Decimal('0.00')
+    if snapshot is not None:
+        entries = entries.filter(created_at__gt=snapshot[0])
+        balance = snapshot[1]
+    return balance + (entries.aggregate(total=Sum('amount'))['total'] or 0)
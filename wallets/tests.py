@@ -1,3 +1,501 @@
-from django.test import TestCase
+import importlib
+import os
+import tempfile
+from unittest import skipUnless
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from API_revenue_portfolio.testing import ClientAPITestCase
+from expenses.models import Expense
+from rollups.models import MonthlyRollup
+from revenue.models import Revenue
+from users.models import Client
+from . import services
+from .models import BalanceSnapshot, LedgerEntry, PendingCredit, Transfer, Wallet
 
-# Create your tests here.
+
+class BatchTests(ClientAPITestCase):
+    """POST /batch/: sub-requests por las vistas normales, con una transacción opcional"""
+
+    username = 'lote'
+
+    def setUp(self):
+        super().setUp()
+        self.other = services.open_wallet(self.client_profile, 'Banco', '', Decimal('0.00'))
+
+    def batch(self, requests, atomic=False):
+        response = self.api.post('/batch/', {'atomic': atomic, 'requests': requests}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.json()
+
+    def expense(self, amount):
+        return {'method': 'POST', 'path': '/expenses/', 'body': {
+            'wallet': self.wallet.id, 'name': 'Super', 'description': '', 'amount': amount,
+            'expense_date': '2024-05-01',
+        }}
+
+    def balances(self):
+        return list(Wallet.objects.filter(client=self.client_profile).order_by('id').values_list('balance', flat=True))
+
+    def test_runs_each_request(self):
+        data = self.batch([
+            {'method': 'GET', 'path': '/wallets/'},
+            self.expense('30.00'),
+            {'method': 'POST', 'path': f'/wallets/{self.wallet.id}/transfer/',
+             'body': {'to_wallet': self.other.id, 'amount': '500.00'}},
+            {'method': 'GET', 'path': f'/wallets/{self.wallet.id}/'},
+            {'method': 'GET', 'path': '/users/dashboard/?year=2024'},
+            {'method': 'GET', 'path': '/users/login/'},
+        ])
+        statuses = [item['status'] for item in data['responses']]
+        self.assertEqual(statuses, [200, 201, 400, 200, 200, 400])
+        self.assertNotIn('committed', data)
+        self.assertEqual(data['responses'][3]['body']['balance'], '70.00')
+        self.assertTrue(data['responses'][3]['headers']['ETag'].startswith('"1.'))
+        self.assertEqual(Decimal(data['responses'][4]['body']['summary']['total_expenses']), Decimal('30.00'))
+        self.assertEqual(self.balances(), [Decimal('70.00'), Decimal('0.00')])
+
+    def test_atomic_rolls_back(self):
+        data = self.batch([
+            self.expense('30.00'),
+            {'method': 'POST', 'path': f'/wallets/{self.wallet.id}/transfer/',
+             'body': {'to_wallet': self.other.id, 'amount': '80.00'}},
+            self.expense('1.00'),
+        ], atomic=True)
+        self.assertFalse(data['committed'])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 400, 424])
+        self.assertEqual(self.balances(), [Decimal('100.00'), Decimal('0.00')])
+        self.assertFalse(Expense.objects.filter(client=self.client_profile).exists())
+
+        data = self.batch([self.expense('30.00'), self.expense('20.00')], atomic=True)
+        self.assertTrue(data['committed'])
+        self.assertEqual(self.balances(), [Decimal('50.00'), Decimal('0.00')])
+
+
+class TransferTests(ClientAPITestCase):
+    """POST /wallets/{id}/transfer/: débito condicional y crédito en una transacción, con su ledger"""
+
+    username = 'transfiere'
+
+    def setUp(self):
+        super().setUp()
+        self.other = services.open_wallet(self.client_profile, 'Banco', '', Decimal('5.00'))
+
+    def transfer(self, to_wallet, amount, from_wallet=None):
+        return self.api.post(
+            f'/wallets/{(from_wallet or self.wallet).id}/transfer/',
+            {'to_wallet': to_wallet.id, 'amount': amount, 'description': 'ahorro'}, format='json', secure=True
+        )
+
+    def transfer_entries(self):
+        return sorted(
+            LedgerEntry.objects.filter(kind=LedgerEntry.TRANSFER).values_list('wallet_id', 'amount', 'reference_id')
+        )
+
+    def assert_unchanged(self):
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('100.00'), Decimal('5.00')))
+        self.assertFalse(Transfer.objects.exists())
+        self.assertEqual(self.transfer_entries(), [])
+
+    def test_transfer(self):
+        response = self.transfer(self.other, '30.50')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['from_wallet_balance'], data['to_wallet_balance']), ('69.50', '35.50'))
+        self.assertEqual((self.balance(), self.balance(self.other)), (Decimal('69.50'), Decimal('35.50')))
+        transfer = Transfer.objects.get()
+        self.assertEqual(
+            (transfer.from_wallet_id, transfer.to_wallet_id, transfer.amount, transfer.description),
+            (self.wallet.id, self.other.id, Decimal('30.50'), 'ahorro')
+        )
+        self.assertEqual(data['transfer']['id'], transfer.id)
+        self.assertEqual(self.transfer_entries(), sorted([
+            (self.wallet.id, Decimal('-30.50'), transfer.id), (self.other.id, Decimal('30.50'), transfer.id),
+        ]))
+
+        # Todo el saldo también se puede transferir (balance >= amount)
+        self.assertEqual(self.transfer(self.other, '69.50').status_code, 201)
+        self.assertEqual(self.balance(), Decimal('0.00'))
+
+    def test_insufficient_balance(self):
+        response = self.transfer(self.other, '100.01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Insufficient balance'})
+        self.assert_unchanged()
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.transfer(self.wallet, '1.00').json(), {'error': 'Cannot transfer to the same wallet'})
+        self.assertEqual(self.transfer(self.other, '0').status_code, 400)
+        self.assertEqual(self.transfer(self.other, 'mucho').status_code, 400)
+        self.assert_unchanged()
+
+    def test_other_client_wallet(self):
+        stranger = Client.objects.create(name='otro', email='otro@example.com')
+        foreign = services.open_wallet(stranger, 'Ajena', '', Decimal('50.00'))
+        self.assertEqual(self.transfer(foreign, '1.00').status_code, 404)
+        self.assertEqual(self.transfer(self.other, '1.00', from_wallet=foreign).status_code, 404)
+        Wallet.objects.filter(pk=self.other.pk).update(is_deleted=True)
+        self.assertEqual(self.transfer(self.other, '1.00').status_code, 404)
+        self.assertEqual(self.balance(foreign), Decimal('50.00'))
+        Wallet.objects.filter(pk=self.other.pk).update(is_deleted=False)
+        self.assert_unchanged()
+
+    def test_hot_wallet_pending_credits(self):
+        Wallet.objects.filter(pk=self.other.pk).update(is_hot=True)
+        services.credit(self.other.id, Decimal('40.00'), LedgerEntry.DEPOSIT)
+        self.assertEqual(self.balance(self.other), Decimal('5.00'))
+
+        # El balance de la fila (5) no alcanza; con los 40 pendientes sí
+        response = self.transfer(self.wallet, '42.00', from_wallet=self.other)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['from_wallet_balance'], data['to_wallet_balance']), ('3.00', '142.00'))
+        self.assertFalse(PendingCredit.objects.exists())
+        self.assertEqual((self.balance(self.other), self.balance()), (Decimal('3.00'), Decimal('142.00')))
+
+        # Y hacia la billetera hot el crédito queda pendiente
+        response = self.transfer(self.other, '10.00')
+        self.assertEqual(response.json()['to_wallet_balance'], '13.00')
+        self.assertEqual(self.balance(self.other), Decimal('3.00'))
+        self.assertEqual(PendingCredit.objects.get().amount, Decimal('10.00'))
+        self.assertEqual(self.transfer(self.wallet, '13.01', from_wallet=self.other).status_code, 400)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class TransferHistoryTests(ClientAPITestCase):
+    """GET /wallets/{id}/transfers/: enviadas y recibidas en una sola lista paginada por cursor"""
+
+    username = 'historial'
+
+    def setUp(self):
+        super().setUp()
+        self.other = services.open_wallet(self.client_profile, 'Banco', '', Decimal('100.00'))
+        third = services.open_wallet(self.client_profile, 'Ahorro', '', Decimal('100.00'))
+        moves = [
+            (self.wallet, self.other, utc(2024, 1, 5, 10)),
+            (self.other, self.wallet, utc(2024, 1, 5, 10)),
+            (self.wallet, third, utc(2024, 1, 5, 10)),
+            (third, self.wallet, utc(2024, 1, 9)),
+            (self.other, third, utc(2024, 1, 9)),
+            (self.wallet, self.other, utc(2024, 1, 12, 23, 59)),
+            (self.other, self.wallet, utc(2024, 1, 20)),
+        ]
+        self.ids = []
+        for source, destination, moment in moves:
+            transfer, _, _ = services.transfer(self.client_profile.id, source.id, destination.id, Decimal('1.00'))
+            Transfer.objects.filter(pk=transfer.pk).update(transfer_date=moment)
+            self.ids.append(transfer.pk)
+
+    def walk(self, url):
+        """Ids de todas las páginas siguiendo next, y de vuelta siguiendo previous desde la última"""
+        pages = []
+        while url:
+            response = self.api.get(url, secure=True)
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append(response.json())
+            url = pages[-1]['next']
+        forward = [item['id'] for page in pages for item in page['transfers']]
+        back, url = [], pages[-1]['previous']
+        while url:
+            page = self.api.get(url, secure=True).json()
+            back = [item['id'] for item in page['transfers']] + back
+            url = page['previous']
+        self.assertEqual(back + [item['id'] for item in pages[-1]['transfers']], forward)
+        return forward
+
+    def test_pages(self):
+        # La transferencia 4 (Banco -> Ahorro) no es de esta billetera; el resto, de la más nueva a la más vieja
+        expected = [self.ids[index] for index in (6, 5, 3, 2, 1, 0)]
+        for page_size in (1, 2, 4, 50):
+            ids = self.walk(f'/wallets/{self.wallet.id}/transfers/?page_size={page_size}')
+            self.assertEqual(ids, expected, page_size)
+            self.assertEqual(len(set(ids)), len(ids))
+
+        self.assertEqual(
+            self.walk(f'/wallets/{self.other.id}/transfers/?page_size=2'),
+            [self.ids[index] for index in (6, 5, 4, 1, 0)]
+        )
+
+    def test_date_bounds(self):
+        url = f'/wallets/{self.wallet.id}/transfers/?page_size=2&date_from=2024-01-05&date_to=2024-01-12'
+        self.assertEqual(self.walk(url), [self.ids[index] for index in (5, 3, 2, 1, 0)])
+        url = f'/wallets/{self.wallet.id}/transfers/?page_size=1&date_from=2024-01-06&date_to=2024-01-19'
+        self.assertEqual(self.walk(url), [self.ids[5], self.ids[3]])
+        response = self.api.get(f'/wallets/{self.wallet.id}/transfers/?date_from=2024-02-01', secure=True)
+        self.assertEqual(response.json()['transfers'], [])
+        response = self.api.get(f'/wallets/{self.wallet.id}/transfers/?date_to=ayer', secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class LedgerBalanceTests(ClientAPITestCase):
+    """Balance en un instante (snapshot + movimientos posteriores), snapshot_balances y el backfill del ledger"""
+
+    username = 'contable'
+
+    def setUp(self):
+        super().setUp()
+        # Sin saldo inicial: el ledger de esta billetera es solo lo que arma cada test
+        self.ledger_wallet = Wallet.objects.create(client=self.client_profile, name='Caja')
+
+    def entry(self, amount, created_at, wallet=None):
+        LedgerEntry.objects.create(
+            wallet=wallet or self.ledger_wallet, kind=LedgerEntry.DEPOSIT, amount=Decimal(amount), created_at=created_at
+        )
+
+    def balance_at(self, at):
+        response = self.api.get(f'/wallets/{self.ledger_wallet.id}/balance/', {'at': at}, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['balance']
+
+    def test_balance_at(self):
+        self.entry('100.00', utc(2024, 1, 10, 12))
+        self.entry('-30.00', utc(2024, 1, 20, 12))
+        self.entry('5.50', utc(2024, 1, 25, 12))
+        BalanceSnapshot.objects.create(wallet=self.ledger_wallet, balance=Decimal('100.00'), taken_at=utc(2024, 1, 15))
+
+        self.assertEqual(self.balance_at('2024-01-01'), '0.00')
+        self.assertEqual(self.balance_at('2024-01-10'), '100.00')
+        self.assertEqual(self.balance_at('2024-01-18'), '100.00')
+        self.assertEqual(self.balance_at('2024-01-20T11:59:59+00:00'), '100.00')
+        self.assertEqual(self.balance_at('2024-01-20'), '70.00')
+        self.assertEqual(self.balance_at('2024-02-01T00:00:00'), '75.50')
+
+        # Desde el snapshot solo se suman los movimientos posteriores: los anteriores ya no se leen
+        BalanceSnapshot.objects.filter(wallet=self.ledger_wallet).update(balance=Decimal('1000.00'))
+        self.assertEqual(self.balance_at('2024-01-20'), '970.00')
+        self.assertEqual(self.balance_at('2024-01-12'), '100.00')
+
+    def test_invalid_at(self):
+        for at in ('ayer', '2024-13-01', '2024-01-01T25:00'):
+            response = self.api.get(f'/wallets/{self.ledger_wallet.id}/balance/', {'at': at}, secure=True)
+            self.assertEqual(response.status_code, 400, at)
+        # Sin ?at= es el balance actual
+        self.assertEqual(self.api.get(f'/wallets/{self.wallet.id}/balance/', secure=True).json()['balance'], '100.00')
+
+    @override_settings(LEDGER_SNAPSHOT_LAG=3600)
+    def test_snapshot_balances(self):
+        busy = self.ledger_wallet
+        quiet = Wallet.objects.create(client=self.client_profile, name='Quieta')
+        old = timezone.now() - timedelta(days=1)
+        for amount in ('10.00', '20.00', '-5.00'):
+            self.entry(amount, old, busy)
+        self.entry('7.00', old, quiet)
+        # Dentro de LEDGER_SNAPSHOT_LAG: puede ser de una transacción abierta, no entra en el snapshot
+        self.entry('1000.00', timezone.now(), busy)
+        self.wallet.ledger_entries.update(created_at=timezone.now())
+
+        call_command('snapshot_balances', min_entries=2, stdout=StringIO())
+        snapshot = BalanceSnapshot.objects.get()
+        self.assertEqual((snapshot.wallet_id, snapshot.balance), (busy.id, Decimal('25.00')))
+        self.assertLessEqual(snapshot.taken_at, timezone.now() - timedelta(seconds=3600))
+
+        # Otra pasada: la billetera ya snapshoteada no tiene movimientos nuevos fuera del lag
+        call_command('snapshot_balances', stdout=StringIO())
+        snapshots = dict(BalanceSnapshot.objects.values_list('wallet_id', 'balance'))
+        self.assertEqual(snapshots, {busy.id: Decimal('25.00'), quiet.id: Decimal('7.00')})
+        self.assertEqual(BalanceSnapshot.objects.filter(wallet=busy).count(), 1)
+        self.assertEqual(self.balance_at(timezone.now().isoformat()), '1025.00')
+
+    def test_backfill_migration(self):
+        """0005 arma el ledger de datos anteriores: por billetera suma exactamente su balance"""
+        other = services.open_wallet(self.client_profile, 'Banco', '', Decimal('0.00'))
+        expense = Expense.objects.create(
+            client=self.client_profile, wallet=self.wallet, name='gasto', amount=Decimal('30.00'),
+            expense_date=date(2024, 1, 5)
+        )
+        Expense.objects.create(
+            client=self.client_profile, wallet=self.wallet, name='borrado', amount=Decimal('99.00'),
+            expense_date=date(2024, 1, 5), is_deleted=True
+        )
+        revenue = Revenue.objects.create(
+            client=self.client_profile, wallet=other, name='sueldo', amount=Decimal('50.00'),
+            revenue_date=date(2024, 1, 6)
+        )
+        transfer = Transfer.objects.create(
+            client=self.client_profile, from_wallet=self.wallet, to_wallet=other, amount=Decimal('20.00')
+        )
+        # Balances como los dejaron las vistas antes del ledger: 100 + 15 depositados - 30 - 20
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=Decimal('65.00'))
+        Wallet.objects.filter(pk=other.pk).update(balance=Decimal('70.00'))
+        LedgerEntry.objects.all().delete()
+
+        migration = importlib.import_module('wallets.migrations.0005_backfill_ledger')
+        migration.backfill_ledger(apps, None)
+
+        entries = LedgerEntry.objects.values_list('wallet_id', 'kind', 'amount', 'reference_id')
+        self.assertEqual(sorted(entries), sorted([
+            (self.wallet.id, 'expense', Decimal('-30.00'), expense.id),
+            (other.id, 'revenue', Decimal('50.00'), revenue.id),
+            (self.wallet.id, 'transfer', Decimal('-20.00'), transfer.id),
+            (other.id, 'transfer', Decimal('20.00'), transfer.id),
+            (self.wallet.id, 'opening', Decimal('115.00'), None),
+        ]))
+        # Las billeteras sin balance ni movimientos no llevan apertura
+        totals = dict(
+            LedgerEntry.objects.values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total')
+        )
+        self.assertEqual(totals, {self.wallet.id: Decimal('65.00'), other.id: Decimal('70.00')})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'import_transactions usa COPY FROM STDIN (PostgreSQL)')
+class ImportTransactionsTests(ClientAPITestCase):
+    """import_transactions: COPY a la tabla temporal y MERGE_SQL; reimportar el mismo archivo no duplica"""
+
+    username = 'importador'
+
+    CSV = (
+        'date,amount,name,description\n'
+        '2024-01-05,-10.00,Café,\n'
+        '2024-01-05,-10.00,Café,\n'
+        '2024-01-20,250.50,Sueldo,enero\n'
+        '2024-02-01,-4.25,Pan,\n'
+        '2024-02-02,0,Nada,\n'
+    )
+    OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240310120000<TRNAMT>-12.00<FITID>A1<NAME>Luz<MEMO>marzo</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240310<TRNAMT>-12.00<FITID>A2<NAME>Luz<MEMO>marzo</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240315<TRNAMT>30.00<FITID>A3<NAME>Reintegro</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+    def write(self, content, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        stdout = StringIO()
+        call_command('import_transactions', path, wallet=self.wallet.id, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def rollups(self):
+        return {
+            row.month: (row.expense_total, row.expense_count, row.revenue_total, row.revenue_count)
+            for row in MonthlyRollup.objects.filter(wallet=self.wallet)
+        }
+
+    def ledger(self):
+        return sorted(
+            LedgerEntry.objects.filter(wallet=self.wallet).exclude(kind=LedgerEntry.OPENING)
+            .values_list('kind', 'amount')
+        )
+
+    def test_csv(self):
+        path = self.write(self.CSV, '.csv')
+        output = self.run_import(path)
+        self.assertIn('5 rows read, 4 imported (3 expenses, 1 revenues)', output)
+        # Dos líneas idénticas del mismo día sin FITID son dos gastos
+        self.assertEqual(Expense.objects.filter(wallet=self.wallet, name='Café').count(), 2)
+        self.assertEqual(Revenue.objects.get(wallet=self.wallet).amount, Decimal('250.50'))
+        self.assertEqual(self.balance(), Decimal('326.25'))
+        self.assertEqual(self.rollups(), {
+            date(2024, 1, 1): (Decimal('20.00'), 2, Decimal('250.50'), 1),
+            date(2024, 2, 1): (Decimal('4.25'), 1, Decimal('0.00'), 0),
+        })
+        self.assertEqual(self.ledger(), [
+            ('expense', Decimal('-10.00')), ('expense', Decimal('-10.00')), ('expense', Decimal('-4.25')),
+            ('revenue', Decimal('250.50')),
+        ])
+        self.assertEqual(self.wallet.ledger_entries.aggregate(total=Sum('amount'))['total'], self.balance())
+
+        output = self.run_import(path)
+        self.assertIn('0 imported', output)
+        self.assertEqual(Expense.objects.filter(wallet=self.wallet).count(), 3)
+        self.assertEqual(self.balance(), Decimal('326.25'))
+        self.assertEqual(len(self.ledger()), 4)
+        self.assertEqual(self.rollups()[date(2024, 1, 1)], (Decimal('20.00'), 2, Decimal('250.50'), 1))
+
+        # Una tercera línea igual en otro archivo sí es nueva
+        self.run_import(self.write(self.CSV + '2024-01-05,-10.00,Café,\n', '.csv'))
+        self.assertEqual(Expense.objects.filter(wallet=self.wallet, name='Café').count(), 3)
+        self.assertEqual(self.balance(), Decimal('316.25'))
+
+    def test_ofx(self):
+        path = self.write(self.OFX, '.ofx')
+        self.assertIn('3 imported (2 expenses, 1 revenues)', self.run_import(path))
+        # Mismo contenido pero distinto FITID: dos movimientos
+        self.assertEqual(
+            sorted(Expense.objects.filter(wallet=self.wallet).values_list('name', 'description', 'expense_date')),
+            [('Luz', 'marzo', date(2024, 3, 10))] * 2
+        )
+        self.assertEqual(self.balance(), Decimal('106.00'))
+        self.assertEqual(self.rollups(), {date(2024, 3, 1): (Decimal('24.00'), 2, Decimal('30.00'), 1)})
+        self.assertEqual(self.ledger(), [
+            ('expense', Decimal('-12.00')), ('expense', Decimal('-12.00')), ('revenue', Decimal('30.00'))
+        ])
+
+        self.assertIn('0 imported', self.run_import(path))
+        self.assertEqual(self.balance(), Decimal('106.00'))
+        self.assertEqual(len(self.ledger()), 3)
+
+    def test_invalid_rows(self):
+        path = self.write('date,amount\n2024-01-05,-1.00\n2024-01-06,uno\n', '.csv')
+        with self.assertRaisesMessage(CommandError, "Row 2: invalid amount 'uno'"):
+            self.run_import(path)
+        with self.assertRaisesMessage(CommandError, 'Missing CSV columns: amount'):
+            self.run_import(self.write('date,importe\n2024-01-05,1\n', '.csv'))
+        with self.assertRaisesMessage(CommandError, 'not found'):
+            call_command('import_transactions', path, wallet=0, stdout=StringIO())
+        # Nada quedó a medias
+        self.assertFalse(Expense.objects.filter(wallet=self.wallet).exists())
+        self.assertEqual(self.balance(), Decimal('100.00'))
+        self.assertEqual(self.ledger(), [])
+
+
+class HotWalletTests(TestCase):
+    """Créditos diferidos de billeteras hot: saldo visible, débitos y consolidación"""
+
+    def setUp(self):
+        self.client_profile = Client.objects.create(name='hot', email='hot@example.com')
+        self.wallet = services.open_wallet(self.client_profile, 'Cobranzas', '', Decimal('10.00'))
+        Wallet.objects.filter(pk=self.wallet.pk).update(is_hot=True)
+
+    def available(self):
+        return services.available_balances([self.wallet.id])[self.wallet.id]
+
+    def ledger_total(self):
+        return LedgerEntry.objects.filter(wallet=self.wallet).aggregate(total=Sum('amount'))['total']
+
+    def test_credit_is_deferred(self):
+        for amount in ('5.00', '2.50', '0.25'):
+            pending = services.credit(
+                self.wallet.id, Decimal(amount), LedgerEntry.REVENUE, revenue_date=date(2024, 3, 9)
+            )
+            self.assertIsNotNone(pending)
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('10.00'))
+        self.assertEqual(self.available(), Decimal('17.75'))
+        self.assertEqual(self.ledger_total(), Decimal('17.75'))
+
+        self.assertEqual(services.flush_pending(), (1, 3))
+        self.assertFalse(PendingCredit.objects.exists())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('17.75'))
+        rollup = MonthlyRollup.objects.get(wallet=self.wallet, month=date(2024, 3, 1))
+        self.assertEqual((rollup.revenue_total, rollup.revenue_count), (Decimal('7.75'), 3))
+
+    def test_debit_uses_pending_credits(self):
+        services.credit(self.wallet.id, Decimal('30.00'), LedgerEntry.DEPOSIT)
+        with transaction.atomic():
+            services.debit(self.wallet.id, Decimal('35.00'), LedgerEntry.EXPENSE)
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('5.00'))
+        self.assertFalse(PendingCredit.objects.exists())
+        with self.assertRaises(services.InsufficientBalance), transaction.atomic():
+            services.debit(self.wallet.id, Decimal('5.01'), LedgerEntry.EXPENSE)
+        self.assertEqual(self.available(), self.ledger_total())
+
+    def test_regular_wallet_unchanged(self):
+        Wallet.objects.filter(pk=self.wallet.pk).update(is_hot=False)
+        self.assertIsNone(services.credit(self.wallet.id, Decimal('1.00'), LedgerEntry.DEPOSIT))
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('11.00'))
+        self.assertFalse(PendingCredit.objects.exists())
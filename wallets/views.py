@@ -2,28 +2,71 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from decimal import Decimal, InvalidOperation
-from .models import Wallet, Transfer
+from .models import LedgerEntry, PendingCredit, Wallet, Transfer
 from .serializers import WalletSerializer, TransferSerializer
+from . import services
 from users.models import Client
+from users.authentication import get_request_client
+from idempotency.decorators import idempotent
+from API_revenue_portfolio.cache import ClientDataVersionMixin
+from API_revenue_portfolio.conditional import (
+    ConditionalGetMixin, OptimisticWriteMixin, VersionConflict, compare_and_swap
+)
+from API_revenue_portfolio.exports import EXPORT_RENDERERS, day_bounds, export_response, parse_date_range
+from API_revenue_portfolio.fastread import read_converters, read_values, represent, requested_fields
 
-class WalletViewSet(viewsets.ModelViewSet):
+# Campos del TransferSerializer que vienen de la billetera de origen/destino
+TRANSFER_EXPRESSIONS = {'from_wallet_name': 'from_wallet__name', 'to_wallet_name': 'to_wallet__name'}
+
+class WalletViewSet(ClientDataVersionMixin, ConditionalGetMixin, OptimisticWriteMixin, viewsets.ModelViewSet):
     serializer_class = WalletSerializer
     permission_classes = [IsAuthenticated]
+    # Orden de la paginación por cursor (ver API_revenue_portfolio.pagination)
+    ordering = ('created_at', 'id')
     
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Wallet.objects.none()
         try:
-            client = Client.objects.get(email=self.request.user.email)
-            return Wallet.objects.filter(client=client, is_deleted=False)
+            client = get_request_client(self.request)
+            queryset = Wallet.objects.filter(client=client, is_deleted=False)
         except Client.DoesNotExist:
             return Wallet.objects.none()
+        fields = self.requested_fields()
+        if fields is not None:
+            # Solo las columnas pedidas, más las del cursor y la que usa load_pending
+            queryset = queryset.only(*fields, *(name.lstrip('-') for name in self.ordering), 'is_hot')
+        return queryset
+    
+    def requested_fields(self):
+        """?fields= de list/retrieve (None si no vino o es otra acción)"""
+        if getattr(self, 'action', None) not in ('list', 'retrieve'):
+            return None
+        return requested_fields(self.request, WalletSerializer)
+    
+    def get_serializer(self, *args, **kwargs):
+        # El balance de las billeteras hot incluye los créditos todavía no consolidados
+        fields = self.requested_fields()
+        if args and args[0] is not None and (fields is None or 'balance' in fields):
+            services.load_pending(args[0] if kwargs.get('many') else [args[0]])
+        return super().get_serializer(*args, **kwargs)
+    
+    def etag_state(self, request, lookup=None):
+        # Los créditos pendientes cambian el balance sin tocar updated_at de la billetera
+        if lookup is not None:
+            pending = PendingCredit.objects.filter(wallet_id=lookup)
+        else:
+            pending = PendingCredit.objects.filter(wallet__client=get_request_client(request))
+        state = pending.aggregate(last=models.Max('id'), count=models.Count('id'))
+        return [state['last'], state['count']]
     
     def create(self, request, *args, **kwargs):
         try:
-            client = Client.objects.get(email=request.user.email)
+            client = get_request_client(request)
             
             balance = request.data.get('balance', 0.00)
             try:
@@ -39,8 +82,8 @@ class WalletViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            wallet = Wallet.objects.create(
-                client=client,
+            wallet = services.open_wallet(
+                client,
                 name=request.data.get('name'),
                 description=request.data.get('description'),
                 balance=balance
@@ -55,48 +98,63 @@ class WalletViewSet(viewsets.ModelViewSet):
     
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        
-        try:
-            client = Client.objects.get(email=request.user.email)
-            if instance.client != client:
+        for attempt in self.write_attempts(request):
+            instance = self.get_object()
+            
+            try:
+                client = get_request_client(request)
+                if instance.client_id != client.id:
+                    return Response(
+                        {"error": "You don't have permission to edit this wallet"},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+            except Client.DoesNotExist:
                 return Response(
-                    {"error": "You don't have permission to edit this wallet"},
-                    status=status.HTTP_403_FORBIDDEN
+                    {"error": "Client profile not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
                 )
-        except Client.DoesNotExist:
-            return Response(
-                {"error": "Client profile not found"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(serializer.data)
+            failed = self.check_if_match(request, instance)
+            if failed is not None:
+                return failed
+            
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            try:
+                self.perform_update(serializer)
+            except VersionConflict:
+                continue
+            return self.tag(Response(serializer.data), self.object_etag(request))
+        return self.write_conflict(request)
     
     def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        
-        try:
-            client = Client.objects.get(email=request.user.email)
-            if instance.client != client:
+        for attempt in self.write_attempts(request):
+            instance = self.get_object()
+            
+            try:
+                client = get_request_client(request)
+                if instance.client_id != client.id:
+                    return Response(
+                        {"error": "You don't have permission to delete this wallet"},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+            except Client.DoesNotExist:
                 return Response(
-                    {"error": "You don't have permission to delete this wallet"},
-                    status=status.HTTP_403_FORBIDDEN
+                    {"error": "Client profile not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
                 )
-        except Client.DoesNotExist:
-            return Response(
-                {"error": "Client profile not found"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        instance.is_deleted = True 
-        instance.save() 
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+            failed = self.check_if_match(request, instance)
+            if failed is not None:
+                return failed
+            
+            try:
+                compare_and_swap(instance, is_deleted=True)
+            except VersionConflict:
+                continue
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.write_conflict(request)
         
     @action(detail=True, methods=['post'])
+    @idempotent
     def add_balance(self, request, pk=None):
         wallet = self.get_object()
         amount = request.data.get('amount', 0)
@@ -108,8 +166,9 @@ class WalletViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-            wallet.balance += amount
-            wallet.save()
+            with transaction.atomic():
+                services.credit(wallet.id, amount, LedgerEntry.DEPOSIT)
+            wallet.refresh_from_db(fields=['balance', 'updated_at'])
             serializer = self.get_serializer(wallet)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except (ValueError, InvalidOperation):
@@ -124,13 +183,14 @@ class WalletViewSet(viewsets.ModelViewSet):
             )
             
     @action(detail=True, methods=['post'])
+    @idempotent
     def transfer(self, request, pk=None):
         from_wallet = self.get_object()
         
         try:
-            client = Client.objects.get(email=request.user.email)
+            client = get_request_client(request)
             
-            if from_wallet.client != client:
+            if from_wallet.client_id != client.id:
                 return Response(
                     {"error": "You don't have permission to transfer from this wallet"},
                     status=status.HTTP_403_FORBIDDEN
@@ -154,41 +214,33 @@ class WalletViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            to_wallet = Wallet.objects.get(id=to_wallet_id, client=client, is_deleted=False)
-            
-            if from_wallet.id == to_wallet.id:
-                return Response(
-                    {"error": "Cannot transfer to the same wallet"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if from_wallet.balance < amount:
-                return Response(
-                    {"error": "Insufficient balance"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            from_wallet.balance -= amount
-            to_wallet.balance += amount
-            from_wallet.save()
-            to_wallet.save()
+            try:
+                to_wallet_id = int(to_wallet_id)
+            except (TypeError, ValueError):
+                raise Wallet.DoesNotExist
             
-            transfer = Transfer.objects.create(
-                client=client,
-                from_wallet=from_wallet,
-                to_wallet=to_wallet,
-                amount=amount,
-                description=description
+            transfer, from_balance, to_balance = services.transfer(
+                client.id, from_wallet.id, to_wallet_id, amount, description
             )
             
             serializer = TransferSerializer(transfer)
             return Response({
                 'message': 'Transfer successful',
                 'transfer': serializer.data,
-                'from_wallet_balance': str(from_wallet.balance),
-                'to_wallet_balance': str(to_wallet.balance)
+                'from_wallet_balance': str(from_balance),
+                'to_wallet_balance': str(to_balance)
             }, status=status.HTTP_201_CREATED)
             
+        except services.SameWalletTransfer:
+            return Response(
+                {"error": "Cannot transfer to the same wallet"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except services.InsufficientBalance:
+            return Response(
+                {"error": "Insufficient balance"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Client.DoesNotExist:
             return Response(
                 {"error": "Client profile not found"},
@@ -205,24 +257,92 @@ class WalletViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['get'])
+    def balance(self, request, pk=None):
+        """Balance de la billetera en un instante (?at=YYYY-MM-DD o fecha y hora ISO 8601)"""
+        wallet = self.get_object()
+        at = request.query_params.get('at')
+        if not at:
+            services.load_pending([wallet])
+            return Response({'wallet_id': wallet.id, 'at': timezone.now(), 'balance': str(wallet.available_balance)})
+        
+        try:
+            # Primero la fecha sola: en Python 3.11+ parse_datetime también la acepta (como medianoche)
+            day = parse_date(at)
+            moment = day_bounds(day, day)[1] if day else parse_datetime(at)
+        except ValueError:
+            moment = None
+        if moment is None:
+            return Response(
+                {"error": "Invalid 'at', use YYYY-MM-DD or an ISO 8601 datetime"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        
+        return Response({
+            'wallet_id': wallet.id,
+            'at': moment,
+            'balance': str(services.balance_at(wallet.id, moment))
+        })
+    
     @action(detail=True, methods=['get'])
     def transfers(self, request, pk=None):
+        """Transferencias enviadas y recibidas, de la más reciente a la más antigua, paginadas por
+        cursor (?cursor=, ?page_size=) y opcionalmente acotadas por ?date_from= y ?date_to=.
+
+        En lugar de un OR entre origen y destino, cada lado es un rango de su propio índice
+        (billetera, fecha, id) y la página sale de la unión de ambos: el costo no depende de
+        cuántas transferencias tenga la billetera en total.
+        """
+        wallet = self.get_object()
+        start, end = day_bounds(*parse_date_range(request))
+        # ?fields= de TransferSerializer; las columnas del orden se leen igual para el cursor
+        fields = requested_fields(request, TransferSerializer)
+        keep = ('transfer_date', 'id')
+        sides = []
+        for column in ('from_wallet', 'to_wallet'):
+            transfers = Transfer.objects.filter(**{column: wallet})
+            if start:
+                transfers = transfers.filter(transfer_date__gte=start)
+            if end:
+                transfers = transfers.filter(transfer_date__lte=end)
+            sides.append(read_values(transfers, TransferSerializer, TRANSFER_EXPRESSIONS, fields, keep))
+
+        paginator = self.pagination_class()
+        paginator.ordering = ('-transfer_date', '-id')
+        page = paginator.paginate_union(sides, request)
+        return Response({
+            'wallet_id': wallet.id,
+            'wallet_name': wallet.name,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'transfers': represent(page, read_converters(TransferSerializer, fields)),
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], url_path='transfers/export', renderer_classes=EXPORT_RENDERERS)
+    def export_transfers(self, request):
+        """Exporta las transferencias en streaming (?format=csv|ndjson, ?wallet_id=, ?date_from=, ?date_to=)"""
         try:
-            wallet = self.get_object()
-            transfers = Transfer.objects.filter(
-                models.Q(from_wallet=wallet) | models.Q(to_wallet=wallet)
-            ).select_related('from_wallet', 'to_wallet').order_by('-transfer_date')
-            
-            serializer = TransferSerializer(transfers, many=True)
-            return Response({
-                'count': transfers.count(),
-                'wallet_id': wallet.id,
-                'wallet_name': wallet.name,
-                'transfers': serializer.data
-            }, status=status.HTTP_200_OK)
-            
-        except Exception as e:
+            client = get_request_client(request)
+        except Client.DoesNotExist:
             return Response(
-                {"error": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+                {"error": "Client profile not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        start, end = day_bounds(*parse_date_range(request))
+        transfers = Transfer.objects.filter(client=client)
+        wallet_id = request.query_params.get('wallet_id', None)
+        if wallet_id:
+            transfers = transfers.filter(models.Q(from_wallet_id=wallet_id) | models.Q(to_wallet_id=wallet_id))
+        if start:
+            transfers = transfers.filter(transfer_date__gte=start)
+        if end:
+            transfers = transfers.filter(transfer_date__lte=end)
+        header = ['id', 'from_wallet', 'from_wallet_name', 'to_wallet', 'to_wallet_name',
+                  'amount', 'description', 'transfer_date']
+        rows = transfers.order_by('transfer_date', 'id').values_list(
+            'id', 'from_wallet_id', 'from_wallet__name', 'to_wallet_id', 'to_wallet__name',
+            'amount', 'description', 'transfer_date'
+        )
+        return export_response(request, rows, header, 'transfers')